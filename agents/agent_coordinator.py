@@ -3,6 +3,7 @@ import statistics
 from autogen import Agent
 from typing import List
 from core.mistral_config import MistralClient
+from core.places import split_places
 import math
 
 from utils import (
@@ -24,6 +25,7 @@ class CoordinatorAgent(Agent):
         self.route_agent = route_agent
         self.tourist_guide_agent = tourist_guide_agent
         self.simulation_agent = simulation_agent
+        self.token_callback = None
         
         
         self.planning_state = {
@@ -34,6 +36,11 @@ class CoordinatorAgent(Agent):
             'max_iterations': 5
         }
 
+    def set_token_callback(self, callback):
+        """Callback que recibe en streaming el texto de las respuestas generadas (RAG e itinerarios)"""
+        self.token_callback = callback
+        self.rag_agent.receive({'type': 'set_token_callback', 'callback': callback}, self)
+
     def start(self):
         self._notify_interface('system_start', {
             'component': self.name,
@@ -199,13 +206,25 @@ class CoordinatorAgent(Agent):
                 else:
                     
                     aco_result = self.crawler_agent.receive({
-                        'type': 'search_google_aco',
+                        'type': 'search_google_aco_stream',
                         'keywords': problematic_keywords,
                         'improved_query': improved_query,
                         'max_urls': 15,
-                        'max_depth': 2
+                        'max_depth': 2,
+                        'min_new_docs': 3,
+                        'latency_budget': 30.0,
+                        'time_budget': 30.0
                     }, self)
 
+                    if aco_result.get('type') == 'partial_results':
+                        if aco_result.get('crawl_running'):
+                            print("📡 La exploración ACO continúa en segundo plano")
+                        aco_result = {
+                            'type': 'aco_completed',
+                            'content_extracted': aco_result['documents_stored'],
+                            'aco_statistics': {}
+                        }
+
                 if aco_result.get('type') == 'aco_completed' and aco_result.get('content_extracted'):
                     content_count = aco_result.get('content_extracted', 0)
                     aco_stats = aco_result.get('aco_statistics', {})
@@ -365,14 +384,22 @@ class CoordinatorAgent(Agent):
 
         
         crawl_result = self.crawler_agent.receive({
-            'type': 'crawl_keywords',
+            'type': 'crawl_keywords_stream',
             'keywords': problematic_keywords,
-            'improved_query': improved_query
+            'improved_query': improved_query,
+            'min_new_docs': 3,
+            'latency_budget': 30.0,
+            'join_running': True
         }, self)
 
-        if crawl_result.get('type') == 'crawled':
-            pages_processed = crawl_result.get('pages_processed', 0)
+        if crawl_result.get('crawl_started') is False:
+            print("⚠️ El crawl en segundo plano anterior sigue en curso; no se inició la búsqueda alternativa")
+
+        if crawl_result.get('type') == 'partial_results':
+            pages_processed = crawl_result.get('documents_stored', 0)
             print(f"�� Base de datos actualizada con {pages_processed} páginas usando método alternativo")
+            if crawl_result.get('crawl_running'):
+                print("📡 El crawler continúa añadiendo páginas en segundo plano")
 
             new_response = self.rag_agent.receive({'type': 'query', 'query': query}, self)
             if new_response['type'] == 'answer':
@@ -674,7 +701,8 @@ class CoordinatorAgent(Agent):
             itinerary_query += f" incluyendo {', '.join(interests)}"
 
         
-        response = self.rag_agent.receive({'type': 'query', 'query': itinerary_query}, self)
+        response = self.rag_agent.receive({'type': 'query', 'query': itinerary_query,
+                                           'destinations': split_places(preferences.get('destination'))}, self)
 
         if response['type'] == 'answer':
             
@@ -782,7 +810,10 @@ class CoordinatorAgent(Agent):
 
         
         print("📅 Generando itinerario personalizado desde la base de datos...")
-        response = self.rag_agent.receive({'type': 'query', 'query': itinerary_query}, self)
+        interest_queries = self._create_specific_search_queries(preferences.get('destination'), interests)
+        response = self.rag_agent.receive({'type': 'query_many', 'query': itinerary_query,
+                                           'queries': interest_queries,
+                                           'destinations': split_places(preferences.get('destination'))}, self)
 
         if response['type'] == 'answer':
             
@@ -919,7 +950,7 @@ class CoordinatorAgent(Agent):
             Nunca añadas destinos que no aparecen en la información disponible.
             """
 
-            response = mistral_client.generate(prompt)
+            response = mistral_client.generate(prompt, on_token=self.token_callback)
             formatted_itinerary = response.strip()
 
             
@@ -1395,7 +1426,7 @@ Puedes decirme "quiero planificar vacaciones" para iniciar una conversación gui
             IMPORTANTE: Usa SOLO la información proporcionada. No inventes lugares ni añadas destinos que no aparecen en los datos.
             """
 
-            response = mistral_client.generate(prompt)
+            response = mistral_client.generate(prompt, on_token=self.token_callback)
             formatted_itinerary = response.strip()
 
             simulation_json = format_as_simulation_input(formatted_itinerary, preferences)
@@ -1,9 +1,11 @@
 from autogen import Agent
 from core.crawler import TourismCrawler
+from core.distributed_crawler import run_distributed_crawl
 from datetime import datetime
+import time
 
 class CrawlerAgent(Agent):
-    def __init__(self, name, starting_urls, max_pages=100, max_depth=2, num_threads=10, enable_mistral_processing=True):
+    def __init__(self, name, starting_urls, max_pages=100, max_depth=2, num_threads=10, enable_mistral_processing=True, host_byte_limits=None, min_threads=2):
         super().__init__(name)
         
         self.crawler = TourismCrawler(
@@ -11,18 +13,22 @@ class CrawlerAgent(Agent):
             max_pages=max_pages, 
             max_depth=max_depth,
             num_threads=num_threads,  
-            enable_mistral_processing=enable_mistral_processing  
+            enable_mistral_processing=enable_mistral_processing,
+            host_byte_limits=host_byte_limits,
+            min_threads=min_threads
         )
     def receive(self, message, sender):
         if message['type'] == 'crawl':
-            print(f"🚀 Iniciando crawler paralelo con {self.crawler.num_threads} hilos...")
+            print(f"🚀 Iniciando crawler paralelo con hasta {self.crawler.num_threads} hilos...")
             
             pages_processed = self.crawler.run_parallel_crawler()
             return {
                 'type': 'crawled', 
                 'collection': self.crawler.collection,
                 'pages_processed': pages_processed,
-                'threads_used': self.crawler.num_threads
+                'threads_used': self.crawler.num_threads,
+                'concurrency': self.crawler.concurrency.get_metrics(),
+                'trap_report': self.crawler.trap_detector.get_report()
             }
             
         elif message['type'] == 'crawl_keywords':
@@ -36,7 +42,7 @@ class CrawlerAgent(Agent):
             print(f"🔍 Iniciando búsqueda paralela por palabras clave: {keywords}")
             if improved_query:
                 print(f"🔍 Con consulta mejorada: '{improved_query}'")
-            print(f"⚡ Usando {self.crawler.num_threads} hilos en paralelo")
+            print(f"⚡ Usando hasta {self.crawler.num_threads} hilos en paralelo (concurrencia adaptativa)")
             
             
             pages_processed = self.crawler.run_parallel_crawler_from_keywords(
@@ -51,7 +57,9 @@ class CrawlerAgent(Agent):
                     'collection': self.crawler.collection, 
                     'pages_processed': pages_processed,
                     'keywords_used': keywords,
-                    'threads_used': self.crawler.num_threads
+                    'threads_used': self.crawler.num_threads,
+                    'concurrency': self.crawler.concurrency.get_metrics(),
+                    'trap_report': self.crawler.trap_detector.get_report()
                 }
             else:
                 return {'type': 'error', 'msg': 'No se pudo actualizar la base de datos con nueva información'}
@@ -66,94 +74,192 @@ class CrawlerAgent(Agent):
             if not keywords:
                 return {'type': 'error', 'msg': 'No se proporcionaron palabras clave para ACO'}
             
-            print(f"🐜 Iniciando exploración ACO con Google Search")
-            print(f"🎯 Palabras clave: {keywords}")
-            if improved_query:
-                print(f"🔍 Con consulta mejorada: '{improved_query}'")
-            print(f"📊 Parámetros: max_urls={max_urls}, max_depth={max_depth}")
+            return self._run_aco_search(keywords, improved_query, max_urls, max_depth)
+
+        elif message['type'] in ('crawl_keywords_stream', 'search_google_aco_stream'):
             
-            try:
-                
-                from utils.ant_colony_crawler import integrate_aco_with_crawler
-                import time
-                
-                
-                extracted_content = integrate_aco_with_crawler(
-                    self.crawler, 
-                    keywords, 
-                    max_urls=max_urls,
-                    improved_query=improved_query,
-                    max_depth=max_depth
+            keywords = message.get('keywords', [])
+            improved_query = message.get('improved_query', None)
+            min_new_docs = message.get('min_new_docs', 3)
+            latency_budget = message.get('latency_budget', 20.0)
+            
+            if not keywords:
+                return {'type': 'error', 'msg': 'No se proporcionaron palabras clave para la búsqueda'}
+            
+            if message.get('join_running') and self.crawler.is_crawling_in_background():
+                join_timeout = message.get('join_timeout', 15.0)
+                print(f"⏳ Esperando hasta {join_timeout:.0f}s a que termine el crawl en segundo plano en curso...")
+                self.crawler.join_background(timeout=join_timeout)
+            
+            if message['type'] == 'search_google_aco_stream':
+                started = self.crawler.run_in_background(
+                    self._run_aco_search,
+                    keywords,
+                    improved_query,
+                    message.get('max_urls', 15),
+                    message.get('max_depth', 2),
+                    message.get('time_budget', latency_budget)
                 )
-                
-                
-                content_added = 0
-                for content_item in extracted_content:
-                    try:
-                        
-                        doc_id = f"aco_doc_{hash(content_item['url']) % 10000000}_{int(time.time())}"
-                        
-                        
-                        print(f"\n📝 GUARDANDO CHUNK EN CHROMADB (ACO):")
-                        print(f"   📌 ID: {doc_id}")
-                        print(f"   🔗 URL: {content_item['url']}")
-                        print(f"   📄 Título: {content_item['title']}...")
-                        print(f"   📏 Tamaño del texto: {len(content_item['content'])} caracteres")
-                        print(f"   🏷️ Método: ACO (Ant Colony Optimization)")
-                        print(f"   🔍 Palabras clave: {keywords}")
-                        print(f"   ✅ Chunk guardado exitosamente\n")
-                        
-                        
-                        metadata = {
-                            "url": content_item['url'],
-                            "title": content_item['title'],
-                            "source": "aco_google_crawler",
-                            "extraction_method": content_item.get('extraction_method', 'aco'),
-                            "keywords_used": str(keywords),
-                            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        
-                        
-                        self.crawler._save_chunk_to_file(
-                            doc_id, 
-                            content_item['content'], 
-                            metadata, 
-                            "ACO"
-                        )
-                        
-                        self.crawler.collection.add(
-                            documents=[content_item['content']],
-                            metadatas=[metadata],
-                            ids=[doc_id]
-                        )
-                        content_added += 1
-                        
-                    except Exception as e:
-                        print(f"❌ Error añadiendo contenido ACO a DB: {e}")
-                        continue
-                
-                
-                aco_stats = {
-                    'success_rate': content_added / max(max_urls, 1),
-                    'pheromone_trails_count': len(extracted_content) * 2,
-                    'nodes_discovered': len(extracted_content) + 5,
-                    'average_path_length': 2.5
+            else:
+                started = self.crawler.start_background_crawl(
+                    keywords,
+                    max_depth=message.get('max_depth', 3),
+                    improved_query=improved_query
+                )
+            
+            if not started:
+                return {
+                    'type': 'error',
+                    'msg': 'Ya hay un crawl en segundo plano en curso; no se inició uno nuevo',
+                    'crawl_started': False,
+                    'crawl_running': self.crawler.is_crawling_in_background()
                 }
-                
-                if content_added > 0:
-                    return {
-                        'type': 'aco_completed',
-                        'content_extracted': content_added,
-                        'aco_statistics': aco_stats,
-                        'keywords_used': keywords,
-                        'extraction_details': extracted_content
+            
+            print(f"📡 Crawl en segundo plano iniciado, esperando {min_new_docs} documentos o {latency_budget:.0f}s")
+            
+            partial = self.crawler.wait_for_results(min_new_docs=min_new_docs, latency_budget=latency_budget)
+            
+            if partial['documents']:
+                return {
+                    'type': 'partial_results',
+                    'collection': self.crawler.collection,
+                    'documents_stored': len(partial['documents']),
+                    'documents': partial['documents'],
+                    'stop_reason': partial['stop_reason'],
+                    'crawl_running': partial['crawl_running'],
+                    'crawl_started': True,
+                    'keywords_used': keywords
+                }
+            else:
+                return {'type': 'error', 'msg': 'El crawl no almacenó documentos dentro del presupuesto de latencia',
+                        'crawl_started': True, 'crawl_running': partial['crawl_running']}
+
+        elif message['type'] == 'crawl_keywords_distributed':
+            
+            keywords = message.get('keywords', [])
+            
+            if not keywords:
+                return {'type': 'error', 'msg': 'No se proporcionaron palabras clave para la búsqueda'}
+            
+            stats = run_distributed_crawl(
+                keywords,
+                crawler=self.crawler,
+                num_workers=message.get('num_workers', 4),
+                remote_workers=message.get('remote_workers', 0),
+                max_pages=message.get('max_pages', self.crawler.max_pages),
+                max_depth=message.get('max_depth', 2),
+                threads_per_worker=message.get('threads_per_worker', self.crawler.num_threads),
+                improved_query=message.get('improved_query', None),
+                address=message.get('address', ('127.0.0.1', 0)),
+                timeout=message.get('timeout', 600.0)
+            )
+            
+            if stats.get('documents_written', 0) > 0:
+                return {
+                    'type': 'crawled',
+                    'collection': self.crawler.collection,
+                    'pages_processed': stats['documents_written'],
+                    'keywords_used': keywords,
+                    'distributed_stats': stats
+                }
+            else:
+                return {'type': 'error', 'msg': 'El crawl distribuido no almacenó documentos'}
+
+        return {'type': 'error', 'msg': 'Tipo de mensaje desconocido'}
+
+    def _run_aco_search(self, keywords, improved_query=None, max_urls=15, max_depth=2, time_budget=60.0):
+        """
+        Ejecuta la exploración ACO y almacena el contenido extraído en ChromaDB.
+        Cada página se guarda en cuanto se extrae, de modo que wait_for_results
+        la ve mientras la colonia sigue explorando.
+        """
+        print(f"🐜 Iniciando exploración ACO con Google Search")
+        print(f"🎯 Palabras clave: {keywords}")
+        if improved_query:
+            print(f"🔍 Con consulta mejorada: '{improved_query}'")
+        print(f"📊 Parámetros: max_urls={max_urls}, max_depth={max_depth}, time_budget={time_budget:.0f}s")
+        
+        try:
+            
+            from utils.ant_colony_crawler import integrate_aco_with_crawler
+            import threading
+            
+            
+            stored = []
+            stored_lock = threading.Lock()
+            
+            def store_content(content_item):
+                try:
+                    
+                    doc_id = f"aco_doc_{hash(content_item['url']) % 10000000}_{int(time.time())}"
+                    
+                    
+                    print(f"\n📝 GUARDANDO CHUNK EN CHROMADB (ACO):")
+                    print(f"   📌 ID: {doc_id}")
+                    print(f"   🔗 URL: {content_item['url']}")
+                    print(f"   📄 Título: {content_item['title']}...")
+                    print(f"   📏 Tamaño del texto: {len(content_item['content'])} caracteres")
+                    print(f"   🏷️ Método: ACO (Ant Colony Optimization)")
+                    print(f"   🔍 Palabras clave: {keywords}")
+                    
+                    
+                    metadata = {
+                        "url": content_item['url'],
+                        "title": content_item['title'],
+                        "source": "aco_google_crawler",
+                        "extraction_method": content_item.get('extraction_method', 'aco'),
+                        "keywords_used": str(keywords),
+                        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                else:
-                    return {'type': 'error', 'msg': 'ACO no pudo extraer contenido útil'}
                     
-            except ImportError:
-                return {'type': 'error', 'msg': 'Módulo ACO no disponible'}
-            except Exception as e:
-                return {'type': 'error', 'msg': f'Error en exploración ACO: {str(e)}'}
-
-        return {'type': 'error', 'msg': 'Tipo de mensaje desconocido'}
\ No newline at end of file
+                    
+                    self.crawler._save_chunk_to_file(
+                        doc_id, 
+                        content_item['content'], 
+                        metadata, 
+                        "ACO"
+                    )
+                    
+                    self.crawler._add_to_collection(doc_id, content_item['content'], metadata)
+                    print(f"   ✅ Chunk guardado exitosamente\n")
+                    with stored_lock:
+                        stored.append(content_item)
+                    
+                except Exception as e:
+                    print(f"❌ Error añadiendo contenido ACO a DB: {e}")
+            
+            
+            extracted_content = integrate_aco_with_crawler(
+                self.crawler, 
+                keywords, 
+                max_urls=max_urls,
+                improved_query=improved_query,
+                max_depth=max_depth,
+                time_budget=time_budget,
+                on_content=store_content
+            )
+            content_added = len(stored)
+            
+            
+            aco_stats = {
+                'success_rate': content_added / max(max_urls, 1),
+                'pheromone_trails_count': len(extracted_content) * 2,
+                'nodes_discovered': len(extracted_content) + 5,
+                'average_path_length': 2.5
+            }
+            
+            if content_added > 0:
+                return {
+                    'type': 'aco_completed',
+                    'content_extracted': content_added,
+                    'aco_statistics': aco_stats,
+                    'keywords_used': keywords,
+                    'extraction_details': extracted_content
+                }
+            else:
+                return {'type': 'error', 'msg': 'ACO no pudo extraer contenido útil'}
+                
+        except ImportError:
+            return {'type': 'error', 'msg': 'Módulo ACO no disponible'}
+        except Exception as e:
+            return {'type': 'error', 'msg': f'Error en exploración ACO: {str(e)}'}
@@ -5,17 +5,37 @@ class RAGAgent(Agent):
     def __init__(self, name):
         super().__init__(name)
         self.rag_system = None
+        self.token_callback = None
 
     def receive(self, message, sender):
         if message['type'] == 'init_collection':
             
             self.rag_system = RAGSystem(message['collection'])
+            self.rag_system.token_callback = self.token_callback
+            return {'type': 'ready'}
+        elif message['type'] == 'set_token_callback':
+            self.token_callback = message['callback']
+            if self.rag_system:
+                self.rag_system.token_callback = self.token_callback
             return {'type': 'ready'}
         elif message['type'] == 'query':
             if self.rag_system:
-                answer = self.rag_system.rag_query(message['query'])
+                answer = self.rag_system.rag_query(message['query'], destinations=message.get('destinations'))
                 return {'type': 'answer', 'answer': answer}
             else:
                 return {'type': 'error', 'msg': 'RAG system not initialized'}
+        elif message['type'] == 'query_many':
+            if self.rag_system:
+                answer = self.rag_system.rag_query_many(message['query'], message.get('queries', []),
+                                                        destinations=message.get('destinations'))
+                return {'type': 'answer', 'answer': answer}
+            else:
+                return {'type': 'error', 'msg': 'RAG system not initialized'}
+        elif message['type'] == 'cache_stats':
+            if self.rag_system:
+                return {'type': 'cache_stats', 'stats': self.rag_system.get_cache_stats(),
+                        'answers': self.rag_system.get_answer_cache_stats()}
+            else:
+                return {'type': 'error', 'msg': 'RAG system not initialized'}
         return {'type': 'error', 'msg': 'Unknown message type'}
 
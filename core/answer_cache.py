@@ -0,0 +1,223 @@
+"""
+Caché semántica persistente de respuestas del RAG
+Las respuestas se guardan en SQLite junto al embedding de su consulta y a la
+versión de la colección con la que se generaron; una consulta casi idéntica
+(misma clave normalizada o similitud coseno por encima del umbral) reutiliza
+la respuesta mientras la ingesta no incremente la versión de la colección
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.similarity import normalize_rows, normalize_vector
+
+
+DEFAULT_CACHE_PATH = os.path.join("crawler_state", "answer_cache.sqlite3")
+
+
+def answer_key(query: str) -> str:
+    """Clave exacta de una consulta: minúsculas, sin tildes, sin signos de puntuación"""
+    text = unicodedata.normalize('NFKD', query.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.findall(r"[^\W_]+", text))
+
+
+def _to_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False,
+                      default=lambda obj: obj.tolist() if hasattr(obj, 'tolist') else str(obj))
+
+
+class _Bucket:
+    """Entradas en memoria de una colección, versión y modo de consulta"""
+
+    def __init__(self, rows: List[Tuple[str, Optional[bytes], str]]):
+        self.keys: Dict[str, int] = {}
+        self.answers: List[str] = []
+        self.embedding_rows: List[int] = []
+        embeddings = []
+        for key, embedding, answer in rows:
+            self.add(key, embedding, answer, embeddings)
+        self.matrix = normalize_rows(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+
+    def add(self, key: str, embedding: Optional[bytes], answer: str, embeddings: List[np.ndarray] = None):
+        self.keys[key] = len(self.answers)
+        self.answers.append(answer)
+        if embedding is None:
+            return
+
+        vector = np.frombuffer(embedding, dtype=np.float32)
+        self.embedding_rows.append(len(self.answers) - 1)
+        if embeddings is not None:
+            embeddings.append(vector)
+        elif self.matrix.size:
+            self.matrix = np.vstack([self.matrix, normalize_rows(vector)])
+        else:
+            self.matrix = normalize_rows(vector)
+
+
+class SemanticAnswerCache:
+    """Caché de respuestas por similitud de consulta, invalidada por versión de colección"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, similarity_threshold: float = 0.95,
+                 max_entries: int = 2000):
+        """
+        Args:
+            path: Fichero SQLite de la caché (':memory:' para una caché temporal)
+            similarity_threshold: Similitud coseno mínima entre consultas para reutilizar una respuesta
+            max_entries: Respuestas máximas guardadas por colección (se descartan las más antiguas)
+        """
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.buckets: Dict[Tuple[str, int, str], _Bucket] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS collection_versions (
+                    collection TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    mode TEXT NOT NULL,
+                    query_key TEXT NOT NULL,
+                    embedding BLOB,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS answers_by_bucket ON answers (collection, version, mode);
+            """)
+
+    def get_version(self, collection: str) -> int:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT version FROM collection_versions WHERE collection = ?", (collection,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, collection: str) -> int:
+        """Incrementa la versión de una colección (la ingesta invalida así las respuestas guardadas)"""
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO collection_versions (collection, version) VALUES (?, 1) "
+                "ON CONFLICT(collection) DO UPDATE SET version = version + 1", (collection,)
+            )
+            self.connection.execute(
+                "DELETE FROM answers WHERE collection = ? AND version < "
+                "(SELECT version FROM collection_versions WHERE collection = ?)", (collection, collection)
+            )
+            self.buckets = {bucket: entries for bucket, entries in self.buckets.items() if bucket[0] != collection}
+            return self.connection.execute(
+                "SELECT version FROM collection_versions WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+
+    def _bucket(self, collection: str, version: int, mode: str) -> _Bucket:
+        bucket_key = (collection, version, mode)
+        if bucket_key not in self.buckets:
+            rows = self.connection.execute(
+                "SELECT query_key, embedding, answer FROM answers "
+                "WHERE collection = ? AND version = ? AND mode = ? ORDER BY id",
+                bucket_key
+            ).fetchall()
+            self.buckets[bucket_key] = _Bucket(rows)
+        return self.buckets[bucket_key]
+
+    def lookup(self, collection: str, version: int, mode: str, query: str,
+               query_embedding: Optional[np.ndarray] = None) -> Optional[Any]:
+        """
+        Respuesta guardada para la consulta, o None si no hay ninguna suficientemente parecida.
+
+        Primero se busca la clave normalizada exacta y, si no está, la consulta
+        guardada más parecida por similitud coseno de embeddings.
+        """
+        with self.lock:
+            bucket = self._bucket(collection, version, mode)
+            index = bucket.keys.get(answer_key(query))
+
+            if index is None and query_embedding is not None and bucket.matrix.size:
+                scores = bucket.matrix @ normalize_vector(query_embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    index = bucket.embedding_rows[best]
+                    self.semantic_hits += 1
+
+            if index is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            answer = bucket.answers[index]
+
+        return json.loads(answer)
+
+    def store(self, collection: str, version: int, mode: str, query: str, answer: Any,
+              query_embedding: Optional[np.ndarray] = None):
+        """Guarda la respuesta generada con la versión de la colección leída antes de generarla"""
+        key = answer_key(query)
+        embedding = None
+        if query_embedding is not None:
+            embedding = np.asarray(query_embedding, dtype=np.float32).tobytes()
+        serialized = _to_json(answer)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO answers (collection, version, mode, query_key, embedding, answer, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection, version, mode, key, embedding, serialized, time.time())
+            )
+            evicted = self.connection.execute(
+                "DELETE FROM answers WHERE collection = ? AND id NOT IN "
+                "(SELECT id FROM answers WHERE collection = ? ORDER BY id DESC LIMIT ?)",
+                (collection, collection, self.max_entries)
+            ).rowcount
+
+            bucket_key = (collection, version, mode)
+            if evicted:
+                self.buckets = {bucket: entries for bucket, entries in self.buckets.items()
+                                if bucket[0] != collection}
+            elif bucket_key in self.buckets:
+                self.buckets[bucket_key].add(key, embedding, serialized)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'path': self.path
+            }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_shared_caches: Dict[str, SemanticAnswerCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_answer_cache(path: str = DEFAULT_CACHE_PATH) -> SemanticAnswerCache:
+    """Caché de respuestas compartida dentro del proceso por el crawler y los sistemas RAG"""
+    path = os.path.abspath(path)
+    with _shared_caches_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = SemanticAnswerCache(path)
+        return _shared_caches[path]
@@ -0,0 +1,234 @@
+"""
+Índice invertido BM25 persistente en SQLite
+Se actualiza de forma incremental cada vez que el crawler añade un documento
+a ChromaDB y responde consultas léxicas sobre toda la colección; la
+recuperación híbrida combina su ranking con el denso de Chroma mediante
+fusión por rango recíproco (RRF)
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_INDEX_DIR = os.path.join("crawler_state", "bm25")
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+STOP_WORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun aunque bajo bien cada casi como con contra
+cual cuales cuando de del desde donde dos durante e el ella ellas ello ellos en entre era eran es esa esas ese
+eso esos esta estaba estan estar estas este esto estos fue fueron gran ha haber habia han hasta hay hoy la las
+le les lo los mas me mi mis mucho muchos muy ni no nos nuestra nuestro o otra otras otro otros para pero poco
+por porque puede pueden que quien se segun ser si sido sin sobre son su sus tambien tan tanto te tiene tienen
+todo todos tras tu tus un una unas uno unos usted y ya
+about an and are as at be by for from has have in into is it its of on or that the their this to was were
+which with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos de un texto: minúsculas, sin tildes y sin palabras vacías en español e inglés"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [token for token in TOKEN_PATTERN.findall(text) if len(token) > 1 and token not in STOP_WORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fusiona varios rankings de IDs con RRF: score(d) = Σ 1 / (k + rango de d).
+
+    Returns:
+        List[Tuple[str, float]]: IDs ordenados por score fusionado descendente
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Índice invertido BM25 en SQLite con altas y reemplazos incrementales"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            path: Fichero SQLite del índice (':memory:' para un índice temporal)
+            k1: Saturación de la frecuencia de término
+            b: Normalización por longitud de documento
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_by_doc ON postings (doc_id);
+            """)
+
+        count, total_length = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents"
+        ).fetchone()
+        self.document_count = count
+        self.total_length = total_length
+
+    def __len__(self) -> int:
+        return self.document_count
+
+    def _remove(self, doc_id: str):
+        row = self.connection.execute("SELECT length FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return
+
+        self.connection.execute(
+            "UPDATE terms SET df = df - 1 WHERE term IN (SELECT term FROM postings WHERE doc_id = ?)", (doc_id,)
+        )
+        self.connection.execute("DELETE FROM terms WHERE df <= 0")
+        self.connection.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self.connection.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        self.document_count -= 1
+        self.total_length -= row[0]
+
+    def add_documents(self, ids: Sequence[str], documents: Sequence[str]):
+        """Indexa documentos; si un ID ya estaba indexado se reemplaza"""
+        with self.lock, self.connection:
+            for doc_id, document in zip(ids, documents):
+                self._remove(doc_id)
+
+                counts = Counter(tokenize(document))
+                length = sum(counts.values())
+                self.connection.execute("INSERT INTO documents (doc_id, length) VALUES (?, ?)", (doc_id, length))
+                self.connection.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()]
+                )
+                self.connection.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    [(term,) for term in counts]
+                )
+                self.document_count += 1
+                self.total_length += length
+
+    def remove_documents(self, ids: Sequence[str]):
+        with self.lock, self.connection:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def missing_ids(self, ids: Sequence[str]) -> List[str]:
+        """IDs de la lista que todavía no están indexados"""
+        with self.lock:
+            indexed = {row[0] for row in self.connection.execute("SELECT doc_id FROM documents")}
+        return [doc_id for doc_id in ids if doc_id not in indexed]
+
+    def search(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """
+        Documentos con mayor puntuación BM25 para la consulta.
+
+        Returns:
+            List[Tuple[str, float]]: Pares (ID, score) ordenados por score descendente
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or top_k <= 0:
+            return []
+
+        with self.lock:
+            if self.document_count == 0:
+                return []
+
+            placeholders = ", ".join("?" * len(terms))
+            frequencies = self.connection.execute(
+                f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms
+            ).fetchall()
+            if not frequencies:
+                return []
+
+            values = []
+            for term, df in frequencies:
+                idf = math.log(1.0 + (self.document_count - df + 0.5) / (df + 0.5))
+                values.extend([term, idf])
+
+            average_length = self.total_length / self.document_count or 1.0
+            rows = self.connection.execute(
+                f"""
+                WITH query (term, idf) AS (VALUES {", ".join(["(?, ?)"] * len(frequencies))})
+                SELECT p.doc_id,
+                       SUM(q.idf * p.tf * (? + 1) / (p.tf + ? * (1 - ? + ? * d.length / ?))) AS score
+                FROM query q
+                JOIN postings p ON p.term = q.term
+                JOIN documents d ON d.doc_id = p.doc_id
+                GROUP BY p.doc_id
+                ORDER BY score DESC
+                LIMIT ?
+                """,
+                values + [self.k1, self.k1, self.b, self.b, average_length, top_k]
+            ).fetchall()
+
+        return [(doc_id, float(score)) for doc_id, score in rows]
+
+    def sync_with_collection(self, collection, batch_size: int = 256) -> int:
+        """
+        Indexa los documentos de una colección de Chroma que aún no estén en el índice.
+
+        Returns:
+            int: Número de documentos indexados
+        """
+        missing = self.missing_ids(collection.get(include=[])['ids'])
+        for start in range(0, len(missing), batch_size):
+            batch = collection.get(ids=missing[start:start + batch_size], include=['documents'])
+            self.add_documents(batch['ids'], batch['documents'])
+        return len(missing)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'documents': self.document_count,
+                'average_length': self.total_length / self.document_count if self.document_count else 0.0,
+                'path': self.path
+            }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+_shared_indexes: Dict[str, BM25Index] = {}
+_shared_indexes_lock = threading.Lock()
+
+
+def bm25_index_path(collection_name: str, base_dir: str = DEFAULT_INDEX_DIR) -> str:
+    safe_name = re.sub(r'[^\w.-]', '_', collection_name)
+    return os.path.join(base_dir, f"{safe_name}.sqlite3")
+
+
+def get_bm25_index(collection_name: str, base_dir: str = DEFAULT_INDEX_DIR,
+                   create: bool = True) -> Optional[BM25Index]:
+    """
+    Índice BM25 de una colección, compartido dentro del proceso por el crawler y el RAG.
+
+    Con create=False devuelve None si el índice no existe todavía en disco.
+    """
+    path = os.path.abspath(bm25_index_path(collection_name, base_dir))
+    with _shared_indexes_lock:
+        if path not in _shared_indexes:
+            if not create and not os.path.exists(path):
+                return None
+            _shared_indexes[path] = BM25Index(path)
+        return _shared_indexes[path]
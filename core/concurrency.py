@@ -0,0 +1,131 @@
+"""
+Control adaptativo de la concurrencia del crawler
+Ajusta el número de peticiones en vuelo con AIMD (incremento aditivo,
+decremento multiplicativo) a partir del throughput, la tasa de errores y la latencia
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+class AIMDConcurrencyController:
+    """Controlador AIMD del número de peticiones simultáneas"""
+
+    def __init__(self,
+                 min_concurrency: int = 2,
+                 max_concurrency: int = 20,
+                 initial_concurrency: int = None,
+                 additive_increase: int = 1,
+                 multiplicative_decrease: float = 0.5,
+                 window_size: int = 10,
+                 max_error_rate: float = 0.3,
+                 latency_tolerance: float = 2.0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            min_concurrency: Límite inferior de peticiones en vuelo
+            max_concurrency: Límite superior de peticiones en vuelo
+            initial_concurrency: Valor inicial (por defecto, el mínimo)
+            additive_increase: Incremento tras una ventana sana
+            multiplicative_decrease: Factor aplicado tras una ventana con congestión
+            window_size: Número de peticiones observadas entre ajustes
+            max_error_rate: Tasa de errores a partir de la cual se reduce la concurrencia
+            latency_tolerance: Múltiplo de la latencia base considerado congestión
+            clock: Fuente de tiempo usada para medir el throughput
+        """
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.window_size = window_size
+        self.max_error_rate = max_error_rate
+        self.latency_tolerance = latency_tolerance
+
+        if initial_concurrency is None:
+            initial_concurrency = self.min_concurrency
+        self.limit = max(self.min_concurrency, min(self.max_concurrency, initial_concurrency))
+
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.window_start = clock()
+        self.window_latencies: List[float] = []
+        self.window_errors = 0
+        self.baseline_latency = None
+        self.last_throughput = 0.0
+        self.history: List[Dict] = []
+
+    def record(self, success: bool, latency: float):
+        """Registra el resultado de una petición y ajusta el límite al completar una ventana"""
+        with self.lock:
+            self.window_latencies.append(latency)
+            if not success:
+                self.window_errors += 1
+
+            if len(self.window_latencies) >= self.window_size:
+                self._adjust()
+
+    def _adjust(self):
+        now = self.clock()
+        elapsed = max(now - self.window_start, 1e-6)
+        completed = len(self.window_latencies)
+        throughput = completed / elapsed
+        error_rate = self.window_errors / completed
+        latency = sorted(self.window_latencies)[completed // 2]
+
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+
+        previous_limit = self.limit
+        congested = (error_rate > self.max_error_rate or
+                     latency > self.baseline_latency * self.latency_tolerance)
+
+        if latency < self.baseline_latency:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency = self.baseline_latency * 0.9 + latency * 0.1
+
+        if congested:
+            self.limit = max(self.min_concurrency, math.floor(self.limit * self.multiplicative_decrease))
+            action = 'decrease'
+        elif throughput >= self.last_throughput * 0.9:
+            self.limit = min(self.max_concurrency, self.limit + self.additive_increase)
+            action = 'increase'
+        else:
+            action = 'hold'
+
+        self.history.append({
+            'timestamp': now,
+            'limit': self.limit,
+            'previous_limit': previous_limit,
+            'action': action,
+            'throughput': throughput,
+            'error_rate': error_rate,
+            'median_latency': latency
+        })
+
+        self.last_throughput = throughput
+        self.window_start = now
+        self.window_latencies = []
+        self.window_errors = 0
+
+    @property
+    def current(self) -> int:
+        """Número actual de peticiones en vuelo permitidas"""
+        return self.limit
+
+    def get_metrics(self) -> Dict:
+        """Obtiene las métricas del controlador"""
+        with self.lock:
+            last = self.history[-1] if self.history else {}
+            return {
+                'current_concurrency': self.limit,
+                'min_concurrency': self.min_concurrency,
+                'max_concurrency': self.max_concurrency,
+                'adjustments': len(self.history),
+                'last_throughput': last.get('throughput', 0.0),
+                'last_error_rate': last.get('error_rate', 0.0),
+                'last_median_latency': last.get('median_latency', 0.0),
+                'peak_concurrency': max([h['limit'] for h in self.history], default=self.limit)
+            }
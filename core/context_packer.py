@@ -0,0 +1,244 @@
+"""
+Empaquetado del contexto de generación con presupuesto de tokens
+Entre la recuperación y la generación, los documentos se dividen en frases,
+las frases se puntúan contra la consulta con los embeddings cacheados, se
+eliminan las repetidas y se llena un presupuesto de tokens (medido con
+tiktoken) por orden de relevancia, agrupando el resultado por fuente
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.bm25_index import tokenize
+from core.embedding_cache import QueryEmbeddingCache, normalize_query
+
+
+DEFAULT_TOKEN_BUDGET = 3000
+TOKEN_ENCODING = "cl100k_base"
+HEADER_TOKENS = 6  # "[N] " de la cabecera de cada fuente y la línea en blanco que la separa
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens de un texto con tiktoken (cl100k_base).
+    Si la codificación no se puede cargar (p. ej. sin red la primera vez) se
+    estima con cuatro caracteres por token.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            _encoding_failed = True
+            print(f"⚠️ tiktoken no disponible ({e}). Estimando tokens por longitud.")
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text: str, min_chars: int = 25, max_words: int = 80) -> List[str]:
+    """
+    Divide un documento en frases.
+    Los fragmentos muy cortos se unen al siguiente y los muy largos (texto sin
+    puntuación) se cortan en ventanas de max_words palabras.
+    """
+    sentences, pending = [], ""
+    for part in SENTENCE_BOUNDARY.split(text):
+        part = ' '.join(part.split())
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) < min_chars:
+            continue
+        words = pending.split()
+        for start in range(0, len(words), max_words):
+            sentences.append(' '.join(words[start:start + max_words]))
+        pending = ""
+    if pending:
+        if sentences and len(sentences[-1].split()) + len(pending.split()) <= max_words:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def source_label(metadata: Optional[Dict], index: int) -> str:
+    """Etiqueta de la fuente de un documento (título y URL de sus metadatos, o su posición)"""
+    metadata = metadata or {}
+    title = str(metadata.get('title') or '').strip()
+    url = str(metadata.get('url') or '').strip()
+    if title and url:
+        return f"{title} ({url})"
+    return title or url or f"Documento {index + 1}"
+
+
+@dataclass
+class Sentence:
+    """Frase candidata con su documento de origen"""
+    text: str
+    document: int
+    position: int
+    tokens: int
+    score: float = 0.0
+
+
+@dataclass
+class PackedContext:
+    """Contexto empaquetado y estadísticas del empaquetado"""
+    text: str
+    sentences: List[Sentence] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    tokens: int = 0
+    original_tokens: int = 0
+    duplicates: int = 0
+
+    def get_stats(self) -> Dict:
+        return {
+            'context_tokens': self.tokens,
+            'original_context_tokens': self.original_tokens,
+            'context_sentences': len(self.sentences),
+            'context_sources': len(self.sources),
+            'duplicate_sentences': self.duplicates
+        }
+
+
+class ContextPacker:
+    """Selecciona las frases más relevantes de los documentos recuperados dentro de un presupuesto de tokens"""
+
+    def __init__(self, embedding_function: Optional[Callable[[List[str]], List]] = None,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET, duplicate_threshold: float = 0.92,
+                 max_candidates: int = 256, sentence_cache_size: int = 8192):
+        """
+        Args:
+            embedding_function: Función de embeddings de la colección (sin ella se puntúa por solapamiento léxico)
+            token_budget: Tokens máximos del contexto empaquetado (cabeceras de fuente incluidas)
+            duplicate_threshold: Similitud coseno a partir de la cual una frase se considera repetida
+            max_candidates: Frases que se codifican como máximo por consulta (preseleccionadas léxicamente)
+            sentence_cache_size: Embeddings de frases guardados entre consultas
+        """
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.max_candidates = max_candidates
+        self.sentence_cache = (QueryEmbeddingCache(embedding_function, max_entries=sentence_cache_size)
+                               if embedding_function is not None else None)
+
+    def pack(self, query: str, documents: List[str], sources: Optional[List[str]] = None,
+             query_embedding: Optional[np.ndarray] = None) -> PackedContext:
+        """
+        Empaqueta los documentos para la consulta.
+        Args:
+            query: Consulta del usuario
+            documents: Documentos recuperados, en orden de relevancia
+            sources: Etiqueta de la fuente de cada documento (por defecto "Documento N")
+            query_embedding: Embedding de la consulta (se calcula con la caché de frases si falta)
+        Returns:
+            PackedContext: Texto agrupado por fuente y estadísticas
+        """
+        sources = [sources[i] if sources and i < len(sources) and sources[i] else f"Documento {i + 1}"
+                   for i in range(len(documents))]
+        candidates = self._candidates(documents)
+        original_tokens = sum(sentence.tokens for sentence in candidates)
+        if not candidates:
+            return PackedContext(text="")
+
+        candidates = self._prefilter(query, candidates)
+        embeddings = self._score(query, candidates, query_embedding)
+        order = sorted(range(len(candidates)),
+                       key=lambda i: (-candidates[i].score, candidates[i].document, candidates[i].position))
+
+        selected, selected_vectors, seen = [], [], set()
+        used_sources, duplicates, tokens = set(), 0, 0
+        for i in order:
+            sentence = candidates[i]
+            key = normalize_query(sentence.text)
+            if key in seen or self._is_duplicate(embeddings, i, selected_vectors):
+                duplicates += 1
+                continue
+
+            cost = sentence.tokens + 1
+            if sentence.document not in used_sources:
+                cost += count_tokens(sources[sentence.document]) + HEADER_TOKENS
+            if tokens + cost > self.token_budget:
+                continue
+
+            tokens += cost
+            seen.add(key)
+            used_sources.add(sentence.document)
+            selected.append(sentence)
+            if embeddings is not None:
+                selected_vectors.append(embeddings[i])
+
+        text, labels = self._render(selected, sources)
+        return PackedContext(text=text, sentences=selected, sources=labels, tokens=count_tokens(text),
+                             original_tokens=original_tokens, duplicates=duplicates)
+
+    def _candidates(self, documents: List[str]) -> List[Sentence]:
+        candidates = []
+        for document, text in enumerate(documents):
+            for position, sentence in enumerate(split_sentences(text or "")):
+                candidates.append(Sentence(sentence, document, position, count_tokens(sentence)))
+        return candidates
+
+    def _prefilter(self, query: str, candidates: List[Sentence]) -> List[Sentence]:
+        """Puntuación léxica de todas las frases; solo las max_candidates mejores pasan a codificarse"""
+        query_terms = set(tokenize(query))
+        for sentence in candidates:
+            terms = set(tokenize(sentence.text))
+            sentence.score = len(query_terms & terms) / len(query_terms) if query_terms else 0.0
+
+        if self.sentence_cache is None or len(candidates) <= self.max_candidates:
+            return candidates
+        ranked = sorted(candidates, key=lambda s: (-s.score, s.document, s.position))
+        return ranked[:self.max_candidates]
+
+    def _score(self, query: str, candidates: List[Sentence],
+               query_embedding: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Similitud coseno de cada frase con la consulta; devuelve los embeddings normalizados"""
+        if self.sentence_cache is None:
+            return None
+        if query_embedding is None:
+            query_embedding = self.sentence_cache.embed(query)
+
+        embeddings = np.vstack(self.sentence_cache.embed_many([sentence.text for sentence in candidates]))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm > 0:
+            query_vector = query_vector / query_norm
+
+        for sentence, score in zip(candidates, embeddings @ query_vector):
+            sentence.score = float(score)
+        return embeddings
+
+    def _is_duplicate(self, embeddings: Optional[np.ndarray], index: int, selected_vectors: List[np.ndarray]) -> bool:
+        if embeddings is None or not selected_vectors:
+            return False
+        return float(np.max(np.vstack(selected_vectors) @ embeddings[index])) >= self.duplicate_threshold
+
+    @staticmethod
+    def _header(number: int, source: str) -> str:
+        return f"[{number + 1}] {source}"
+
+    def _render(self, selected: List[Sentence], sources: List[str]) -> Tuple[str, List[str]]:
+        """Agrupa las frases por documento (en orden de recuperación) y mantiene su orden original"""
+        by_document: Dict[int, List[Sentence]] = {}
+        for sentence in selected:
+            by_document.setdefault(sentence.document, []).append(sentence)
+
+        blocks, labels = [], []
+        for number, document in enumerate(sorted(by_document)):
+            sentences = sorted(by_document[document], key=lambda s: s.position)
+            labels.append(sources[document])
+            blocks.append(f"{self._header(number, sources[document])}\n" + ' '.join(s.text for s in sentences))
+        return "\n\n".join(blocks), labels
@@ -4,7 +4,7 @@ from urllib.parse import urljoin, urlparse
 import chromadb
 from chromadb.utils import embedding_functions
 import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Callable
 import tiktoken
 import threading
 from concurrent.futures import ThreadPoolExecutor, Future
@@ -14,32 +14,72 @@ import json
 import os
 from datetime import datetime
 
+from core.fetcher import PageFetcher
+from core.concurrency import AIMDConcurrencyController
+from core.sitemap import SitemapDiscovery
+from core.trap_detector import TrapDetector
+from core.link_classifier import LinkClassifier
+from core.bm25_index import BM25Index, get_bm25_index
+from core.answer_cache import SemanticAnswerCache, get_answer_cache
+from core.places import place_metadata
+
 
 class TourismCrawler:
-    def __init__(self, starting_urls: List[str], chroma_collection_name: str = "tourism_data", max_pages: int = 100, max_depth: int = 3, num_threads: int = 10, enable_mistral_processing: bool = True):
+    def __init__(self, starting_urls: List[str], chroma_collection_name: str = "tourism_data", max_pages: int = 100, max_depth: int = 3, num_threads: int = 10, enable_mistral_processing: bool = True, max_page_bytes: int = 1_500_000, host_byte_limits: Dict[str, int] = None, min_threads: int = 2, use_sitemaps: bool = True, collection=None, sparse_index: Optional[BM25Index] = None, answer_cache: Optional[SemanticAnswerCache] = None):
         self.starting_urls = starting_urls
         self.visited_urls = set()
         self.urls_to_visit = queue.Queue()
-        self.chroma_client = chromadb.PersistentClient(path="chroma_db")
 
-        
-        self.sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        if collection is not None:
+            
+            self.chroma_client = None
+            self.sentence_transformer_ef = None
+            self.collection = collection
+            self.sparse_index = sparse_index
+            self.answer_cache = answer_cache
+        else:
+            self.chroma_client = chromadb.PersistentClient(path="chroma_db")
 
-        
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=chroma_collection_name,
-            embedding_function=self.sentence_transformer_ef
-        )
+            
+            self.sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name="all-MiniLM-L6-v2"
+            )
+
+            
+            self.collection = self.chroma_client.get_or_create_collection(
+                name=chroma_collection_name,
+                embedding_function=self.sentence_transformer_ef
+            )
+
+            
+            self.sparse_index = sparse_index or get_bm25_index(chroma_collection_name)
+            self.answer_cache = answer_cache or get_answer_cache()
+            try:
+                indexed = self.sparse_index.sync_with_collection(self.collection)
+                if indexed:
+                    print(f"🔎 Índice BM25 sincronizado: {indexed} documentos añadidos")
+            except Exception as e:
+                print(f"⚠️ No se pudo sincronizar el índice BM25: {e}")
 
         
         self.max_pages = max_pages
         self.max_depth = max_depth
         self.num_threads = num_threads
+        self.concurrency = AIMDConcurrencyController(
+            min_concurrency=min(min_threads, num_threads),
+            max_concurrency=num_threads
+        )
         
         
         self.current_query_keywords = []
+        
+        
+        self.fetcher = PageFetcher(max_bytes=max_page_bytes, host_byte_limits=host_byte_limits)
+        self.use_sitemaps = use_sitemaps
+        self.sitemap_discovery = SitemapDiscovery(self.fetcher)
+        self.trap_detector = TrapDetector()
+        self.link_classifier = LinkClassifier()
+        self.link_anchor_texts: Dict[str, str] = {}
 
         
         for url in starting_urls:
@@ -56,11 +96,17 @@ class TourismCrawler:
         self.pages_added_to_db = 0
         self.errors_count = 0
         self.urls_filtered_out = 0  
+        self.urls_skipped_open_circuit = 0
+        self.urls_skipped_trap = 0
         
         
         self.stop_crawling = threading.Event()
         
         
+        self.stored_documents = queue.Queue()
+        self.background_thread = None
+        
+        
         self.enable_mistral_processing = enable_mistral_processing
         self.processor_agent = None
         if self.enable_mistral_processing:
@@ -395,13 +441,17 @@ class TourismCrawler:
                 
                 link_text = self._extract_link_text(a_tag)
                 if self._has_common_keywords(absolute_url, link_text):
-                    links.append(absolute_url)
+                    links.append((absolute_url, link_text))
                 else:
                     
                     with self.stats_lock:
                         self.urls_filtered_out += 1
 
-        return list(set(links))
+        unique_links = dict(links)
+        with self.visited_lock:
+            self.link_anchor_texts.update(unique_links)
+
+        return self.link_classifier.rank(list(unique_links.items()))
 
     def clean_text(self, text: str) -> str:
         """Limpia el texto extraído"""
@@ -484,6 +534,8 @@ class TourismCrawler:
                 return None
             self.visited_urls.add(url)
         
+        self.sitemap_discovery.mark_crawled(url)
+        
         
         with self.stats_lock:
             self.pages_processed += 1
@@ -497,18 +549,40 @@ class TourismCrawler:
         print(f"[Thread-{thread_id}] Procesando URL {current_processed}/{self.max_pages} (Depth: {depth}): {url[:80]}...")
         
         try:
-            response = requests.get(url, timeout=15, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            })
+            fetch_start = time.time()
+            try:
+                response = self.fetcher.fetch(url)
+            except Exception:
+                self.concurrency.record(False, time.time() - fetch_start)
+                raise
 
-            if response.status_code != 200:
+            if response.skipped_reason == 'circuit_open':
+                with self.stats_lock:
+                    self.urls_skipped_open_circuit += 1
+                print(f"[Thread-{thread_id}] Circuito abierto, URL omitida: {url}")
+                return None
+
+            self.concurrency.record(
+                response.status_code == 200 and response.skipped_reason != 'blocked',
+                time.time() - fetch_start
+            )
+
+            if response.status_code != 200 or response.skipped_reason == 'blocked':
                 with self.stats_lock:
                     self.errors_count += 1
-                print(f"[Thread-{thread_id}] Error HTTP {response.status_code}: {url}")
+                reason = "CAPTCHA/bloqueo" if response.skipped_reason == 'blocked' else f"HTTP {response.status_code}"
+                print(f"[Thread-{thread_id}] Error {reason}: {url}")
+                return None
+
+            if response.skipped_reason:
+                self._train_link_classifier(url, False)
+                print(f"[Thread-{thread_id}] Contenido no HTML ({response.content_type or 'desconocido'}), descarga abortada: {url}")
                 return None
 
             soup = BeautifulSoup(response.text, 'html.parser')
             content_data = self.extract_content(url, soup)
+            self.trap_detector.record_page(url, content_data["content"] if content_data else None)
+            self._train_link_classifier(url, content_data is not None)
             
             if content_data:
                 
@@ -566,11 +640,7 @@ class TourismCrawler:
                                 print(f"   📊 Metadata: {len(metadata)} campos")
                                 print(f"   ✅ Chunk guardado exitosamente\n")
                                 
-                                self.collection.add(
-                                    documents=[structured_text],
-                                    metadatas=[metadata],
-                                    ids=[doc_id]
-                                )
+                                self._add_to_collection(doc_id, structured_text, metadata)
                                 
                                 
                                 self._save_chunk_to_file(doc_id, structured_text, metadata, "GLiNER")
@@ -650,11 +720,7 @@ class TourismCrawler:
                                 print(f"   📊 Metadata: {len(metadata)} campos")
                                 print(f"   ✅ Chunk guardado exitosamente\n")
                                 
-                                self.collection.add(
-                                    documents=[structured_text],
-                                    metadatas=[metadata],
-                                    ids=[doc_id]
-                                )
+                                self._add_to_collection(doc_id, structured_text, metadata)
                                 
                                 
                                 self._save_chunk_to_file(doc_id, structured_text, metadata, "GLiNER")
@@ -681,7 +747,8 @@ class TourismCrawler:
                 
                 new_links = []
                 if depth < self.max_depth:
-                    links = self.get_links(url, soup)
+                    links = [link for link in self.get_links(url, soup)
+                             if not self.trap_detector.is_banned(link)]
                     
                     filtered_links = links[:10]  
                     new_links = [(link, depth + 1) for link in filtered_links]
@@ -707,7 +774,7 @@ class TourismCrawler:
         Ejecuta el crawler en paralelo usando múltiples hilos.
         Versión mejorada sin timeouts problemáticos.
         """
-        print(f"🚀 Iniciando crawler paralelo con {self.num_threads} hilos")
+        print(f"🚀 Iniciando crawler paralelo con concurrencia adaptativa ({self.concurrency.min_concurrency}-{self.num_threads} hilos)")
         print(f"📊 Objetivo: {self.max_pages} páginas máximo, profundidad máxima: {self.max_depth}")
         
         start_time = time.time()
@@ -740,12 +807,20 @@ class TourismCrawler:
                     active_futures.remove(future)
                 
                 
-                while (len(active_futures) < self.num_threads and 
+                while (len(active_futures) < self.concurrency.current and 
                        not self.urls_to_visit.empty() and 
                        not self.stop_crawling.is_set()):
                     
                     try:
                         url_data = self.urls_to_visit.get_nowait()
+                        if self.fetcher.health.is_circuit_open(url_data[0]):
+                            with self.stats_lock:
+                                self.urls_skipped_open_circuit += 1
+                            continue
+                        if not self.trap_detector.should_fetch(url_data[0]):
+                            with self.stats_lock:
+                                self.urls_skipped_trap += 1
+                            continue
                         future = executor.submit(self._process_single_url, url_data)
                         active_futures.append(future)
                     except queue.Empty:
@@ -758,7 +833,8 @@ class TourismCrawler:
                     rate = self.pages_processed / elapsed if elapsed > 0 else 0
                     print(f"📈 Progreso: {self.pages_processed}/{self.max_pages} páginas "
                           f"({self.pages_added_to_db} añadidas a DB, {self.errors_count} errores) "
-                          f"- {rate:.1f} páginas/seg - {len(active_futures)} hilos activos")
+                          f"- {rate:.1f} páginas/seg - {len(active_futures)} hilos activos "
+                          f"(concurrencia actual: {self.concurrency.current})")
                     last_progress_time = current_time
                 
                 
@@ -799,9 +875,27 @@ class TourismCrawler:
             if self.gliner_agent:
                 stats = self.gliner_agent.get_stats()
                 print(f"   • Tasa de éxito GLiNER: {stats['success_rate']:.2%}")
+        print(f"   • URLs omitidas por circuito abierto: {self.urls_skipped_open_circuit}")
+        open_circuits = self.fetcher.health.get_open_circuits()
+        if open_circuits:
+            print(f"   • Hosts con circuito abierto: {', '.join(open_circuits)}")
+        print(f"   • URLs omitidas por plantillas trampa: {self.urls_skipped_trap}")
+        for trap in self.trap_detector.get_report()[:5]:
+            print(f"      - {trap['template']} [{trap['state']}] rendimiento {trap['yield']:.0%}, "
+                  f"{trap['skipped']} URLs omitidas")
+        fetch_stats = self.fetcher.get_stats()
+        print(f"   • Respuestas no HTML abortadas: {fetch_stats['non_html_skipped']}")
+        print(f"   • Páginas truncadas por límite de bytes: {fetch_stats['truncated']}")
+        print(f"   • Bytes descargados: {fetch_stats['bytes_read']:,} (evitados: {fetch_stats['bytes_saved']:,})")
         print(f"   • Tiempo total: {elapsed_time:.2f} segundos")
         print(f"   • Velocidad promedio: {avg_rate:.2f} páginas/segundo")
-        print(f"   • Hilos utilizados: {self.num_threads}")
+        concurrency_metrics = self.concurrency.get_metrics()
+        print(f"   • Concurrencia actual: {concurrency_metrics['current_concurrency']} "
+              f"(pico: {concurrency_metrics['peak_concurrency']}, máximo: {self.num_threads})")
+        print(f"   • Ajustes AIMD realizados: {concurrency_metrics['adjustments']}")
+        classifier_stats = self.link_classifier.get_stats()
+        print(f"   • Tasa de cosecha del clasificador de enlaces: {classifier_stats['recent_harvest_rate']:.1%} "
+              f"(histórica: {classifier_stats['harvest_rate']:.1%}, {classifier_stats['updates']} ejemplos)")
         
         return self.pages_added_to_db
 
@@ -1505,6 +1599,10 @@ class TourismCrawler:
             self.urls_to_visit.put((url, 0))
         
         
+        if self.use_sitemaps:
+            self.seed_from_sitemaps(initial_urls)
+        
+        
         original_max_depth = self.max_depth
         self.max_depth = max_depth
         
@@ -1514,8 +1612,61 @@ class TourismCrawler:
         
         self.max_depth = original_max_depth
         
+        if self.use_sitemaps:
+            self.sitemap_discovery.save_state()
+        self.link_classifier.save()
+        
         return result
 
+    def seed_from_sitemaps(self, site_urls: List[str], max_hosts: int = 5, max_urls_per_host: int = 30) -> int:
+        """
+        Siembra la frontera con URLs profundas obtenidas de los sitemaps de los sitios.
+
+        Las URLs se filtran con el mismo criterio que los enlaces (is_valid_url y
+        palabras clave de la consulta), de modo que se llega a páginas relevantes
+        sin recorrer las páginas de navegación.
+
+        Args:
+            site_urls: URLs de los sitios cuyos sitemaps se consultarán
+            max_hosts: Número máximo de hosts a consultar
+            max_urls_per_host: Número máximo de URLs sembradas por host
+
+        Returns:
+            int: Número de URLs añadidas a la frontera
+        """
+        hosts = []
+        for url in site_urls:
+            netloc = urlparse(url).netloc
+            if netloc and netloc not in [urlparse(h).netloc for h in hosts]:
+                hosts.append(url)
+            if len(hosts) >= max_hosts:
+                break
+
+        matcher = lambda candidate: self.is_valid_url(candidate) and self._has_common_keywords(candidate)
+
+        seeded = 0
+        for site_url in hosts:
+            try:
+                sitemap_urls = self.sitemap_discovery.discover(site_url, matcher, max_urls=max_urls_per_host)
+            except Exception as e:
+                print(f"⚠️ Error procesando sitemaps de {urlparse(site_url).netloc}: {e}")
+                continue
+
+            with self.visited_lock:
+                for sitemap_url in sitemap_urls:
+                    if sitemap_url not in self.visited_urls:
+                        self.urls_to_visit.put((sitemap_url, 0))
+                        seeded += 1
+
+            if sitemap_urls:
+                print(f"🗺️ Sitemap de {urlparse(site_url).netloc}: {len(sitemap_urls)} URLs relevantes añadidas")
+
+        stats = self.sitemap_discovery.get_stats()
+        print(f"🗺️ Sitemaps leídos: {stats['sitemaps_read']}, entradas: {stats['entries_seen']}, "
+              f"relevantes: {stats['entries_matched']}, sin cambios desde el último crawl: {stats['entries_unchanged']}")
+
+        return seeded
+
     
     def crawl_from_links(self, links: list, max_depth: int = 2):
         """Método de compatibilidad - redirige al crawler paralelo"""
@@ -1540,6 +1691,152 @@ class TourismCrawler:
         print("⚠️ Usando crawler paralelo en lugar del método secuencial legacy")
         return self.run_parallel_crawler()
     
+    def run_in_background(self, target: Callable, *args, **kwargs) -> bool:
+        """
+        Ejecuta una tarea de crawling en un hilo en segundo plano.
+
+        Los documentos que la tarea almacene quedan disponibles en
+        iter_stored_documents en cuanto se guardan en ChromaDB.
+
+        Returns:
+            bool: False si ya hay un crawl en segundo plano en curso
+        """
+        if self.is_crawling_in_background():
+            print("⚠️ Ya hay un crawl en segundo plano en curso")
+            return False
+
+
+        while not self.stored_documents.empty():
+            try:
+                self.stored_documents.get_nowait()
+            except queue.Empty:
+                break
+
+        def _runner():
+            try:
+                target(*args, **kwargs)
+            except Exception as e:
+                print(f"❌ Error en crawl en segundo plano: {e}")
+
+        self.background_thread = threading.Thread(target=_runner, daemon=True)
+        self.background_thread.start()
+        return True
+
+    def start_background_crawl(self, keywords: list, max_depth: int = 2, improved_query: str = None) -> bool:
+        """Lanza run_parallel_crawler_from_keywords en segundo plano."""
+        return self.run_in_background(
+            self.run_parallel_crawler_from_keywords,
+            keywords,
+            max_depth=max_depth,
+            improved_query=improved_query
+        )
+
+    def is_crawling_in_background(self) -> bool:
+        """Indica si hay un crawl en segundo plano todavía en ejecución."""
+        return self.background_thread is not None and self.background_thread.is_alive()
+
+    def join_background(self, timeout: float = None) -> bool:
+        """
+        Espera a que termine el crawl en segundo plano en curso.
+
+        Returns:
+            bool: True si no queda ningún crawl en segundo plano en ejecución
+        """
+        if self.is_crawling_in_background():
+            self.background_thread.join(timeout)
+        return not self.is_crawling_in_background()
+
+    def iter_stored_documents(self, timeout: float = None) -> Iterator[Dict]:
+        """
+        Itera sobre los documentos a medida que se almacenan en ChromaDB.
+
+        Args:
+            timeout: Tiempo máximo de espera en segundos (None = hasta que termine el crawl)
+
+        Yields:
+            Dict: {'doc_id', 'url', 'title', 'stored_at'} de cada documento almacenado
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+
+        while True:
+            wait = 0.5
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+                wait = min(wait, remaining)
+
+            try:
+                yield self.stored_documents.get(timeout=wait)
+            except queue.Empty:
+                if not self.is_crawling_in_background() and self.stored_documents.empty():
+                    return
+
+    def wait_for_results(self, min_new_docs: int = 3, latency_budget: float = 20.0) -> Dict:
+        """
+        Espera hasta tener resultados "suficientemente buenos" del crawl en segundo plano.
+
+        La espera termina cuando se almacenan min_new_docs documentos nuevos, cuando
+        se agota latency_budget o cuando el crawl finaliza. El crawl continúa en
+        segundo plano en los dos primeros casos.
+
+        Returns:
+            Dict: documentos recibidos, motivo de parada, tiempo transcurrido y estado del crawl
+        """
+        start_time = time.time()
+        documents = []
+
+        for document in self.iter_stored_documents(timeout=latency_budget):
+            documents.append(document)
+            if len(documents) >= min_new_docs:
+                break
+
+        if len(documents) >= min_new_docs:
+            stop_reason = 'min_new_docs'
+        elif self.is_crawling_in_background():
+            stop_reason = 'latency_budget'
+        else:
+            stop_reason = 'crawl_finished'
+
+        elapsed = time.time() - start_time
+        print(f"⏱️ Resultados parciales: {len(documents)} documentos en {elapsed:.1f}s ({stop_reason})")
+
+        return {
+            'documents': documents,
+            'stop_reason': stop_reason,
+            'elapsed': elapsed,
+            'crawl_running': self.is_crawling_in_background()
+        }
+
+    def _train_link_classifier(self, url: str, stored: bool):
+        """Entrena el clasificador de enlaces con el resultado de una página descargada"""
+        with self.visited_lock:
+            anchor_text = self.link_anchor_texts.pop(url, "")
+        self.link_classifier.update(url, anchor_text, stored)
+
+    def _add_to_collection(self, doc_id: str, document: str, metadata: Dict):
+        """
+        Añade un documento a ChromaDB (y al índice BM25) y lo publica para los consumidores en streaming.
+        Los países y ciudades de los metadatos se marcan como claves place_<nombre> para filtrar por destino.
+        """
+        metadata = {**metadata, **place_metadata(metadata)}
+        self.collection.add(
+            documents=[document],
+            metadatas=[metadata],
+            ids=[doc_id]
+        )
+        if self.sparse_index is not None:
+            self.sparse_index.add_documents([doc_id], [document])
+        if self.answer_cache is not None:
+            self.answer_cache.bump_version(self.collection.name)
+
+        self.stored_documents.put({
+            'doc_id': doc_id,
+            'url': metadata.get('url', ''),
+            'title': metadata.get('title', ''),
+            'stored_at': time.time()
+        })
+
     def _save_original_content(self, content_data: Dict, depth: int, thread_id: int):
         """Guarda el contenido original sin procesar con Mistral"""
         with self.collection_lock:
@@ -1566,11 +1863,7 @@ class TourismCrawler:
             print(f"   🧵 Thread ID: {thread_id}")
             print(f"   ✅ Chunk guardado exitosamente\n")
             
-            self.collection.add(
-                documents=[content_data["content"]],
-                metadatas=[metadata],
-                ids=[doc_id]
-            )
+            self._add_to_collection(doc_id, content_data["content"], metadata)
             
             
             self._save_chunk_to_file(doc_id, content_data["content"], metadata, "Crawler (sin procesamiento)")
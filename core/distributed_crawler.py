@@ -0,0 +1,607 @@
+"""
+Crawling distribuido entre varios procesos o máquinas
+Un coordinador reparte la frontera por hash del host entre los workers, mantiene
+el conjunto global de URLs visitadas y es el único proceso que escribe en ChromaDB.
+La comunicación se hace por TCP con multiprocessing.managers, sin dependencias externas
+"""
+
+import argparse
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.crawler import TourismCrawler
+from core.places import place_metadata
+
+
+DEFAULT_AUTHKEY = b'tourism-crawler'
+
+
+def host_partition(url: str, num_partitions: int) -> int:
+    """
+    Partición asignada al host de una URL.
+
+    Se usa crc32 en lugar de hash() porque este último cambia entre procesos,
+    y todas las URLs de un host deben ir siempre al mismo worker.
+    """
+    host = urlparse(url).netloc.lower().split(':')[0]
+    if host.startswith('www.'):
+        host = host[4:]
+    return zlib.crc32(host.encode('utf-8')) % num_partitions
+
+
+class CoordinatorState:
+    """Estado compartido del crawl distribuido (vive en el proceso coordinador)"""
+
+    def __init__(self, num_partitions: int, keywords: List[str], max_pages: int = 100, max_depth: int = 2,
+                 lease_timeout: float = 30.0):
+        """
+        Args:
+            num_partitions: Particiones de la frontera (por hash del host)
+            keywords: Palabras clave del crawl
+            max_pages: Presupuesto global de páginas
+            max_depth: Profundidad máxima
+            lease_timeout: Segundos sin latido tras los que un worker pierde sus particiones
+        """
+        self.num_partitions = max(1, num_partitions)
+        self.lease_timeout = lease_timeout
+        self.config = {
+            'keywords': list(keywords),
+            'max_pages': max_pages,
+            'max_depth': max_depth,
+            'num_partitions': self.num_partitions,
+            'lease_timeout': lease_timeout
+        }
+
+        self.partitions = [deque() for _ in range(self.num_partitions)]
+        self.visited = set()
+        self.enqueued = set()
+        self.in_flight: List[Dict[str, Tuple[int, int]]] = [{} for _ in range(self.num_partitions)]
+        self.leases: Dict[int, Tuple[int, float]] = {}
+        self.leases_expired = 0
+        self.urls_requeued = 0
+        self.pages_reserved = 0
+        self.next_worker_id = 0
+        self.worker_stats: Dict[int, Dict] = {}
+        self.classifier_updates: List[Dict] = []
+        self.documents = queue.Queue()
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def get_config(self) -> Dict:
+        """Configuración del crawl que necesitan los workers"""
+        return dict(self.config)
+
+    def register_worker(self) -> int:
+        """Da un identificador a un nuevo worker; las particiones se obtienen con acquire_partitions"""
+        with self.lock:
+            worker_id = self.next_worker_id
+            self.next_worker_id += 1
+            return worker_id
+
+    def _expire_leases(self, now: float):
+        """Libera las particiones de workers sin latido y devuelve sus URLs en curso a la frontera"""
+        for partition, (_, expires_at) in list(self.leases.items()):
+            if expires_at > now:
+                continue
+            del self.leases[partition]
+            self.leases_expired += 1
+            for url, (depth, _) in self.in_flight[partition].items():
+                self.visited.discard(url)
+                self.enqueued.add(url)
+                self.pages_reserved -= 1
+                self.partitions[partition].appendleft((url, depth))
+                self.urls_requeued += 1
+            self.in_flight[partition].clear()
+
+    def acquire_partitions(self, worker_id: int, max_partitions: int = 1, pending_only: bool = False) -> List[int]:
+        """
+        Concede a un worker particiones libres (nunca asignadas o con el lease caducado).
+
+        Todas las URLs de una partición las procesa un único worker mientras
+        mantenga el lease. Se prefieren las particiones con más URLs pendientes.
+
+        Args:
+            worker_id: Worker que solicita trabajo
+            max_partitions: Particiones nuevas como máximo
+            pending_only: Conceder solo particiones con URLs pendientes (worker ocioso)
+
+        Returns:
+            List[int]: Particiones concedidas en esta llamada
+        """
+        with self.lock:
+            now = time.time()
+            self._expire_leases(now)
+            free = [partition for partition in range(self.num_partitions)
+                    if partition not in self.leases and (self.partitions[partition] or not pending_only)]
+            free.sort(key=lambda partition: -len(self.partitions[partition]))
+            granted = free[:max_partitions]
+            for partition in granted:
+                self.leases[partition] = (worker_id, now + self.lease_timeout)
+            return granted
+
+    def heartbeat(self, worker_id: int) -> List[int]:
+        """Renueva los leases del worker; devuelve las particiones que conserva"""
+        with self.lock:
+            now = time.time()
+            self._expire_leases(now)
+            held = [partition for partition, (owner, _) in self.leases.items() if owner == worker_id]
+            for partition in held:
+                self.leases[partition] = (worker_id, now + self.lease_timeout)
+            return held
+
+    def add_urls(self, urls: List[Tuple[str, int]]) -> int:
+        """Añade URLs a la partición de su host si no se han visto antes"""
+        added = 0
+        with self.lock:
+            for url, depth in urls:
+                if url in self.visited or url in self.enqueued:
+                    continue
+                self.enqueued.add(url)
+                self.partitions[host_partition(url, self.num_partitions)].append((url, depth))
+                added += 1
+        return added
+
+    def next_url(self, worker_id: int) -> Optional[Tuple[str, int]]:
+        """
+        Entrega la siguiente URL de alguna de las particiones del worker.
+
+        La URL se marca como visitada y consume una página del presupuesto global
+        de forma atómica, de modo que ningún otro worker puede descargarla.
+        """
+        with self.lock:
+            for partition, (owner, _) in list(self.leases.items()):
+                if owner != worker_id:
+                    continue
+                frontier = self.partitions[partition]
+                while frontier and not self.stopped:
+                    url, depth = frontier.popleft()
+                    self.enqueued.discard(url)
+                    if url in self.visited:
+                        continue
+
+                    if self.pages_reserved >= self.config['max_pages']:
+                        self.stopped = True
+                        return None
+
+                    self.visited.add(url)
+                    self.pages_reserved += 1
+                    self.in_flight[partition][url] = (depth, worker_id)
+                    return url, depth
+            return None
+
+    def task_done(self, worker_id: int, url: str, new_links: List[Tuple[str, int]] = None):
+        """Registra que una URL terminó de procesarse y encola sus enlaces"""
+        with self.lock:
+            partition = host_partition(url, self.num_partitions)
+            entry = self.in_flight[partition].get(url)
+            if entry is not None and entry[1] == worker_id:
+                del self.in_flight[partition][url]
+            elif entry is None and url not in self.visited:
+                # El lease caducó y la URL volvió a la frontera, pero el worker la terminó igualmente
+                self.visited.add(url)
+                self.pages_reserved += 1
+        if new_links:
+            self.add_urls(new_links)
+
+    def submit_document(self, doc_id: str, document: str, metadata: Dict):
+        """Envía un documento al escritor único de la base vectorial"""
+        self.documents.put((doc_id, document, metadata))
+
+    def take_documents(self, max_items: int, timeout: float) -> List[Tuple[str, str, Dict]]:
+        """Extrae un lote de documentos pendientes de escribir"""
+        batch = []
+        try:
+            batch.append(self.documents.get(timeout=timeout))
+            while len(batch) < max_items:
+                batch.append(self.documents.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def report_worker_stats(self, worker_id: int, stats: Dict):
+        with self.lock:
+            self.worker_stats[worker_id] = dict(stats)
+
+    def submit_classifier_update(self, worker_id: int, update: Dict):
+        """Recibe la actualización del clasificador de enlaces de un worker (se fusiona en el coordinador)"""
+        with self.lock:
+            self.classifier_updates.append(update)
+
+    def take_classifier_updates(self) -> List[Dict]:
+        with self.lock:
+            updates, self.classifier_updates = self.classifier_updates, []
+            return updates
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+
+    def is_finished(self) -> bool:
+        """El crawl termina al agotar el presupuesto o cuando no quedan URLs pendientes ni en curso"""
+        with self.lock:
+            if self.stopped:
+                return True
+            self._expire_leases(time.time())
+            return not any(self.partitions) and not any(self.in_flight)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'pages_reserved': self.pages_reserved,
+                'visited': len(self.visited),
+                'pending': [len(frontier) for frontier in self.partitions],
+                'in_flight': [len(urls) for urls in self.in_flight],
+                'leases': {partition: owner for partition, (owner, _) in self.leases.items()},
+                'leases_expired': self.leases_expired,
+                'urls_requeued': self.urls_requeued,
+                'workers_registered': self.next_worker_id,
+                'documents_pending': self.documents.qsize(),
+                'workers': dict(self.worker_stats)
+            }
+
+
+class VectorStoreWriter(threading.Thread):
+    """Hilo del coordinador que escribe en lotes los documentos enviados por los workers"""
+
+    def __init__(self, state: CoordinatorState, collection, batch_size: int = 16, sparse_index=None,
+                 answer_cache=None):
+        super().__init__(daemon=True)
+        self.state = state
+        self.collection = collection
+        self.sparse_index = sparse_index
+        self.answer_cache = answer_cache
+        self.batch_size = batch_size
+        self.documents_written = 0
+        self.write_errors = 0
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self._write(self.state.take_documents(self.batch_size, timeout=0.5))
+        self.flush()
+
+    def flush(self):
+        """Escribe los documentos que queden pendientes"""
+        while True:
+            batch = self.state.take_documents(self.batch_size, timeout=0.01)
+            if not batch:
+                break
+            self._write(batch)
+
+    def _write(self, batch: List[Tuple[str, str, Dict]]):
+        if not batch:
+            return
+        try:
+            self.collection.add(
+                ids=[doc_id for doc_id, _, _ in batch],
+                documents=[document for _, document, _ in batch],
+                metadatas=[{**metadata, **place_metadata(metadata)} for _, _, metadata in batch]
+            )
+            if self.sparse_index is not None:
+                self.sparse_index.add_documents([doc_id for doc_id, _, _ in batch],
+                                                [document for _, document, _ in batch])
+            if self.answer_cache is not None:
+                self.answer_cache.bump_version(self.collection.name)
+            self.documents_written += len(batch)
+        except Exception as e:
+            self.write_errors += len(batch)
+            print(f"❌ Error escribiendo lote de {len(batch)} documentos en ChromaDB: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class DistributedCrawlCoordinator:
+    """Servidor TCP que expone el estado compartido y escribe en la base vectorial"""
+
+    def __init__(self,
+                 collection,
+                 num_partitions: int,
+                 keywords: List[str],
+                 max_pages: int = 100,
+                 max_depth: int = 2,
+                 address: Tuple[str, int] = ('127.0.0.1', 0),
+                 authkey: bytes = DEFAULT_AUTHKEY,
+                 batch_size: int = 16,
+                 sparse_index=None,
+                 answer_cache=None):
+        self.state = CoordinatorState(num_partitions, keywords, max_pages=max_pages, max_depth=max_depth)
+        self.writer = VectorStoreWriter(self.state, collection, batch_size=batch_size,
+                                        sparse_index=sparse_index, answer_cache=answer_cache)
+        self.requested_address = address
+        self.authkey = authkey
+        self.address: Optional[Tuple[str, int]] = None
+        self.server = None
+
+    def start(self) -> Tuple[str, int]:
+        """Arranca el servidor y el escritor; devuelve la dirección en la que escucha"""
+        state = self.state
+
+        class _CoordinatorManager(BaseManager):
+            pass
+
+        _CoordinatorManager.register('get_state', callable=lambda: state)
+
+        manager = _CoordinatorManager(address=self.requested_address, authkey=self.authkey)
+        self.server = manager.get_server()
+        self.address = self.server.address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.writer.start()
+
+        print(f"🛰️ Coordinador de crawl distribuido escuchando en {self.address[0]}:{self.address[1]} "
+              f"({self.state.num_partitions} particiones)")
+        return self.address
+
+    def seed(self, urls: List[str], depth: int = 0) -> int:
+        return self.state.add_urls([(url, depth) for url in urls])
+
+    def wait(self, timeout: float = 600.0, poll_interval: float = 1.0) -> bool:
+        """Espera a que termine el crawl; devuelve False si se alcanzó el timeout"""
+        start_time = time.time()
+        while not self.state.is_finished():
+            if time.time() - start_time > timeout:
+                print("⏰ Timeout del crawl distribuido alcanzado")
+                self.state.stop()
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def shutdown(self):
+        """Vacía la cola de escritura y cierra el servidor (los workers ya deben haber terminado)"""
+        self.state.stop()
+        self.writer.stop()
+        self.writer.join(timeout=30)
+        if self.server is not None:
+            self.server.stop_event.set()
+
+    def get_stats(self) -> Dict:
+        stats = self.state.get_stats()
+        stats['documents_written'] = self.writer.documents_written
+        stats['write_errors'] = self.writer.write_errors
+        return stats
+
+
+class _RemoteCollection:
+    """Sustituto de la colección de ChromaDB que reenvía los documentos al coordinador"""
+
+    def __init__(self, state):
+        self.state = state
+
+    def add(self, documents: List[str], metadatas: List[Dict], ids: List[str]):
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.state.submit_document(doc_id, document, metadata)
+
+
+class DistributedCrawlerWorker(TourismCrawler):
+    """Crawler que consume una partición de la frontera compartida"""
+
+    def __init__(self, state, worker_id: int, num_threads: int = 10, min_threads: int = 2,
+                 enable_mistral_processing: bool = False):
+        config = state.get_config()
+        
+        # El presupuesto global lo controla el coordinador; el límite local solo debe no cortar antes
+        super().__init__(
+            [],
+            max_pages=config['max_pages'] + 1,
+            max_depth=config['max_depth'],
+            num_threads=num_threads,
+            enable_mistral_processing=enable_mistral_processing,
+            min_threads=min_threads,
+            use_sitemaps=False,
+            collection=_RemoteCollection(state)
+        )
+        self.state = state
+        self.worker_id = worker_id
+        self.current_query_keywords = config['keywords']
+
+    def run_worker(self, poll_interval: float = 0.2) -> int:
+        """
+        Procesa URLs de las particiones concedidas hasta que el coordinador da el crawl por terminado.
+
+        Todas las URLs de un host llegan al mismo worker mientras mantenga el
+        lease de su partición, por lo que el circuit breaker, los timeouts
+        adaptativos y el detector de trampas de este proceso ven todo el tráfico
+        de sus hosts. El worker renueva sus leases con latidos y, cuando se queda
+        sin trabajo, toma particiones huérfanas (sin worker o de un worker caído).
+        """
+        print(f"👷 Worker {self.worker_id} iniciado (hasta {self.num_threads} hilos)")
+        start_time = time.time()
+        heartbeat_interval = self.state.get_config()['lease_timeout'] / 3
+        partitions = self.state.acquire_partitions(self.worker_id)
+        last_heartbeat = time.time()
+        classifier_base = self.link_classifier.get_state()
+
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            active_futures = {}
+
+            while not self.state.is_finished():
+                if time.time() - last_heartbeat >= heartbeat_interval:
+                    partitions = self.state.heartbeat(self.worker_id)
+                    last_heartbeat = time.time()
+
+                for future in [f for f in active_futures if f.done()]:
+                    url = active_futures.pop(future)
+                    new_links = []
+                    try:
+                        result = future.result()
+                        if result and result.get("success"):
+                            new_links = result.get("new_links", [])
+                    except Exception as e:
+                        print(f"[Worker-{self.worker_id}] Error procesando resultado: {e}")
+                    self.state.task_done(self.worker_id, url, new_links)
+
+                url_data = None
+                while len(active_futures) < self.concurrency.current:
+                    url_data = self.state.next_url(self.worker_id)
+                    if url_data is None:
+                        break
+                    if (self.fetcher.health.is_circuit_open(url_data[0]) or
+                            not self.trap_detector.should_fetch(url_data[0])):
+                        self.state.task_done(self.worker_id, url_data[0])
+                        continue
+                    active_futures[executor.submit(self._process_single_url, url_data)] = url_data[0]
+
+                if url_data is None and len(active_futures) < self.concurrency.current:
+                    partitions += self.state.acquire_partitions(self.worker_id, pending_only=True)
+
+                time.sleep(poll_interval)
+
+            for future, url in active_futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[Worker-{self.worker_id}] Error procesando resultado: {e}")
+                self.state.task_done(self.worker_id, url)
+
+        # Solo el coordinador persiste el clasificador, tras fusionar las actualizaciones de todos los workers
+        self.state.submit_classifier_update(self.worker_id, self.link_classifier.delta_since(classifier_base))
+        self.state.report_worker_stats(self.worker_id, {
+            'pages_processed': self.pages_processed,
+            'pages_added_to_db': self.pages_added_to_db,
+            'errors': self.errors_count,
+            'elapsed': time.time() - start_time,
+            'partitions': partitions,
+            'concurrency': self.concurrency.get_metrics()
+        })
+        print(f"👷 Worker {self.worker_id} finalizado: {self.pages_added_to_db} documentos enviados al coordinador")
+        return self.pages_added_to_db
+
+
+class CrawlWorkerManager(BaseManager):
+    pass
+
+
+CrawlWorkerManager.register('get_state')
+
+
+def run_worker(host: str, port: int, authkey: bytes = DEFAULT_AUTHKEY, num_threads: int = 10,
+               min_threads: int = 2, enable_mistral_processing: bool = False) -> int:
+    """Conecta un worker (local o en otra máquina) al coordinador y procesa su partición"""
+    manager = CrawlWorkerManager(address=(host, port), authkey=authkey)
+    manager.connect()
+    state = manager.get_state()
+
+    worker_id = state.register_worker()
+    worker = DistributedCrawlerWorker(state, worker_id, num_threads=num_threads, min_threads=min_threads,
+                                      enable_mistral_processing=enable_mistral_processing)
+    return worker.run_worker()
+
+
+def run_distributed_crawl(keywords: List[str],
+                          crawler: TourismCrawler = None,
+                          num_workers: int = 4,
+                          remote_workers: int = 0,
+                          max_pages: int = 100,
+                          max_depth: int = 2,
+                          threads_per_worker: int = 10,
+                          improved_query: str = None,
+                          address: Tuple[str, int] = ('127.0.0.1', 0),
+                          authkey: bytes = DEFAULT_AUTHKEY,
+                          timeout: float = 600.0) -> Dict:
+    """
+    Ejecuta un crawl distribuido por palabras clave.
+
+    El proceso actual actúa como coordinador y escritor único; se lanzan
+    num_workers procesos locales y se crean remote_workers particiones más para
+    workers que se conecten desde otras máquinas con
+    `python -m core.distributed_crawler worker --host <ip> --port <puerto>`.
+    Las particiones se conceden como leases renovados por latido: si nadie se
+    conecta o un worker cae, los workers ociosos toman sus particiones y las URLs
+    que tenía en curso vuelven a la frontera.
+
+    Args:
+        keywords: Palabras clave de la búsqueda
+        crawler: Crawler cuya colección y búsqueda de semillas se reutilizan
+        num_workers: Procesos worker locales
+        remote_workers: Particiones adicionales pensadas para workers remotos
+        max_pages: Presupuesto global de páginas
+        max_depth: Profundidad máxima
+        threads_per_worker: Hilos máximos por worker
+        improved_query: Consulta mejorada para la búsqueda de semillas
+        address: Dirección de escucha del coordinador (puerto 0 = libre)
+        authkey: Clave compartida con los workers
+        timeout: Tiempo máximo del crawl en segundos
+
+    Returns:
+        Dict con las estadísticas del crawl
+    """
+    crawler = crawler or TourismCrawler([], enable_mistral_processing=False)
+    crawler.current_query_keywords = keywords
+
+    initial_urls = crawler.google_search_links(keywords, num_results=20, improved_query=improved_query)
+    if not initial_urls:
+        print("❌ No se encontraron URLs iniciales")
+        return {'documents_written': 0}
+
+    seeds = list(initial_urls)
+    if crawler.use_sitemaps:
+        crawler.seed_from_sitemaps(initial_urls)
+        while not crawler.urls_to_visit.empty():
+            try:
+                seeds.append(crawler.urls_to_visit.get_nowait()[0])
+            except queue.Empty:
+                break
+
+    coordinator = DistributedCrawlCoordinator(
+        crawler.collection,
+        num_partitions=num_workers + remote_workers,
+        keywords=keywords,
+        max_pages=max_pages,
+        max_depth=max_depth,
+        address=address,
+        authkey=authkey,
+        sparse_index=crawler.sparse_index,
+        answer_cache=crawler.answer_cache
+    )
+    host, port = coordinator.start()
+    coordinator.seed(seeds)
+
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=run_worker, args=(host, port, authkey, threads_per_worker), daemon=True)
+        for _ in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+
+    start_time = time.time()
+    try:
+        coordinator.wait(timeout=timeout)
+    finally:
+        coordinator.state.stop()
+        for process in processes:
+            process.join(timeout=60)
+            if process.is_alive():
+                process.terminate()
+        coordinator.shutdown()
+
+    examples = crawler.link_classifier.merge_updates(coordinator.state.take_classifier_updates())
+    if examples:
+        crawler.link_classifier.save()
+        print(f"🧠 Clasificador de enlaces actualizado con {examples} ejemplos de los workers")
+
+    stats = coordinator.get_stats()
+    stats['elapsed'] = time.time() - start_time
+    print(f"🎉 Crawl distribuido finalizado: {stats['pages_reserved']} páginas, "
+          f"{stats['documents_written']} documentos escritos en {stats['elapsed']:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker del crawl distribuido")
+    parser.add_argument("mode", choices=["worker"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--authkey", default=DEFAULT_AUTHKEY.decode())
+    parser.add_argument("--threads", type=int, default=10)
+    args = parser.parse_args()
+
+    run_worker(args.host, args.port, args.authkey.encode(), num_threads=args.threads)
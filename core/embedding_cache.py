@@ -0,0 +1,98 @@
+"""
+Caché LRU de embeddings de consultas
+Evita codificar varias veces el mismo texto de consulta en un turno: la
+recuperación básica, la mejorada y las nuevas consultas tras un crawl ACO
+comparten una caché por función de embeddings
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Clave de caché de una consulta (minúsculas y espacios colapsados)"""
+    return ' '.join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Caché acotada y segura entre hilos de texto de consulta normalizado a vector"""
+
+    def __init__(self, embedding_function: Callable[[List[str]], List], max_entries: int = 1024):
+        """
+        Args:
+            embedding_function: Función de embeddings (estilo Chroma: lista de textos a lista de vectores)
+            max_entries: Número máximo de consultas guardadas
+        """
+        self.embedding_function = embedding_function
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding de una consulta (solo se calcula si no está en la caché)"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings de varias consultas; las que faltan se codifican en una sola llamada"""
+        keys = [normalize_query(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            vectors = self.embedding_function(missing)
+            computed = {}
+            for key, vector in zip(missing, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                computed[key] = vector
+            found.update(computed)
+
+            with self.lock:
+                self.entries.update(computed)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+_shared_caches: Dict[int, QueryEmbeddingCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_query_embedding_cache(embedding_function: Callable[[List[str]], List],
+                              max_entries: int = 1024) -> QueryEmbeddingCache:
+    """Caché compartida por todos los componentes que usan la misma función de embeddings"""
+    with _shared_caches_lock:
+        cache = _shared_caches.get(id(embedding_function))
+        if cache is None or cache.embedding_function is not embedding_function:
+            cache = QueryEmbeddingCache(embedding_function, max_entries=max_entries)
+            _shared_caches[id(embedding_function)] = cache
+        return cache
@@ -0,0 +1,226 @@
+"""
+Descarga de páginas en streaming con detección del tipo de contenido
+Aborta las respuestas que no son HTML a partir de las cabeceras y limita
+los bytes leídos por página (configurable por host)
+"""
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from core.host_health import HostHealthTracker, BLOCKING_STATUS_CODES
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5'
+}
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+AMBIGUOUS_CONTENT_TYPES = ('', 'application/octet-stream', 'text/plain', 'binary/octet-stream')
+
+BINARY_SIGNATURES = (b'%PDF', b'\x89PNG', b'GIF8', b'\xff\xd8\xff', b'PK\x03\x04', b'RIFF', b'\x1f\x8b')
+
+
+@dataclass
+class FetchResult:
+    """Resultado de una descarga en streaming"""
+    url: str
+    status_code: int
+    text: str = ""
+    content_type: str = ""
+    bytes_read: int = 0
+    truncated: bool = False
+    skipped_reason: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200 and self.skipped_reason is None
+
+
+class PageFetcher:
+    """Cliente HTTP que descarga solo contenido HTML y hasta un máximo de bytes por página"""
+
+    def __init__(self,
+                 max_bytes: int = 1_500_000,
+                 host_byte_limits: Dict[str, int] = None,
+                 chunk_size: int = 16384,
+                 headers: Dict[str, str] = None,
+                 health: HostHealthTracker = None):
+        self.max_bytes = max_bytes
+        self.host_byte_limits = dict(host_byte_limits or {})
+        self.chunk_size = chunk_size
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.health = health or HostHealthTracker()
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'pages_fetched': 0,
+            'non_html_skipped': 0,
+            'circuit_open_skipped': 0,
+            'truncated': 0,
+            'bytes_read': 0,
+            'bytes_saved': 0
+        }
+
+    def set_host_byte_limit(self, host: str, max_bytes: int):
+        """Configura el máximo de bytes a leer para un host (y sus subdominios)"""
+        self.host_byte_limits[host.lower()] = max_bytes
+
+    def get_byte_limit(self, url: str) -> int:
+        """Obtiene el límite de bytes aplicable a una URL"""
+        host = urlparse(url).netloc.lower().split(':')[0]
+
+        while host:
+            if host in self.host_byte_limits:
+                return self.host_byte_limits[host]
+            if '.' not in host:
+                break
+            host = host.split('.', 1)[1]
+
+        return self.max_bytes
+
+    def fetch(self, url: str, timeout: float = None) -> FetchResult:
+        """
+        Descarga una URL en streaming.
+
+        Las respuestas cuyo Content-Type no es HTML se cierran sin leer el cuerpo.
+        Si el Content-Type es ambiguo se inspeccionan los primeros bytes.
+        Los hosts con el circuito abierto no reciben peticiones.
+
+        Args:
+            url: URL a descargar
+            timeout: Timeout en segundos (None = timeout adaptativo del host)
+
+        Returns:
+            FetchResult con el texto decodificado o el motivo por el que se descartó
+        """
+        if not self.health.allow_request(url):
+            with self.stats_lock:
+                self.stats['circuit_open_skipped'] += 1
+            return FetchResult(url=url, status_code=0, skipped_reason='circuit_open')
+
+        if timeout is None:
+            timeout = self.health.get_timeout(url)
+
+        start_time = time.time()
+        try:
+            response = self.session.get(url, timeout=timeout, stream=True)
+        except Exception as e:
+            # Cualquier excepción debe registrarse: si no, la petición de prueba de un
+            # circuito half-open quedaría en curso para siempre
+            self.health.record_failure(url, type(e).__name__)
+            raise
+
+        try:
+            result = self._read_response(url, response)
+        except Exception as e:
+            self.health.record_failure(url, type(e).__name__)
+            raise
+        finally:
+            response.close()
+
+        latency = time.time() - start_time
+        if result.status_code in BLOCKING_STATUS_CODES or result.status_code >= 500:
+            self.health.record_failure(url, f"HTTP {result.status_code}")
+        elif result.status_code == 200 and result.text and self.health.looks_blocked(result.text):
+            result.skipped_reason = 'blocked'
+            self.health.record_failure(url, 'captcha')
+        else:
+            self.health.record_success(url, latency)
+
+        return result
+
+    def _read_response(self, url: str, response) -> FetchResult:
+        """Lee el cuerpo de la respuesta respetando el tipo de contenido y el límite de bytes"""
+        content_type_header = response.headers.get('Content-Type', '')
+        content_type = content_type_header.split(';')[0].strip().lower()
+        result = FetchResult(url=url, status_code=response.status_code, content_type=content_type)
+
+        if response.status_code != 200:
+            return result
+
+        if content_type and content_type not in HTML_CONTENT_TYPES and content_type not in AMBIGUOUS_CONTENT_TYPES:
+            return self._skip(result, 'non_html', response)
+
+        byte_limit = self.get_byte_limit(url)
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > byte_limit:
+            result.truncated = True
+
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            if not chunk:
+                continue
+
+            if not body and content_type not in HTML_CONTENT_TYPES and not self._looks_like_html(chunk):
+                return self._skip(result, 'non_html', response)
+            if not body and chunk.startswith(BINARY_SIGNATURES):
+                return self._skip(result, 'non_html', response)
+
+            body.extend(chunk)
+            if len(body) >= byte_limit:
+                result.truncated = True
+                del body[byte_limit:]
+                break
+
+        result.bytes_read = len(body)
+        result.text = self._decode(bytes(body), content_type_header)
+
+        with self.stats_lock:
+            self.stats['pages_fetched'] += 1
+            self.stats['bytes_read'] += result.bytes_read
+            if result.truncated:
+                self.stats['truncated'] += 1
+                if content_length and content_length.isdigit():
+                    self.stats['bytes_saved'] += int(content_length) - result.bytes_read
+
+        return result
+
+    def _skip(self, result: FetchResult, reason: str, response) -> FetchResult:
+        """Marca una respuesta como descartada sin leer el resto del cuerpo"""
+        result.skipped_reason = reason
+
+        with self.stats_lock:
+            self.stats['non_html_skipped'] += 1
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit():
+                self.stats['bytes_saved'] += int(content_length)
+
+        return result
+
+    def _looks_like_html(self, first_chunk: bytes) -> bool:
+        """Inspecciona los primeros bytes para decidir si el cuerpo es HTML"""
+        head = first_chunk[:1024].lstrip(b'\xef\xbb\xbf \t\r\n').lower()
+        return head.startswith((b'<!doctype html', b'<html', b'<head', b'<!--')) or b'<html' in head
+
+    def _decode(self, body: bytes, content_type_header: str) -> str:
+        """Decodifica el cuerpo usando el charset de la cabecera o de la etiqueta meta"""
+        charset_match = re.search(r'charset=([\w-]+)', content_type_header, re.IGNORECASE)
+        if not charset_match:
+            charset_match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', body[:4096], re.IGNORECASE)
+
+        encoding = 'utf-8'
+        if charset_match:
+            encoding = charset_match.group(1)
+            if isinstance(encoding, bytes):
+                encoding = encoding.decode('ascii', errors='ignore')
+
+        try:
+            return body.decode(encoding, errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtiene estadísticas de descarga"""
+        with self.stats_lock:
+            return self.stats.copy()
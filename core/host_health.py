@@ -0,0 +1,202 @@
+"""
+Seguimiento de la salud de cada host para el crawler
+Implementa un circuit breaker por host con enfriamiento exponencial y
+timeouts adaptativos calculados a partir de los percentiles de latencia observados
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+BLOCKING_STATUS_CODES = (401, 403, 429, 503)
+
+CAPTCHA_MARKERS = (
+    'captcha', 'are you a robot', 'are you human', 'unusual traffic',
+    'cf-challenge', 'challenge-platform', 'access denied', 'request blocked'
+)
+
+
+class HostState:
+    """Estado de salud de un host"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, latency_window: int):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.latencies = deque(maxlen=latency_window)
+        self.successes = 0
+        self.failures = 0
+        self.last_failure_reason: Optional[str] = None
+
+
+class HostHealthTracker:
+    """Circuit breaker por host con timeouts adaptativos"""
+
+    def __init__(self,
+                 failure_threshold: int = 3,
+                 base_cooldown: float = 30.0,
+                 max_cooldown: float = 600.0,
+                 default_timeout: float = 15.0,
+                 min_timeout: float = 3.0,
+                 max_timeout: float = 30.0,
+                 timeout_percentile: float = 95.0,
+                 timeout_multiplier: float = 2.0,
+                 min_latency_samples: int = 5,
+                 latency_window: int = 50):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.min_latency_samples = min_latency_samples
+        self.latency_window = latency_window
+
+        self.hosts: Dict[str, HostState] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        """Obtiene el host normalizado de una URL"""
+        host = urlparse(url).netloc.lower().split(':')[0]
+        return host[4:] if host.startswith('www.') else host
+
+    def _get_state(self, host: str) -> HostState:
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.latency_window)
+        return self.hosts[host]
+
+    def is_circuit_open(self, url: str) -> bool:
+        """Indica si el circuito del host está abierto (sin consumir la petición de prueba)"""
+        host = self.get_host(url)
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                return False
+            if state.state == HostState.OPEN:
+                return time.time() < state.open_until
+            return state.state == HostState.HALF_OPEN and state.probe_in_flight
+
+    def allow_request(self, url: str) -> bool:
+        """
+        Decide si se puede enviar una petición al host.
+
+        Cuando el enfriamiento de un circuito abierto termina, se permite una
+        única petición de prueba (half-open) antes de volver a cerrarlo.
+        """
+        host = self.get_host(url)
+        with self.lock:
+            state = self._get_state(host)
+
+            if state.state == HostState.CLOSED:
+                return True
+
+            if state.state == HostState.OPEN:
+                if time.time() < state.open_until:
+                    return False
+                state.state = HostState.HALF_OPEN
+                state.probe_in_flight = False
+
+            if state.probe_in_flight:
+                return False
+            state.probe_in_flight = True
+            return True
+
+    def record_success(self, url: str, latency: float):
+        """Registra una respuesta correcta y su latencia"""
+        host = self.get_host(url)
+        with self.lock:
+            state = self._get_state(host)
+            state.latencies.append(latency)
+            state.successes += 1
+            state.consecutive_failures = 0
+            state.probe_in_flight = False
+            if state.state != HostState.CLOSED:
+                print(f"🟢 Circuito cerrado para {host}")
+            state.state = HostState.CLOSED
+            state.times_opened = 0
+
+    def record_failure(self, url: str, reason: str):
+        """
+        Registra un fallo (bloqueo, CAPTCHA, timeout, conexión reiniciada...).
+
+        La duración de los fallos no entra en la ventana de latencias: un timeout
+        dura lo mismo que el timeout concedido y, si contara, cada timeout
+        elevaría el siguiente hasta max_timeout.
+        """
+        host = self.get_host(url)
+        with self.lock:
+            state = self._get_state(host)
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_failure_reason = reason
+            state.probe_in_flight = False
+
+            if state.state == HostState.HALF_OPEN or state.consecutive_failures >= self.failure_threshold:
+                state.times_opened += 1
+                cooldown = min(self.base_cooldown * (2 ** (state.times_opened - 1)), self.max_cooldown)
+                state.state = HostState.OPEN
+                state.open_until = time.time() + cooldown
+                print(f"🔴 Circuito abierto para {host} durante {cooldown:.0f}s ({reason})")
+
+    def get_timeout(self, url: str) -> float:
+        """Calcula un timeout adaptado a la latencia observada del host"""
+        host = self.get_host(url)
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or len(state.latencies) < self.min_latency_samples:
+                return self.default_timeout
+            latencies = np.array(state.latencies)
+
+        percentile = float(np.percentile(latencies, self.timeout_percentile))
+        return max(self.min_timeout, min(self.max_timeout, percentile * self.timeout_multiplier))
+
+    @staticmethod
+    def looks_blocked(text: str) -> bool:
+        """
+        Detecta páginas de CAPTCHA o bloqueo.
+
+        Solo se consideran el título y las páginas cortas, ya que muchas páginas
+        normales incluyen scripts de reCAPTCHA en formularios.
+        """
+        title_match = re.search(r'<title[^>]*>(.*?)</title>', text[:5000], re.IGNORECASE | re.DOTALL)
+        if title_match and any(marker in title_match.group(1).lower() for marker in CAPTCHA_MARKERS):
+            return True
+
+        return len(text) < 15000 and any(marker in text.lower() for marker in CAPTCHA_MARKERS)
+
+    def get_open_circuits(self) -> List[str]:
+        """Lista los hosts con el circuito abierto"""
+        now = time.time()
+        with self.lock:
+            return [host for host, state in self.hosts.items()
+                    if state.state == HostState.OPEN and now < state.open_until]
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Obtiene estadísticas por host"""
+        stats = {}
+        with self.lock:
+            hosts = list(self.hosts.items())
+        for host, state in hosts:
+            stats[host] = {
+                'state': state.state,
+                'successes': state.successes,
+                'failures': state.failures,
+                'last_failure_reason': state.last_failure_reason,
+                'timeout': self.get_timeout(f"http://{host}/")
+            }
+        return stats
@@ -0,0 +1,219 @@
+"""
+Clasificador de enlaces con aprendizaje en línea para el crawling enfocado
+Usa características hasheadas de los tokens de la URL y del texto del enlace
+con una regresión logística entrenada incrementalmente a partir de las páginas
+que realmente se guardaron en la base de datos
+"""
+
+import os
+import re
+import threading
+import zlib
+from collections import deque
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse, parse_qsl
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r'[a-záéíóúñü]+|\d+')
+
+
+class LinkClassifier:
+    """Regresión logística en línea sobre características hasheadas de enlaces"""
+
+    def __init__(self,
+                 n_features: int = 2 ** 18,
+                 learning_rate: float = 0.2,
+                 l2: float = 1e-5,
+                 min_updates: int = 20,
+                 model_path: str = os.path.join("crawler_state", "link_classifier.npz")):
+        """
+        Args:
+            n_features: Tamaño del espacio de características hasheadas
+            learning_rate: Tasa de aprendizaje del descenso por gradiente estocástico
+            l2: Regularización L2 aplicada a los pesos activos
+            min_updates: Ejemplos necesarios antes de usar la puntuación para priorizar
+            model_path: Ruta donde se persiste el modelo entre sesiones
+        """
+        self.n_features = n_features
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.min_updates = min_updates
+        self.model_path = model_path
+
+        self.weights = np.zeros(n_features, dtype=np.float32)
+        self.bias = 0.0
+        self.updates = 0
+        self.positives = 0
+        self.recent_labels = deque(maxlen=100)
+        self.lock = threading.Lock()
+
+        self._load()
+
+    def _load(self):
+        """Carga el modelo guardado en sesiones anteriores"""
+        try:
+            if os.path.exists(self.model_path):
+                data = np.load(self.model_path)
+                if data['weights'].shape[0] == self.n_features:
+                    self.weights = data['weights'].astype(np.float32)
+                    self.bias = float(data['bias'])
+                    self.updates = int(data['updates'])
+                    self.positives = int(data['positives'])
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el clasificador de enlaces: {e}")
+
+    def save(self):
+        """Guarda el modelo para reutilizarlo en la siguiente sesión"""
+        try:
+            os.makedirs(os.path.dirname(self.model_path) or '.', exist_ok=True)
+            with self.lock:
+                weights = self.weights.copy()
+                bias, updates, positives = self.bias, self.updates, self.positives
+            with open(self.model_path, 'wb') as f:
+                np.savez_compressed(f, weights=weights, bias=bias, updates=updates, positives=positives)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el clasificador de enlaces: {e}")
+
+    def get_state(self) -> Dict:
+        """Copia del estado del modelo (punto de partida para calcular una actualización)"""
+        with self.lock:
+            return {'weights': self.weights.copy(), 'bias': self.bias,
+                    'updates': self.updates, 'positives': self.positives}
+
+    def delta_since(self, state: Dict) -> Dict:
+        """
+        Actualización dispersa del modelo desde un estado anterior.
+
+        Solo incluye los pesos que cambiaron, de modo que un worker puede
+        enviarla al coordinador sin transferir el vector completo.
+        """
+        with self.lock:
+            difference = self.weights - state['weights']
+            indices = np.flatnonzero(difference)
+            return {
+                'indices': indices.astype(np.int64),
+                'values': difference[indices].astype(np.float32),
+                'bias': self.bias - state['bias'],
+                'updates': self.updates - state['updates'],
+                'positives': self.positives - state['positives']
+            }
+
+    def merge_updates(self, updates: List[Dict]) -> int:
+        """
+        Incorpora las actualizaciones de varios workers.
+
+        Cada peso recibe la media (ponderada por ejemplos de entrenamiento) de
+        los cambios de los workers que lo modificaron: las características que
+        solo vio un worker conservan su aprendizaje completo y las compartidas
+        se promedian en lugar de sumarse.
+
+        Returns:
+            int: Ejemplos de entrenamiento incorporados
+        """
+        updates = [update for update in updates if update and update['updates'] > 0]
+        total = sum(update['updates'] for update in updates)
+        if not total:
+            return 0
+
+        weighted = np.zeros(self.n_features, dtype=np.float64)
+        examples = np.zeros(self.n_features, dtype=np.float64)
+        for update in updates:
+            weighted[update['indices']] += update['updates'] * update['values']
+            examples[update['indices']] += update['updates']
+        touched = np.flatnonzero(examples)
+
+        with self.lock:
+            self.weights[touched] += (weighted[touched] / examples[touched]).astype(np.float32)
+            self.bias += sum(update['updates'] * update['bias'] for update in updates) / total
+            self.updates += total
+            self.positives += sum(update['positives'] for update in updates)
+        return total
+
+    @property
+    def is_trained(self) -> bool:
+        """Indica si el modelo ha visto suficientes ejemplos para ser fiable"""
+        return self.updates >= self.min_updates
+
+    def _tokens(self, url: str, anchor_text: str) -> List[str]:
+        """Genera las características simbólicas de un enlace"""
+        parsed = urlparse(url.lower())
+        host = parsed.netloc.split(':')[0]
+        if host.startswith('www.'):
+            host = host[4:]
+
+        features = [f"host={host}"]
+        features.extend(f"host_tok={token}" for token in host.split('.')[:-1])
+
+        segments = [s for s in parsed.path.split('/') if s]
+        features.append(f"depth={min(len(segments), 6)}")
+        for index, segment in enumerate(segments):
+            features.extend(f"path={token}" for token in TOKEN_PATTERN.findall(segment) if not token.isdigit())
+            if index == 0:
+                features.append(f"first_seg={segment}")
+        if segments and '.' in segments[-1]:
+            features.append(f"ext={segments[-1].rsplit('.', 1)[-1]}")
+
+        features.extend(f"query={key}" for key, _ in parse_qsl(parsed.query, keep_blank_values=True))
+        features.extend(f"anchor={token}" for token in TOKEN_PATTERN.findall(anchor_text.lower()[:200])
+                        if not token.isdigit())
+
+        return features
+
+    def _vectorize(self, url: str, anchor_text: str) -> Tuple[np.ndarray, float]:
+        """Convierte un enlace en índices hasheados y el valor común de cada característica"""
+        tokens = self._tokens(url, anchor_text or "")
+        indices = np.unique(np.array(
+            [zlib.crc32(token.encode('utf-8')) % self.n_features for token in tokens], dtype=np.int64
+        ))
+        return indices, 1.0 / np.sqrt(max(len(indices), 1))
+
+    def score(self, url: str, anchor_text: str = "") -> float:
+        """Probabilidad estimada de que el enlace lleve a una página útil"""
+        indices, value = self._vectorize(url, anchor_text)
+        with self.lock:
+            margin = float(self.weights[indices].sum()) * value + self.bias
+        return float(1.0 / (1.0 + np.exp(-np.clip(margin, -30, 30))))
+
+    def update(self, url: str, anchor_text: str, label: bool):
+        """
+        Entrena el modelo con el resultado de una página descargada.
+
+        Args:
+            url: URL descargada
+            anchor_text: Texto del enlace por el que se llegó a la URL
+            label: True si la página se guardó en la base de datos
+        """
+        indices, value = self._vectorize(url, anchor_text)
+        target = 1.0 if label else 0.0
+
+        with self.lock:
+            margin = float(self.weights[indices].sum()) * value + self.bias
+            prediction = 1.0 / (1.0 + np.exp(-np.clip(margin, -30, 30)))
+            gradient = prediction - target
+
+            self.weights[indices] -= self.learning_rate * (gradient * value + self.l2 * self.weights[indices])
+            self.bias -= self.learning_rate * gradient
+
+            self.updates += 1
+            self.positives += int(label)
+            self.recent_labels.append(int(label))
+
+    def rank(self, links: List[Tuple[str, str]]) -> List[str]:
+        """Ordena enlaces (url, texto) de mayor a menor puntuación"""
+        if not self.is_trained:
+            return [url for url, _ in links]
+        return [url for _, url in sorted(((self.score(url, text), url) for url, text in links), reverse=True)]
+
+    def get_stats(self) -> Dict:
+        """Obtiene estadísticas de entrenamiento y la tasa de cosecha"""
+        with self.lock:
+            return {
+                'updates': self.updates,
+                'positives': self.positives,
+                'harvest_rate': self.positives / self.updates if self.updates else 0.0,
+                'recent_harvest_rate': (sum(self.recent_labels) / len(self.recent_labels)
+                                        if self.recent_labels else 0.0),
+                'trained': self.updates >= self.min_updates
+            }
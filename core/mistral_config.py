@@ -5,7 +5,7 @@ Este módulo proporciona una interfaz unificada para todas las interacciones con
 
 from mistralai import Mistral
 import os
-from typing import Optional, Dict, List, Union, Any
+from typing import Optional, Dict, List, Union, Any, Callable, Iterator
 from functools import lru_cache
 import json
 import re
@@ -17,6 +17,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Aviso que se añade a una respuesta en streaming cortada tras el primer fragmento
+STREAM_INTERRUPTED_NOTICE = "\n\n[Respuesta interrumpida: se perdió la conexión con el modelo]"
+
+
 class MistralConfig:
     """
     Clase singleton para gestionar la configuración de Mistral
@@ -151,6 +155,7 @@ class MistralClient:
                 system_instruction: str = None,
                 response_format: str = "text",
                 max_retries: int = 3,
+                on_token: Callable[[str], None] = None,
                 **kwargs) -> Union[str, Dict, None]:
         """
         Genera una respuesta usando Mistral
@@ -160,29 +165,36 @@ class MistralClient:
             system_instruction: Instrucción del sistema (opcional)
             response_format: Formato de respuesta esperado ('text', 'json', 'structured')
             max_retries: Número máximo de reintentos en caso de error
+            on_token: Callback para recibir el texto en streaming (solo con formato 'text');
+                recibe cada fragmento y una cadena vacía al terminar la generación. Si la
+                conexión se corta tras el primer fragmento recibe también STREAM_INTERRUPTED_NOTICE
+                y se devuelve el texto parcial seguido de ese aviso
             **kwargs: Argumentos adicionales para generate_content
             
         Returns:
             Respuesta generada en el formato especificado
         """
         
-        self.config.stats['total_requests'] += 1
-        model_key = self.model_name
-        if model_key not in self.config.stats['requests_by_model']:
-            self.config.stats['requests_by_model'][model_key] = 0
-        self.config.stats['requests_by_model'][model_key] += 1
+        if on_token is not None and response_format == "text":
+            chunks = []
+            try:
+                for chunk in self.generate_stream(prompt, system_instruction, max_retries=max_retries, **kwargs):
+                    chunks.append(chunk)
+                    on_token(chunk)
+            except Exception as e:
+                if not chunks:
+                    return None
+                print(f"⚠️ Generación en streaming interrumpida: {e}")
+                on_token(STREAM_INTERRUPTED_NOTICE)
+                return ''.join(chunks).strip() + STREAM_INTERRUPTED_NOTICE
+            finally:
+                on_token("")
+            return ''.join(chunks).strip()
         
+        self._count_request()
         
-        messages = []
-        if system_instruction:
-            messages.append({
-                "role": "system",
-                "content": system_instruction
-            })
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
+        
+        messages = self._build_messages(prompt, system_instruction)
         
         
         final_config = self.config.get_generation_config(**self.generation_config, **kwargs)
@@ -225,15 +237,105 @@ class MistralClient:
                     continue
         
         
+        self._record_failure(prompt, last_error, max_retries)
+        return None
+    
+    def generate_stream(self,
+                        prompt: str,
+                        system_instruction: str = None,
+                        max_retries: int = 3,
+                        **kwargs) -> Iterator[str]:
+        """
+        Genera una respuesta usando el endpoint de streaming de Mistral
+        
+        Los fragmentos de texto se devuelven a medida que llegan, de modo que el
+        primer token puede mostrarse antes de que termine la generación. Solo se
+        reintenta si el error ocurre antes del primer fragmento.
+        
+        Args:
+            prompt: Prompt para el modelo
+            system_instruction: Instrucción del sistema (opcional)
+            max_retries: Número máximo de reintentos en caso de error
+            **kwargs: Argumentos adicionales de generación
+            
+        Yields:
+            Fragmentos de texto de la respuesta
+            
+        Raises:
+            Exception: El último error si la generación falla
+        """
+        self._count_request()
+        messages = self._build_messages(prompt, system_instruction)
+        final_config = self.config.get_generation_config(**self.generation_config, **kwargs)
+        
+        
+        last_error = None
+        for attempt in range(max_retries):
+            started = False
+            try:
+                stream = self.config.client.chat.stream(
+                    model=self.model,
+                    messages=messages,
+                    temperature=final_config.get('temperature', 0.7),
+                    top_p=final_config.get('top_p', 0.95),
+                    max_tokens=final_config.get('max_tokens', 2048),
+                )
+                
+                for event in stream:
+                    chunk = event.data
+                    if getattr(chunk, 'usage', None) is not None:
+                        self.config.stats['total_tokens'] += chunk.usage.total_tokens
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if isinstance(content, str) and content:
+                        started = True
+                        yield content
+                
+                self.config.stats['successful_requests'] += 1
+                return
+                
+            except Exception as e:
+                last_error = e
+                if started:
+                    break
+                if attempt < max_retries - 1:
+                    print(f"⚠️ Error en intento {attempt + 1}/{max_retries}: {str(e)}")
+                    continue
+        
+        
+        self._record_failure(prompt, last_error, attempt + 1)
+        raise last_error
+    
+    def _count_request(self):
+        self.config.stats['total_requests'] += 1
+        model_key = self.model_name
+        if model_key not in self.config.stats['requests_by_model']:
+            self.config.stats['requests_by_model'][model_key] = 0
+        self.config.stats['requests_by_model'][model_key] += 1
+    
+    def _build_messages(self, prompt: str, system_instruction: str = None) -> List[Dict[str, str]]:
+        messages = []
+        if system_instruction:
+            messages.append({
+                "role": "system",
+                "content": system_instruction
+            })
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        return messages
+    
+    def _record_failure(self, prompt: str, error: Exception, attempts: int):
         self.config.stats['failed_requests'] += 1
         self.config.stats['errors'].append({
             'timestamp': datetime.now().isoformat(),
-            'error': str(last_error),
+            'error': str(error),
             'prompt_preview': prompt[:100] + '...' if len(prompt) > 100 else prompt
         })
         
-        print(f"❌ Error después de {max_retries} intentos: {str(last_error)}")
-        return None
+        print(f"❌ Error después de {attempts} intentos: {str(error)}")
     
     def generate_json(self, prompt: str, schema: Dict = None, **kwargs) -> Optional[Dict]:
         """
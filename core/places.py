@@ -0,0 +1,87 @@
+"""
+Normalización de nombres de lugares y filtros de destino para ChromaDB
+Los metadatos de país y ciudad (pais, ciudad, countries, cities) se
+convierten al ingerir en claves booleanas place_<nombre>, de modo que la
+recuperación pueda acotarse a un destino con un filtro `where` exacto
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+
+PLACE_FIELDS = ('pais', 'ciudad', 'countries', 'cities')
+PLACE_PREFIX = "place_"
+
+PLACE_ALIASES = {
+    'havana': 'habana',
+    'la_habana': 'habana',
+    'ciudad_de_la_habana': 'habana',
+    'habana_vieja': 'habana',
+    'old_havana': 'habana',
+    'republica_de_cuba': 'cuba',
+    'santiago': 'santiago_de_cuba',
+    'trinidad_de_cuba': 'trinidad',
+    'spain': 'espana',
+    'mexico_city': 'ciudad_de_mexico',
+    'cdmx': 'ciudad_de_mexico',
+    'france': 'francia',
+    'italy': 'italia',
+    'rome': 'roma',
+    'london': 'londres',
+    'new_york': 'nueva_york',
+    'united_states': 'estados_unidos',
+    'usa': 'estados_unidos'
+}
+
+
+def normalize_place(name: str) -> str:
+    """Forma canónica de un lugar: minúsculas, sin tildes, con guiones bajos y alias resueltos"""
+    text = unicodedata.normalize('NFKD', name.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    slug = '_'.join(re.findall(r"[a-z0-9]+", text))
+    return PLACE_ALIASES.get(slug, slug)
+
+
+def split_places(value) -> List[str]:
+    """Lugares de un valor de metadatos o preferencias ('Varadero, Cuba', 'Roma y Florencia' o una lista)"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        parts = [str(item) for item in value]
+    else:
+        parts = re.split(r",|;|/|\s+y\s+|\s+and\s+", str(value))
+    return [part.strip() for part in parts if part and part.strip()]
+
+
+def place_keys(places: Iterable[str]) -> List[str]:
+    """Claves de metadatos place_<nombre> de una lista de lugares (sin duplicados)"""
+    keys = []
+    for place in places:
+        slug = normalize_place(place)
+        if slug and f"{PLACE_PREFIX}{slug}" not in keys:
+            keys.append(f"{PLACE_PREFIX}{slug}")
+    return keys
+
+
+def place_metadata(metadata: Dict) -> Dict[str, bool]:
+    """Claves booleanas de lugar que corresponden a los campos de país y ciudad de un documento"""
+    places = []
+    for field in PLACE_FIELDS:
+        places.extend(split_places(metadata.get(field)))
+    return {key: True for key in place_keys(places)}
+
+
+def destination_filter(destinations: Iterable[str]) -> Optional[Dict]:
+    """
+    Filtro `where` de Chroma que acepta documentos de cualquiera de los destinos.
+
+    Returns:
+        Optional[Dict]: Filtro, o None si no hay ningún destino reconocible
+    """
+    conditions = [{key: True} for key in place_keys(destinations)]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$or': conditions}
@@ -1,9 +1,18 @@
-from typing import List, Dict, Any, Optional, Tuple
-from core.mistral_config import MistralClient, mistral_generate
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from core.mistral_config import MistralClient, mistral_generate, STREAM_INTERRUPTED_NOTICE
+from core.similarity import QuerySimilarities, select_mmr
+from core.embedding_cache import get_query_embedding_cache, normalize_query
+from core.bm25_index import BM25Index, get_bm25_index, reciprocal_rank_fusion, tokenize
+from core.answer_cache import SemanticAnswerCache, get_answer_cache
+from core.places import destination_filter, place_keys
+from core.context_packer import ContextPacker, DEFAULT_TOKEN_BUDGET, source_label
 import numpy as np
+import hashlib
 import random
+import threading
+import time
+from collections import OrderedDict
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import re
 import warnings
 warnings.filterwarnings('ignore')
@@ -16,28 +25,225 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     print("⚠️ sentence-transformers no disponible. Usando TF-IDF como fallback.")
 
+
+GENERATION_ERROR_MESSAGE = "Error al procesar la consulta. Por favor, intenta nuevamente."
+
+
+def is_complete_answer(answer: str) -> bool:
+    """Indica si una respuesta generada puede guardarse en la caché (ni error ni cortada)"""
+    return answer != GENERATION_ERROR_MESSAGE and not answer.endswith(STREAM_INTERRUPTED_NOTICE)
+
+
 class RAGSystem:
-    def __init__(self, chroma_collection):
+    def __init__(self, chroma_collection, use_answer_cache: bool = True,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 context_token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET):
         self.collection = chroma_collection
         
+        
+        self.collection_name = getattr(chroma_collection, 'name', None)
+        self.use_answer_cache = use_answer_cache and isinstance(self.collection_name, str)
+        self._answer_cache = answer_cache
+        
+        
+        self.collection_embedding_function = getattr(chroma_collection, '_embedding_function', None)
+        self.query_cache = (get_query_embedding_cache(self.collection_embedding_function)
+                            if self.collection_embedding_function is not None else None)
+        
+        
+        self.context_packer = (ContextPacker(self.collection_embedding_function, token_budget=context_token_budget)
+                               if context_token_budget else None)
+        
         self.mistral_client = MistralClient(model_name="flash")
+        self.token_callback: Optional[Callable[[str], None]] = None
 
-    def retrieve(self, query: str, top_k: int = 20) -> List[str]:
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """Embedding de la consulta con la función de la colección (cacheado), o None si no la tiene"""
+        if self.query_cache is None:
+            return None
+        return self.query_cache.embed(query)
+
+    def query_collection(self, query: str, n_results: int, query_embedding: Optional[np.ndarray] = None,
+                         destinations: Optional[List[str]] = None, min_results: int = None,
+                         **kwargs) -> Dict[str, Any]:
+        """
+        Consulta la colección pasando el embedding cacheado en lugar del texto cuando es posible.
+        
+        Con destinos la búsqueda se limita a los documentos marcados con esos
+        lugares; si el filtro devuelve menos de min_results documentos (por
+        defecto min(n_results, 3)) se repite sin filtrar. El filtro que se
+        aplicó finalmente queda en results['destination_filter'].
+        """
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        if query_embedding is None:
+            search = {'query_texts': [query]}
+        else:
+            search = {'query_embeddings': [query_embedding]}
+        return self._scoped_query(search, n_results, destinations, min_results, **kwargs)
+
+    def query_collection_many(self, queries: List[str], n_results: int,
+                              destinations: Optional[List[str]] = None, min_results: int = None,
+                              **kwargs) -> Dict[str, Any]:
+        """
+        Consulta la colección con varias consultas en una sola llamada.
+        
+        Los embeddings de las consultas se calculan en un único lote (solo los
+        que no están en la caché) y Chroma recibe todas a la vez. El filtro de
+        destino se descarta para todas si alguna consulta queda por debajo de
+        min_results.
+        """
+        if self.query_cache is None:
+            search = {'query_texts': list(queries)}
+        else:
+            search = {'query_embeddings': self.query_cache.embed_many(list(queries))}
+        return self._scoped_query(search, n_results, destinations, min_results, **kwargs)
+
+    def _scoped_query(self, search: Dict[str, Any], n_results: int, destinations: Optional[List[str]],
+                      min_results: Optional[int], **kwargs) -> Dict[str, Any]:
+        where = destination_filter(destinations) if destinations else None
+        if where is not None:
+            results = self.collection.query(n_results=n_results, where=where, **search, **kwargs)
+            found = min((len(ids) for ids in results['ids']), default=0) if results['ids'] else 0
+            if min_results is None:
+                min_results = min(n_results, 3)
+            if found >= min_results:
+                results['destination_filter'] = where
+                return results
+            print(f"⚠️ Solo {found} documentos para {', '.join(destinations)}; buscando en toda la colección")
+        
+        results = self.collection.query(n_results=n_results, **search, **kwargs)
+        results['destination_filter'] = None
+        return results
+
+    @staticmethod
+    def answer_mode(mode: str, destinations: Optional[List[str]] = None) -> str:
+        """Modo de la caché de respuestas, distinto para cada conjunto de destinos"""
+        if not destinations:
+            return mode
+        return f"{mode}|{','.join(sorted(place_keys(destinations)))}"
+
+    @staticmethod
+    def queries_digest(queries: List[str]) -> str:
+        """Huella de un conjunto de consultas (normalizadas, sin duplicados y sin importar el orden)"""
+        normalized = sorted({normalize_query(query) for query in queries if query and query.strip()})
+        return hashlib.sha1('\n'.join(normalized).encode('utf-8')).hexdigest()[:16]
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de embeddings de consultas (vacías si no hay caché)"""
+        if self.query_cache is None:
+            return {}
+        return self.query_cache.get_stats()
+
+    @property
+    def answer_cache(self) -> SemanticAnswerCache:
+        """Caché semántica de respuestas (la compartida del proceso si no se pasó ninguna)"""
+        if self._answer_cache is None:
+            self._answer_cache = get_answer_cache()
+        return self._answer_cache
+
+    def cached_answer(self, query: str, mode: str) -> Tuple[Optional[Any], Optional[int]]:
+        """
+        Busca una respuesta guardada para la consulta.
+
+        Returns:
+            Tuple[Optional[Any], Optional[int]]: Respuesta (o None) y versión de la colección
+                con la que guardar la nueva respuesta (None si la caché está desactivada)
+        """
+        if not self.use_answer_cache:
+            return None, None
+        version = self.answer_cache.get_version(self.collection_name)
+        answer = self.answer_cache.lookup(self.collection_name, version, mode, query, self.embed_query(query))
+        return answer, version
+
+    def store_answer(self, query: str, mode: str, version: Optional[int], answer: Any):
+        if version is None:
+            return
+        self.answer_cache.store(self.collection_name, version, mode, query, answer, self.embed_query(query))
+
+    def get_answer_cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché de respuestas (vacías si está desactivada o aún no se ha usado)"""
+        if not self.use_answer_cache or self._answer_cache is None:
+            return {}
+        return self.answer_cache.get_stats()
+
+    def retrieve(self, query: str, top_k: int = 20, destinations: Optional[List[str]] = None) -> List[str]:
         """
         Recupera los fragmentos más relevantes para la consulta del usuario.
         Args:
             query (str): Consulta del usuario.
             top_k (int): Número de fragmentos relevantes a recuperar.
+            destinations (List[str]): Países o ciudades a los que limitar la búsqueda (opcional).
         Returns:
             List[str]: Lista de textos relevantes.
         """
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k
-        )
-        return [doc for doc in results['documents'][0]]
+        return self.retrieve_with_sources(query, top_k, destinations)[0]
+
+    def retrieve_with_sources(self, query: str, top_k: int = 20,
+                              destinations: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+        """Como retrieve, pero devuelve también la etiqueta de la fuente (título y URL) de cada fragmento"""
+        results = self.query_collection(query, top_k, destinations=destinations)
+        metadatas = (results.get('metadatas') or [[]])[0] or []
+        documents = [doc for doc in results['documents'][0]]
+        sources = [source_label(metadatas[i] if i < len(metadatas) else None, i) for i in range(len(documents))]
+        return documents, sources
+
+    def retrieve_many(self, queries: List[str], top_k: int = 10, destinations: Optional[List[str]] = None,
+                      max_documents: int = 20) -> List[str]:
+        """
+        Recupera los fragmentos de varias consultas con una sola llamada a la colección.
+        Los resultados se deduplican por ID y se ordenan por fusión de rangos, de modo
+        que los documentos que aparecen en varias consultas quedan primero.
+        Args:
+            queries (List[str]): Consultas del turno (p. ej. una por interés del usuario).
+            top_k (int): Fragmentos a recuperar por consulta.
+            destinations (List[str]): Países o ciudades a los que limitar la búsqueda (opcional).
+            max_documents (int): Máximo de fragmentos distintos devueltos.
+        Returns:
+            List[str]: Lista de textos relevantes sin duplicados.
+        """
+        return self.retrieve_many_with_sources(queries, top_k, destinations, max_documents)[0]
+
+    def retrieve_many_with_sources(self, queries: List[str], top_k: int = 10,
+                                   destinations: Optional[List[str]] = None,
+                                   max_documents: int = 20) -> Tuple[List[str], List[str]]:
+        """Como retrieve_many, pero devuelve también la etiqueta de la fuente de cada fragmento"""
+        queries = list(dict.fromkeys(query for query in queries if query and query.strip()))
+        if not queries:
+            return [], []
+        
+        results = self.query_collection_many(queries, top_k, destinations=destinations)
+        texts, metadatas = {}, {}
+        for i, (ids, documents) in enumerate(zip(results['ids'], results['documents'])):
+            texts.update(zip(ids, documents))
+            if results.get('metadatas'):
+                metadatas.update(zip(ids, results['metadatas'][i] or []))
+        
+        fused = reciprocal_rank_fusion(results['ids'])[:max_documents]
+        documents = [texts[doc_id] for doc_id, _ in fused]
+        sources = [source_label(metadatas.get(doc_id), i) for i, (doc_id, _) in enumerate(fused)]
+        return documents, sources
+
+    def pack_context(self, query: str, documents: List[str], sources: Optional[List[str]] = None,
+                     separator: str = "\n") -> Tuple[str, Dict[str, Any]]:
+        """
+        Reduce los documentos recuperados a las frases más relevantes dentro del presupuesto de tokens.
+        Sin empaquetador (context_token_budget=None) los documentos se unen completos.
+        Returns:
+            Tuple[str, Dict[str, Any]]: Texto del contexto y estadísticas del empaquetado
+        """
+        if self.context_packer is None:
+            return separator.join(documents), {}
+        
+        packed = self.context_packer.pack(query, documents, sources, query_embedding=self.embed_query(query))
+        if not packed.sentences:
+            return separator.join(documents), {}
+        stats = packed.get_stats()
+        print(f"📦 Contexto empaquetado: {stats['original_context_tokens']} → {stats['context_tokens']} tokens "
+              f"({stats['context_sentences']} frases de {stats['context_sources']} fuentes)")
+        return packed.text, stats
 
-    def generate(self, query: str, context: List[str]) -> str:
+    def generate(self, query: str, context: List[str], sources: Optional[List[str]] = None) -> str:
         """
         Genera una respuesta basada en la consulta y el contexto recuperado.
         
@@ -47,11 +253,12 @@ class RAGSystem:
         Args:
             query (str): Consulta del usuario.
             context (List[str]): Fragmentos relevantes recuperados de la BD local.
+            sources (List[str]): Fuente de cada fragmento, para citarla en el contexto (opcional).
         Returns:
             str: Respuesta generada por el modelo basada ÚNICAMENTE en la BD.
         """
         
-        context_text = "\n".join(context)
+        context_text, _ = self.pack_context(query, context, sources)
         
         prompt = f"""Eres un asistente de turismo. Responde ÚNICAMENTE basándote en la información proporcionada.
 
@@ -71,41 +278,79 @@ INSTRUCCIONES IMPORTANTES:
 Respuesta:"""
 
         try:
-            response = self.mistral_client.generate(prompt)
+            response = self.mistral_client.generate(prompt, on_token=self.token_callback)
+            if response is None:
+                return GENERATION_ERROR_MESSAGE
             return response
         except Exception as e:
             print(f"Error al generar contenido: {e}")
-            return "Error al procesar la consulta. Por favor, intenta nuevamente."
+            return GENERATION_ERROR_MESSAGE
 
-    def rag_query(self, query: str) -> str:
+    def rag_query(self, query: str, destinations: Optional[List[str]] = None) -> str:
         """
         Implementa el flujo completo de RAG: recuperación y generación.
+        Las consultas casi idénticas a una ya respondida se sirven desde la caché de respuestas.
         Args:
             query (str): Consulta del usuario.
+            destinations (List[str]): Países o ciudades a los que limitar la recuperación (opcional).
         Returns:
             str: Respuesta generada.
         """
         
-        context = self.retrieve(query)
+        mode = self.answer_mode('rag_query', destinations)
+        cached, version = self.cached_answer(query, mode)
+        if cached is not None:
+            return cached
+        
+        context, sources = self.retrieve_with_sources(query, destinations=destinations)
         
         
-        return self.generate(query, context)
+        answer = self.generate(query, context, sources)
+        if is_complete_answer(answer):
+            self.store_answer(query, mode, version, answer)
+        return answer
+
+    def rag_query_many(self, query: str, queries: List[str], destinations: Optional[List[str]] = None) -> str:
+        """
+        Flujo RAG de un turno con varias consultas de recuperación (una sola llamada a la colección).
+        Args:
+            query (str): Pregunta que se responde.
+            queries (List[str]): Consultas de recuperación adicionales del turno.
+            destinations (List[str]): Países o ciudades a los que limitar la recuperación (opcional).
+        Returns:
+            str: Respuesta generada.
+        """
+        mode = self.answer_mode(f"rag_query_many:{self.queries_digest(queries)}", destinations)
+        cached, version = self.cached_answer(query, mode)
+        if cached is not None:
+            return cached
+        
+        context, sources = self.retrieve_many_with_sources([query] + list(queries), destinations=destinations)
+        
+        
+        answer = self.generate(query, context, sources)
+        if is_complete_answer(answer):
+            self.store_answer(query, mode, version, answer)
+        return answer
 
 
 class GeneticDocumentOptimizer:
     """Optimizador genético para selección de documentos usando similitud coseno"""
     
     def __init__(self, population_size: int = 30, generations: int = 20, mutation_rate: float = 0.1, 
-                 crossover_rate: float = 0.8, elite_size: int = 2):
+                 crossover_rate: float = 0.8, elite_size: int = 2, patience: int = 5,
+                 min_improvement: float = 1e-4):
         self.population_size = population_size
         self.generations = generations
         self.mutation_rate = mutation_rate
         self.crossover_rate = crossover_rate
         self.elite_size = elite_size
+        self.patience = patience
+        self.min_improvement = min_improvement
         
         print(f"🧬 Optimizador genético configurado:")
         print(f"   • Población: {population_size}")
-        print(f"   • Generaciones: {generations}")
+        print(f"   • Generaciones: {generations} (parada tras {patience} sin mejora)")
         print(f"   • Tasa de mutación: {mutation_rate}")
         print(f"   • Tasa de cruzamiento: {crossover_rate}")
     
@@ -116,7 +361,8 @@ class GeneticDocumentOptimizer:
         return sorted(random.sample(range(total_documents), target_size))
     
     def fitness_function(self, individual: List[int], documents: List[str], 
-                        query_embedding: np.ndarray, doc_embeddings: List[np.ndarray]) -> float:
+                        query_embedding: np.ndarray, doc_embeddings: List[np.ndarray],
+                        similarities: QuerySimilarities = None) -> float:
         """
         Calcula la fitness de un individuo basada en similitud coseno con la query
         
@@ -125,6 +371,7 @@ class GeneticDocumentOptimizer:
             documents: Lista de todos los documentos
             query_embedding: Embedding de la consulta
             doc_embeddings: Embeddings de todos los documentos
+            similarities: Similitudes precalculadas de la consulta (se calculan si no se pasan)
         
         Returns:
             float: Score de fitness (mayor es mejor)
@@ -132,41 +379,62 @@ class GeneticDocumentOptimizer:
         if not individual:
             return 0.0
         
+        if similarities is None:
+            similarities = QuerySimilarities(query_embedding, doc_embeddings)
+        
+        doc_lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+        return float(self.population_fitness([individual], doc_lengths, similarities)[0])
+    
+    def population_fitness(self, population: List[List[int]], doc_lengths: np.ndarray,
+                           similarities: QuerySimilarities) -> np.ndarray:
+        """
+        Calcula la fitness de toda una población a la vez.
         
-        selected_embeddings = [doc_embeddings[i] for i in individual]
+        Cada individuo se representa como una fila de una matriz de selección
+        (población x documentos); relevancia, diversidad y longitud salen de
+        productos con las similitudes precalculadas de la consulta.
         
+        Returns:
+            np.ndarray: Fitness de cada individuo (0 para individuos vacíos)
+        """
+        mask = np.zeros((len(population), len(similarities)), dtype=np.float32)
+        for row, individual in enumerate(population):
+            mask[row, individual] = 1.0
+        counts = mask.sum(axis=1)
+        safe_counts = np.maximum(counts, 1.0)
         
-        cosine_scores = []
-        for embedding in selected_embeddings:
-            similarity = cosine_similarity([query_embedding], [embedding])[0][0]
-            cosine_scores.append(similarity)
         
-        avg_cosine = np.mean(cosine_scores) if cosine_scores else 0.0
+        avg_cosine = (mask @ similarities.scores) / safe_counts
         
         
-        diversity_score = 0.0
-        if len(selected_embeddings) > 1:
-            similarities = []
-            for i in range(len(selected_embeddings)):
-                for j in range(i + 1, len(selected_embeddings)):
-                    sim = cosine_similarity([selected_embeddings[i]], [selected_embeddings[j]])[0][0]
-                    similarities.append(sim)
-            
-            diversity_score = 1.0 - np.mean(similarities) if similarities else 0.0
+        pairwise = similarities.pairwise
+        pair_sums = np.einsum('pi,ij,pj->p', mask, pairwise, mask) - mask @ np.diag(pairwise)
+        pair_counts = np.maximum(counts * (counts - 1), 1.0)
+        diversity_score = np.where(counts > 1, 1.0 - pair_sums / pair_counts, 0.0)
         
         
-        selected_docs = [documents[i] for i in individual]
-        total_length = sum(len(doc) for doc in selected_docs)
-        optimal_length = 2000  
-        length_score = 1.0 - abs(total_length - optimal_length) / optimal_length
-        length_score = max(0.0, length_score)
+        optimal_length = 2000
+        total_length = mask @ doc_lengths
+        length_score = np.maximum(0.0, 1.0 - np.abs(total_length - optimal_length) / optimal_length)
         
         
-        fitness = (0.7 * avg_cosine +      
-                  0.2 * diversity_score +  
-                  0.1 * length_score)      
+        fitness = (0.7 * avg_cosine +
+                   0.2 * diversity_score +
+                   0.1 * length_score)
         
-        return max(0.0, fitness)
+        return np.where(counts > 0, np.maximum(fitness, 0.0), 0.0)
+    
+    def _score_population(self, population: List[List[int]], doc_lengths: np.ndarray,
+                          similarities: QuerySimilarities, cache: Dict[Tuple[int, ...], float]) -> List[float]:
+        """Fitness de una población reutilizando las de los individuos ya evaluados en esta consulta"""
+        keys = [tuple(sorted(individual)) for individual in population]
+        pending = list(dict.fromkeys(key for key in keys if key not in cache))
+        
+        if pending:
+            scores = self.population_fitness([list(key) for key in pending], doc_lengths, similarities)
+            cache.update(zip(pending, scores.tolist()))
+        
+        return [cache[key] for key in keys]
     
     def tournament_selection(self, population: List[List[int]], fitness_scores: List[float], 
                            tournament_size: int = 3) -> List[int]:
@@ -240,10 +508,14 @@ class GeneticDocumentOptimizer:
         return sorted(mutated)
     
     def optimize(self, documents: List[str], query_embedding: np.ndarray, 
-                doc_embeddings: List[np.ndarray], target_size: int = 8) -> Tuple[List[int], Dict[str, Any]]:
+                doc_embeddings: List[np.ndarray], target_size: int = 8,
+                similarities: QuerySimilarities = None) -> Tuple[List[int], Dict[str, Any]]:
         """
         Ejecuta el algoritmo genético para optimizar la selección de documentos
         
+        Args:
+            similarities: Similitudes precalculadas de la consulta (se calculan si no se pasan)
+        
         Returns:
             Tuple[List[int], Dict[str, Any]]: Índices de documentos seleccionados y métricas
         """
@@ -260,6 +532,11 @@ class GeneticDocumentOptimizer:
         print(f"   • Documentos disponibles: {total_documents}")
         print(f"   • Documentos objetivo: {target_size}")
         
+        if similarities is None:
+            similarities = QuerySimilarities(query_embedding, doc_embeddings)
+        doc_lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+        fitness_cache: Dict[Tuple[int, ...], float] = {}
+        
         
         population = []
         for _ in range(self.population_size):
@@ -269,20 +546,28 @@ class GeneticDocumentOptimizer:
         
         best_fitness_history = []
         initial_fitness = 0.0
+        generations_run = 0
+        generations_without_improvement = 0
         
         for generation in range(self.generations):
+            generations_run += 1
             
-            fitness_scores = []
-            for individual in population:
-                fitness = self.fitness_function(individual, documents, query_embedding, doc_embeddings)
-                fitness_scores.append(fitness)
+            fitness_scores = self._score_population(population, doc_lengths, similarities, fitness_cache)
             
             
             best_fitness = max(fitness_scores)
-            best_fitness_history.append(best_fitness)
             
             if generation == 0:
                 initial_fitness = best_fitness
+            elif best_fitness > best_fitness_history[-1] + self.min_improvement:
+                generations_without_improvement = 0
+            else:
+                generations_without_improvement += 1
+            best_fitness_history.append(best_fitness)
+            
+            if generations_without_improvement >= self.patience:
+                print(f"   • Generación {generation}: sin mejora en {self.patience} generaciones, parada temprana")
+                break
             
             
             if generation % 5 == 0:
@@ -319,10 +604,7 @@ class GeneticDocumentOptimizer:
             population = new_population[:self.population_size]
         
         
-        final_fitness_scores = []
-        for individual in population:
-            fitness = self.fitness_function(individual, documents, query_embedding, doc_embeddings)
-            final_fitness_scores.append(fitness)
+        final_fitness_scores = self._score_population(population, doc_lengths, similarities, fitness_cache)
         
         best_idx = np.argmax(final_fitness_scores)
         best_individual = population[best_idx]
@@ -337,12 +619,13 @@ class GeneticDocumentOptimizer:
         print(f"   • Documentos seleccionados: {len(best_individual)}")
         
         metrics = {
-            'generations_run': self.generations,
+            'generations_run': generations_run,
             'best_fitness': final_best_fitness,
             'initial_fitness': initial_fitness,
             'improvement': improvement,
             'fitness_history': best_fitness_history,
-            'population_size': self.population_size
+            'population_size': self.population_size,
+            'fitness_evaluations': len(fitness_cache)
         }
         
         return best_individual, metrics
@@ -352,8 +635,27 @@ class EnhancedRAGSystem(RAGSystem):
     """Sistema RAG mejorado con algoritmo genético, distancia coseno y métricas avanzadas"""
     
     def __init__(self, chroma_collection, embedding_model: str = 'TF-IDF', 
-                 enable_genetic_optimization: bool = True, genetic_config: Dict[str, Any] = None):
-        super().__init__(chroma_collection)
+                 enable_genetic_optimization: bool = True, genetic_config: Dict[str, Any] = None,
+                 use_stored_embeddings: bool = True, embedding_cache_size: int = 5000,
+                 sparse_index: Optional[BM25Index] = None, use_answer_cache: bool = True,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 context_token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET):
+        super().__init__(chroma_collection, use_answer_cache=use_answer_cache, answer_cache=answer_cache,
+                         context_token_budget=context_token_budget)
+        
+        
+        collection_name = getattr(chroma_collection, 'name', None)
+        if sparse_index is None and isinstance(collection_name, str):
+            sparse_index = get_bm25_index(collection_name, create=False)
+        self.sparse_index = sparse_index
+        
+        
+        self.use_stored_embeddings = use_stored_embeddings and self.collection_embedding_function is not None
+        self.embedding_cache_size = embedding_cache_size
+        self.doc_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.embedding_cache_lock = threading.Lock()
+        self.embedding_cache_hits = 0
+        self.embedding_cache_misses = 0
         
         
         self.embedding_model_name = embedding_model
@@ -364,10 +666,10 @@ class EnhancedRAGSystem(RAGSystem):
                 print(f"✅ Usando Sentence Transformers: {embedding_model}")
             except:
                 print(f"⚠️ Error cargando {embedding_model}, usando TF-IDF")
-                self.embedding_model = TfidfVectorizer(max_features=384, stop_words='english')
+                self.embedding_model = TfidfVectorizer(max_features=384, tokenizer=tokenize, token_pattern=None, lowercase=False)
                 self.use_sentence_transformers = False
         else:
-            self.embedding_model = TfidfVectorizer(max_features=384, stop_words='english')
+            self.embedding_model = TfidfVectorizer(max_features=384, tokenizer=tokenize, token_pattern=None, lowercase=False)
             self.use_sentence_transformers = False
             print("✅ Usando TF-IDF para embeddings")
         
@@ -382,7 +684,8 @@ class EnhancedRAGSystem(RAGSystem):
                 'generations': 20,
                 'mutation_rate': 0.1,
                 'crossover_rate': 0.8,
-                'elite_size': 2
+                'elite_size': 2,
+                'patience': 5
             }
             
             
@@ -403,134 +706,270 @@ class EnhancedRAGSystem(RAGSystem):
         return text.strip()
     
     def create_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Crea embeddings para una lista de textos"""
+        """
+        Crea embeddings para una lista de textos.
+        
+        En modo TF-IDF el vocabulario se ajusta en cada llamada sobre los
+        propios textos, por lo que la consulta y sus candidatos deben
+        codificarse juntos.
+        """
         if self.use_sentence_transformers:
             return self.embedding_model.encode(texts)
         else:
             
-            if not self.tfidf_fitted:
-                
-                all_texts = texts.copy()
+            try:
+                embeddings = self.embedding_model.fit_transform(texts)
+            except ValueError:
                 
-                all_texts.extend([
-                    "turismo viaje destino ciudad museo",
-                    "hotel restaurante comida gastronomía",
-                    "playa montaña naturaleza actividad",
-                    "cultura historia arte arquitectura"
-                ])
-                self.embedding_model.fit(all_texts)
-                self.tfidf_fitted = True
-            
-            embeddings = self.embedding_model.transform(texts)
+                return np.zeros((len(texts), 1), dtype=np.float32)
+            self.tfidf_fitted = True
             return embeddings.toarray()
     
-    def calculate_cosine_similarity(self, query_embedding: np.ndarray, document_embeddings: List[np.ndarray]) -> List[float]:
-        """Calcula la similitud coseno entre la consulta y los documentos"""
-        similarities = []
-        for doc_embedding in document_embeddings:
-            similarity = cosine_similarity([query_embedding], [doc_embedding])[0][0]
-            similarities.append(similarity)
-        return similarities
+    def _encode_locally(self, query: str, documents: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Codifica la consulta y sus candidatos con el modelo local en una sola llamada"""
+        embeddings = self.create_embeddings([query] + [self.preprocess_text(doc) for doc in documents])
+        return embeddings[0], embeddings[1:]
     
-    def retrieve_enhanced(self, query: str, top_k: int = 10) -> Tuple[List[str], Dict[str, Any]]:
-        """Recupera documentos usando distancia coseno y métricas avanzadas"""
-        
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=min(50, top_k * 3)  
-        )
-        
-        documents = results['documents'][0] if results['documents'] else []
-        
-        if not documents:
-            return [], {'error': 'No se encontraron documentos'}
-        
-        
-        processed_docs = [self.preprocess_text(doc) for doc in documents]
+    def _stored_embeddings(self, ids: List[str], results: Dict[str, Any] = None) -> np.ndarray:
+        """
+        Embeddings almacenados en Chroma de los documentos recuperados.
         
+        Con la caché activada la consulta no pide embeddings: se leen de la
+        caché local por ID y solo los que faltan se piden con collection.get.
+        """
+        if self.embedding_cache_size <= 0 and results is not None:
+            return np.asarray(results['embeddings'][0], dtype=np.float32)
+        
+        with self.embedding_cache_lock:
+            cached = {doc_id: self.doc_embedding_cache[doc_id] for doc_id in ids if doc_id in self.doc_embedding_cache}
+            for doc_id in cached:
+                self.doc_embedding_cache.move_to_end(doc_id)
+            self.embedding_cache_hits += len(cached)
+            self.embedding_cache_misses += len(ids) - len(cached)
+        
+        missing = [doc_id for doc_id in ids if doc_id not in cached]
+        if missing:
+            fetched = self.collection.get(ids=missing, include=['embeddings'])
+            loaded = {doc_id: np.asarray(embedding, dtype=np.float32)
+                      for doc_id, embedding in zip(fetched['ids'], fetched['embeddings'])}
+            cached.update(loaded)
+            
+            with self.embedding_cache_lock:
+                self.doc_embedding_cache.update(loaded)
+                while len(self.doc_embedding_cache) > self.embedding_cache_size:
+                    self.doc_embedding_cache.popitem(last=False)
         
-        query_embeddings = self.create_embeddings([query])
-        query_embedding = query_embeddings[0]
+        return np.stack([cached[doc_id] for doc_id in ids])
+    
+    def retrieve_candidates(self, query: str, n_results: int,
+                            destinations: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Recupera los documentos candidatos de una consulta con sus embeddings.
         
-        doc_embeddings = self.create_embeddings(processed_docs)
+        Si la colección tiene función de embeddings, la consulta se codifica
+        con ella y se puntúa contra los vectores que Chroma ya almacena, sin
+        volver a codificar los documentos. Si no, se codifican con el modelo
+        local (Sentence Transformers o TF-IDF).
         
+        Returns:
+            Tuple[List[str], np.ndarray, np.ndarray]: Documentos, embedding de la consulta y embeddings de los documentos
+        """
+        if self.use_stored_embeddings:
+            query_embedding = self.embed_query(query)
+            include = ['documents'] if self.embedding_cache_size > 0 else ['documents', 'embeddings']
+            results = self.query_collection(query, n_results, query_embedding, destinations=destinations,
+                                            include=include)
+            documents = results['documents'][0] if results['documents'] else []
+            if not documents:
+                return [], query_embedding, np.zeros((0, query_embedding.shape[0]), dtype=np.float32)
+            return documents, query_embedding, self._stored_embeddings(results['ids'][0], results)
+        
+        results = self.query_collection(query, n_results, destinations=destinations)
+        documents = results['documents'][0] if results['documents'] else []
+        if not documents:
+            return [], np.zeros(0, dtype=np.float32), np.zeros((0, 0), dtype=np.float32)
         
-        similarities = self.calculate_cosine_similarity(query_embedding, doc_embeddings)
+        query_embedding, doc_embeddings = self._encode_locally(query, documents)
+        return documents, query_embedding, doc_embeddings
+    
+    def calculate_cosine_similarity(self, query_embedding: np.ndarray, document_embeddings: List[np.ndarray]) -> List[float]:
+        """Calcula la similitud coseno entre la consulta y los documentos"""
+        if len(document_embeddings) == 0:
+            return []
+        return QuerySimilarities(query_embedding, document_embeddings).scores.tolist()
+    
+    def retrieve_enhanced(self, query: str, top_k: int = 10,
+                          destinations: Optional[List[str]] = None) -> Tuple[List[str], Dict[str, Any]]:
+        """Recupera documentos usando distancia coseno y métricas avanzadas"""
         
+        documents, query_embedding, doc_embeddings = self.retrieve_candidates(query, min(50, top_k * 3),
+                                                                              destinations)
         
-        doc_scores = list(zip(documents, similarities))
+        if not documents:
+            return [], {'error': 'No se encontraron documentos'}
         
         
-        doc_scores.sort(key=lambda x: x[1], reverse=True)
-        selected_docs = [doc for doc, score in doc_scores[:top_k]]
-        selected_scores = [score for doc, score in doc_scores[:top_k]]
+        similarities = QuerySimilarities(query_embedding, doc_embeddings)
+        ranking = similarities.ranking(top_k)
+        selected_docs = [documents[i] for i in ranking]
+        selected_scores = similarities.scores[ranking]
         
         
         metrics = {
             'total_documents': len(documents),
             'documents_selected': len(selected_docs),
-            'avg_relevance': np.mean(selected_scores) if selected_scores else 0.0,
-            'max_relevance': np.max(selected_scores) if selected_scores else 0.0,
-            'min_relevance': np.min(selected_scores) if selected_scores else 0.0,
+            'avg_relevance': float(np.mean(selected_scores)) if selected_scores.size else 0.0,
+            'max_relevance': float(np.max(selected_scores)) if selected_scores.size else 0.0,
+            'min_relevance': float(np.min(selected_scores)) if selected_scores.size else 0.0,
             'cosine_similarity_used': True
         }
         
         return selected_docs, metrics
     
-    def retrieve_with_genetic_optimization(self, query: str, top_k: int = 8) -> Tuple[List[str], Dict[str, Any]]:
+    def retrieve_with_genetic_optimization(self, query: str, top_k: int = 8,
+                                           destinations: Optional[List[str]] = None) -> Tuple[List[str], Dict[str, Any]]:
         """Recupera documentos usando algoritmo genético para optimización"""
         
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=min(50, top_k * 5)  
-        )
-        
-        documents = results['documents'][0] if results['documents'] else []
+        documents, query_embedding, doc_embeddings = self.retrieve_candidates(query, min(50, top_k * 5),
+                                                                              destinations)
         
         if not documents:
             return [], {'error': 'No se encontraron documentos'}
         
         
         if len(documents) <= top_k:
-            return self.retrieve_enhanced(query, top_k)
-        
-        
-        processed_docs = [self.preprocess_text(doc) for doc in documents]
-        
-        
-        query_embeddings = self.create_embeddings([query])
-        query_embedding = query_embeddings[0]
-        
-        doc_embeddings = self.create_embeddings(processed_docs)
+            return self.retrieve_enhanced(query, top_k, destinations)
         
         
         if self.genetic_optimizer:
+            similarities = QuerySimilarities(query_embedding, doc_embeddings)
+            start_time = time.time()
             optimal_indices, genetic_metrics = self.genetic_optimizer.optimize(
-                documents, query_embedding, doc_embeddings, target_size=top_k
+                documents, query_embedding, doc_embeddings, target_size=top_k, similarities=similarities
             )
+            selection_time = time.time() - start_time
             
             
             selected_docs = [documents[i] for i in optimal_indices]
             
             
-            selected_embeddings = [doc_embeddings[i] for i in optimal_indices]
-            similarities = self.calculate_cosine_similarity(query_embedding, selected_embeddings)
+            selected_scores = similarities.relevance(optimal_indices)
             
             
             metrics = {
                 'total_documents': len(documents),
                 'documents_selected': len(selected_docs),
-                'avg_relevance': np.mean(similarities) if similarities else 0.0,
-                'max_relevance': np.max(similarities) if similarities else 0.0,
-                'min_relevance': np.min(similarities) if similarities else 0.0,
+                'avg_relevance': float(np.mean(selected_scores)) if selected_scores.size else 0.0,
+                'max_relevance': float(np.max(selected_scores)) if selected_scores.size else 0.0,
+                'min_relevance': float(np.min(selected_scores)) if selected_scores.size else 0.0,
                 'genetic_optimization_used': True,
-                'genetic_metrics': genetic_metrics
+                'genetic_metrics': genetic_metrics,
+                'selection_time': selection_time
             }
             
             return selected_docs, metrics
         else:
             
-            return self.retrieve_enhanced(query, top_k)
+            return self.retrieve_enhanced(query, top_k, destinations)
+    
+    def retrieve_with_mmr(self, query: str, top_k: int = 8,
+                          destinations: Optional[List[str]] = None) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Recupera documentos con selección voraz MMR.
+        
+        Optimiza el mismo objetivo que el algoritmo genético (relevancia,
+        diversidad y longitud) pero de forma determinista y en O(k·n).
+        """
+        
+        documents, query_embedding, doc_embeddings = self.retrieve_candidates(query, min(50, top_k * 5),
+                                                                              destinations)
+        
+        if not documents:
+            return [], {'error': 'No se encontraron documentos'}
+        
+        
+        if len(documents) <= top_k:
+            return self.retrieve_enhanced(query, top_k, destinations)
+        
+        
+        similarities = QuerySimilarities(query_embedding, doc_embeddings)
+        start_time = time.time()
+        selected_indices, objective = select_mmr(similarities, [len(doc) for doc in documents], top_k)
+        selection_time = time.time() - start_time
+        
+        selected_docs = [documents[i] for i in selected_indices]
+        selected_scores = similarities.relevance(selected_indices)
+        
+        
+        metrics = {
+            'total_documents': len(documents),
+            'documents_selected': len(selected_docs),
+            'avg_relevance': float(np.mean(selected_scores)) if selected_scores.size else 0.0,
+            'max_relevance': float(np.max(selected_scores)) if selected_scores.size else 0.0,
+            'min_relevance': float(np.min(selected_scores)) if selected_scores.size else 0.0,
+            'mmr_selection_used': True,
+            'selection_objective': objective,
+            'selection_time': selection_time
+        }
+        
+        return selected_docs, metrics
+    
+    def retrieve_hybrid(self, query: str, top_k: int = 10, rrf_k: int = 60,
+                        destinations: Optional[List[str]] = None) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Recupera documentos fusionando el ranking denso de Chroma y el léxico BM25 con RRF.
+        
+        Los documentos que solo encuentra BM25 se leen de la colección por ID
+        (aplicando el filtro de destino si la búsqueda densa lo usó). Sin índice BM25 equivale a la recuperación densa ordenada por Chroma.
+        """
+        
+        n_candidates = min(50, top_k * 3)
+        query_embedding = self.embed_query(query)
+        dense = self.query_collection(query, n_candidates, query_embedding, destinations=destinations,
+                                      include=['documents'])
+        dense_ids = dense['ids'][0] if dense['ids'] else []
+        texts = dict(zip(dense_ids, dense['documents'][0])) if dense_ids else {}
+        
+        sparse_ids = []
+        if self.sparse_index is not None:
+            sparse_ids = [doc_id for doc_id, _ in self.sparse_index.search(query, n_candidates)]
+        
+        
+        fused = reciprocal_rank_fusion([dense_ids, sparse_ids], k=rrf_k)
+        missing = [doc_id for doc_id, _ in fused[:top_k] if doc_id not in texts]
+        if missing:
+            fetched = self.collection.get(ids=missing, where=dense['destination_filter'], include=['documents'])
+            texts.update(zip(fetched['ids'], fetched['documents']))
+        fused = [(doc_id, score) for doc_id, score in fused if doc_id in texts][:top_k]
+        
+        if not fused:
+            return [], {'error': 'No se encontraron documentos'}
+        
+        
+        selected_ids = [doc_id for doc_id, _ in fused]
+        selected_docs = [texts[doc_id] for doc_id in selected_ids]
+        if self.use_stored_embeddings:
+            doc_embeddings = self._stored_embeddings(selected_ids)
+        else:
+            query_embedding, doc_embeddings = self._encode_locally(query, selected_docs)
+        selected_scores = QuerySimilarities(query_embedding, doc_embeddings).scores
+        dense_set = set(dense_ids)
+        
+        
+        metrics = {
+            'total_documents': len(dense_set | set(sparse_ids)),
+            'documents_selected': len(selected_docs),
+            'avg_relevance': float(np.mean(selected_scores)) if selected_scores.size else 0.0,
+            'max_relevance': float(np.max(selected_scores)) if selected_scores.size else 0.0,
+            'min_relevance': float(np.min(selected_scores)) if selected_scores.size else 0.0,
+            'hybrid_retrieval_used': True,
+            'dense_candidates': len(dense_ids),
+            'sparse_candidates': len(sparse_ids),
+            'sparse_only_selected': sum(1 for doc_id in selected_ids if doc_id not in dense_set),
+            'fusion_scores': [score for _, score in fused]
+        }
+        
+        return selected_docs, metrics
     
     def generate_enhanced(self, query: str, documents: List[str], metrics: Dict[str, Any]) -> str:
         """Genera respuesta mejorada usando los documentos seleccionados"""
@@ -538,7 +977,8 @@ class EnhancedRAGSystem(RAGSystem):
             return "No se encontró información relevante para responder a tu consulta."
         
         
-        context_text = "\n\n".join(documents)
+        context_text, context_stats = self.pack_context(query, documents, separator="\n\n")
+        metrics.update(context_stats)
         
         prompt = f"""Eres un asistente de turismo experto. Analiza cuidadosamente la información proporcionada y responde de manera precisa y útil.
 
@@ -558,25 +998,50 @@ INSTRUCCIONES:
 Respuesta:"""
 
         try:
-            response = self.mistral_client.generate(prompt)
+            response = self.mistral_client.generate(prompt, on_token=self.token_callback)
+            if response is None:
+                return GENERATION_ERROR_MESSAGE
             return response
         except Exception as e:
             print(f"Error al generar contenido: {e}")
-            return "Error al procesar la consulta. Por favor, intenta nuevamente."
+            return GENERATION_ERROR_MESSAGE
     
-    def rag_query_enhanced(self, query: str, top_k: int = 10, use_genetic: bool = None) -> Dict[str, Any]:
-        """Implementa el flujo completo de RAG mejorado"""
+    def rag_query_enhanced(self, query: str, top_k: int = 10, use_genetic: bool = None,
+                           selection: str = None, destinations: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Implementa el flujo completo de RAG mejorado
+        
+        Args:
+            selection: Método de selección de documentos: 'cosine', 'genetic', 'mmr' o 'hybrid'
+                (fusión BM25 + densa; por defecto 'genetic' si la optimización genética está habilitada)
+            destinations: Países o ciudades a los que limitar la recuperación (opcional)
+        """
         print(f"🔍 Procesando consulta mejorada: {query}")
         
         
-        if use_genetic is None:
-            use_genetic = self.enable_genetic_optimization
+        if selection is None:
+            if use_genetic is None:
+                use_genetic = self.enable_genetic_optimization
+            selection = 'genetic' if use_genetic else 'cosine'
+        
+        
+        mode = self.answer_mode(f"enhanced:{selection}:{top_k}", destinations)
+        cached, version = self.cached_answer(query, mode)
+        if cached is not None:
+            print(f"⚡ Respuesta servida desde la caché semántica ({selection})")
+            cached['query'] = query
+            cached['from_cache'] = True
+            return cached
         
         
-        if use_genetic and self.genetic_optimizer:
-            selected_docs, metrics = self.retrieve_with_genetic_optimization(query, top_k)
+        if selection == 'mmr':
+            selected_docs, metrics = self.retrieve_with_mmr(query, top_k, destinations)
+        elif selection == 'hybrid':
+            selected_docs, metrics = self.retrieve_hybrid(query, top_k, destinations=destinations)
+        elif selection == 'genetic' and self.genetic_optimizer:
+            selected_docs, metrics = self.retrieve_with_genetic_optimization(query, top_k, destinations)
         else:
-            selected_docs, metrics = self.retrieve_enhanced(query, top_k)
+            selected_docs, metrics = self.retrieve_enhanced(query, top_k, destinations)
         
         if not selected_docs:
             return {
@@ -588,10 +1053,17 @@ Respuesta:"""
         
         response = self.generate_enhanced(query, selected_docs, metrics)
         
-        optimization_type = "genético" if metrics.get('genetic_optimization_used', False) else "coseno"
+        if metrics.get('genetic_optimization_used', False):
+            optimization_type = "genético"
+        elif metrics.get('mmr_selection_used', False):
+            optimization_type = "MMR"
+        elif metrics.get('hybrid_retrieval_used', False):
+            optimization_type = "híbrida BM25 + densa"
+        else:
+            optimization_type = "coseno"
         print(f"✅ Respuesta generada usando {len(selected_docs)} documentos (optimización {optimization_type}, relevancia promedio: {metrics['avg_relevance']:.3f})")
         
-        return {
+        result = {
             'query': query,
             'response': response,
             'metrics': metrics,
@@ -603,6 +1075,9 @@ Respuesta:"""
                 for doc in selected_docs
             ]
         }
+        if is_complete_answer(response):
+            self.store_answer(query, mode, version, result)
+        return result
     
     
     def rag_query(self, query: str, enhanced: bool = False, **kwargs) -> str:
@@ -619,7 +1094,7 @@ Respuesta:"""
             return result['response']
         else:
             
-            return super().rag_query(query)
+            return super().rag_query(query, destinations=kwargs.get('destinations'))
     
     def get_system_stats(self) -> Dict[str, Any]:
         """Obtiene estadísticas del sistema"""
@@ -627,6 +1102,13 @@ Respuesta:"""
             'embedding_model': self.embedding_model_name,
             'sentence_transformers_available': SENTENCE_TRANSFORMERS_AVAILABLE,
             'using_sentence_transformers': self.use_sentence_transformers,
+            'using_stored_embeddings': self.use_stored_embeddings,
+            'doc_embedding_cache_size': len(self.doc_embedding_cache),
+            'doc_embedding_cache_hits': self.embedding_cache_hits,
+            'doc_embedding_cache_misses': self.embedding_cache_misses,
+            'query_embedding_cache': self.get_cache_stats(),
+            'sparse_index': self.sparse_index.get_stats() if self.sparse_index is not None else None,
+            'answer_cache': self.get_answer_cache_stats(),
             'cosine_similarity_enabled': True,
             'chunking_enabled': False,
             'genetic_optimization_enabled': False
@@ -0,0 +1,142 @@
+"""
+Núcleos de similitud coseno por lotes
+Normaliza una sola vez los embeddings a float32 con norma unidad y calcula
+todas las similitudes consulta-documento con un único producto matriz-vector,
+en lugar de invocar sklearn documento a documento
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(embeddings) -> np.ndarray:
+    """
+    Convierte una matriz (o lista) de embeddings a float32 con filas de norma 1.
+
+    Las filas nulas (p. ej. textos sin términos en TF-IDF) se dejan a cero,
+    de modo que su similitud con cualquier vector es 0 como en sklearn.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def normalize_vector(embedding) -> np.ndarray:
+    """Convierte un embedding a float32 con norma 1 (el vector nulo se deja a cero)"""
+    return normalize_rows(embedding)[0]
+
+
+def query_scores(query_unit: np.ndarray, documents_unit: np.ndarray) -> np.ndarray:
+    """Similitudes coseno de una consulta con todos los documentos (vectores ya normalizados)"""
+    if documents_unit.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    return documents_unit @ query_unit
+
+
+def pairwise_scores(documents_unit: np.ndarray) -> np.ndarray:
+    """Matriz de similitudes coseno entre documentos (vectores ya normalizados)"""
+    return documents_unit @ documents_unit.T
+
+
+def mean_pairwise_score(documents_unit: np.ndarray) -> float:
+    """Similitud media entre los pares distintos de un conjunto de documentos normalizados"""
+    count = documents_unit.shape[0]
+    if count < 2:
+        return 0.0
+
+    summed = documents_unit.sum(axis=0)
+    squared_norms = float(np.einsum('ij,ij->', documents_unit, documents_unit))
+    return (float(summed @ summed) - squared_norms) / (count * (count - 1))
+
+
+class QuerySimilarities:
+    """
+    Similitudes de una consulta con sus documentos candidatos.
+
+    Se construye una vez por consulta y la comparten el ranking, el
+    optimizador genético y el cálculo de métricas.
+    """
+
+    def __init__(self, query_embedding, doc_embeddings):
+        self.query = normalize_vector(query_embedding)
+        self.documents = normalize_rows(doc_embeddings)
+        self.scores = query_scores(self.query, self.documents)
+        self._pairwise = None
+
+    def __len__(self) -> int:
+        return self.documents.shape[0]
+
+    @property
+    def pairwise(self) -> np.ndarray:
+        """Matriz de similitudes entre documentos (se calcula una sola vez por consulta)"""
+        if self._pairwise is None:
+            self._pairwise = pairwise_scores(self.documents)
+        return self._pairwise
+
+    def relevance(self, indices: Sequence[int]) -> np.ndarray:
+        """Similitudes con la consulta de un subconjunto de documentos"""
+        return self.scores[np.asarray(indices, dtype=np.int64)]
+
+    def ranking(self, top_k: int = None) -> np.ndarray:
+        """Índices de los documentos ordenados por similitud descendente (orden estable)"""
+        order = np.argsort(-self.scores, kind='stable')
+        return order if top_k is None else order[:top_k]
+
+
+def select_mmr(similarities: QuerySimilarities, doc_lengths: Sequence[float], target_size: int,
+               relevance_weight: float = 0.7, diversity_weight: float = 0.2, length_weight: float = 0.1,
+               optimal_length: float = 2000.0) -> Tuple[List[int], float]:
+    """
+    Selección voraz de documentos (Maximal Marginal Relevance).
+
+    En cada paso añade el documento que más aumenta el mismo objetivo que
+    optimiza el algoritmo genético (relevancia media, diversidad y longitud
+    total con pesos 0.7/0.2/0.1). Las similitudes con los ya elegidos se
+    acumulan en un vector, por lo que cada paso cuesta O(n) productos y la
+    selección completa O(k·n), sin matriz de pares.
+
+    Returns:
+        Tuple[List[int], float]: Índices elegidos (el prefijo con mejor objetivo) y su objetivo
+    """
+    total = len(similarities)
+    lengths = np.asarray(doc_lengths, dtype=np.float32)
+    if total == 0 or target_size <= 0:
+        return [], 0.0
+
+    available = np.ones(total, dtype=bool)
+    similarity_to_selected = np.zeros(total, dtype=np.float32)
+    selected: List[int] = []
+    relevance_sum = 0.0
+    pair_sum = 0.0
+    length_sum = 0.0
+    best_prefix, best_objective = 0, -np.inf
+
+    for size in range(1, min(target_size, total) + 1):
+        avg_relevance = (relevance_sum + similarities.scores) / size
+        if size > 1:
+            pairs = size * (size - 1) / 2
+            diversity = 1.0 - (pair_sum + similarity_to_selected) / pairs
+        else:
+            diversity = np.zeros(total, dtype=np.float32)
+        length_score = np.maximum(0.0, 1.0 - np.abs(length_sum + lengths - optimal_length) / optimal_length)
+
+        objective = relevance_weight * avg_relevance + diversity_weight * diversity + length_weight * length_score
+        objective = np.where(available, objective, -np.inf)
+        chosen = int(np.argmax(objective))
+
+        selected.append(chosen)
+        available[chosen] = False
+        relevance_sum += float(similarities.scores[chosen])
+        pair_sum += float(similarity_to_selected[chosen])
+        length_sum += float(lengths[chosen])
+        similarity_to_selected += similarities.documents @ similarities.documents[chosen]
+
+        if objective[chosen] > best_objective:
+            best_prefix, best_objective = size, float(objective[chosen])
+
+    return sorted(selected[:best_prefix]), max(0.0, best_objective)
@@ -0,0 +1,342 @@
+"""
+Descubrimiento de sitemaps para sembrar la frontera del crawler
+Lee las líneas Sitemap: de robots.txt, recorre índices de sitemaps y procesa
+el XML (posiblemente comprimido con gzip) en streaming, filtrando las URLs
+con el mismo criterio de palabras clave que el crawler
+"""
+
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.fetcher import PageFetcher
+
+
+FALLBACK_SITEMAP_PATHS = ['/sitemap.xml', '/sitemap_index.xml']
+
+# Tamaño máximo sin comprimir que admite el protocolo de sitemaps
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Convierte un valor lastmod (W3C datetime) a datetime con zona horaria"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value[:10], '%Y-%m-%d')
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class _PrefixedStream(io.RawIOBase):
+    """Flujo de lectura sobre una respuesta HTTP que permite inspeccionar los primeros bytes"""
+
+    def __init__(self, response):
+        self.response = response
+        self.prefix = response.raw.read(2) or b''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            data = self.prefix + (self.response.raw.read() or b'')
+            self.prefix = b''
+            return data
+
+        if self.prefix:
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            if len(data) < size:
+                data += self.response.raw.read(size - len(data)) or b''
+            return data
+
+        return self.response.raw.read(size) or b''
+
+    def close(self):
+        self.response.close()
+        super().close()
+
+
+class _LimitedStream(io.RawIOBase):
+    """Flujo de lectura que se corta (como si terminara) al alcanzar max_bytes"""
+
+    def __init__(self, stream, max_bytes: int):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.truncated = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self.max_bytes - self.bytes_read
+        if remaining <= 0:
+            if not self.truncated and self.stream.read(1):
+                self.truncated = True
+            return b''
+
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self.stream.read(size) or b''
+        self.bytes_read += len(data)
+        return data
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+class SitemapDiscovery:
+    """Descubre y procesa sitemaps para obtener URLs profundas relevantes"""
+
+    def __init__(self,
+                 fetcher: PageFetcher,
+                 max_sitemaps_per_host: int = 10,
+                 max_entries_per_sitemap: int = 20000,
+                 state_path: str = os.path.join("crawler_state", "sitemap_lastmod.json"),
+                 max_sitemap_bytes: int = MAX_SITEMAP_BYTES):
+        """
+        Args:
+            fetcher: Fetcher cuya sesión y salud de hosts se reutilizan
+            max_sitemaps_per_host: Sitemaps leídos como máximo por sitio (índices incluidos)
+            max_entries_per_sitemap: Entradas procesadas como máximo por sitemap
+            state_path: Ruta de los lastmod de las URLs ya rastreadas
+            max_sitemap_bytes: Bytes máximos por sitemap, tanto descargados como tras
+                descomprimir (protege de sitemaps enormes y de bombas gzip)
+        """
+        self.fetcher = fetcher
+        self.max_sitemaps_per_host = max_sitemaps_per_host
+        self.max_entries_per_sitemap = max_entries_per_sitemap
+        self.max_sitemap_bytes = max_sitemap_bytes
+        self.state_path = state_path
+
+        self.lock = threading.Lock()
+        self.crawled_lastmod: Dict[str, str] = self._load_state()
+        self.pending_lastmod: Dict[str, str] = {}
+
+        self.stats = {
+            'sitemaps_read': 0,
+            'entries_seen': 0,
+            'entries_matched': 0,
+            'entries_unchanged': 0,
+            'sitemaps_truncated': 0
+        }
+
+    def _load_state(self) -> Dict[str, str]:
+        """Carga los lastmod de las URLs ya rastreadas en sesiones anteriores"""
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el estado de sitemaps: {e}")
+        return {}
+
+    def save_state(self):
+        """Guarda los lastmod de las URLs rastreadas para programar recrawls"""
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            with self.lock:
+                data = dict(self.crawled_lastmod)
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el estado de sitemaps: {e}")
+
+    def mark_crawled(self, url: str):
+        """Registra que una URL sembrada desde un sitemap ya fue rastreada"""
+        with self.lock:
+            lastmod = self.pending_lastmod.pop(url, None)
+            if lastmod:
+                self.crawled_lastmod[url] = lastmod
+
+    def find_sitemaps(self, site_url: str) -> List[str]:
+        """Obtiene las URLs de sitemaps declaradas en robots.txt (o las rutas habituales)"""
+        parsed = urlparse(site_url)
+        base = f"{parsed.scheme or 'https'}://{parsed.netloc}"
+        sitemaps = []
+
+        stream = self._open(f"{base}/robots.txt")
+        if stream is not None:
+            try:
+                for raw_line in stream.read(512 * 1024).decode('utf-8', errors='replace').splitlines():
+                    line = raw_line.strip()
+                    if line.lower().startswith('sitemap:'):
+                        sitemap_url = line.split(':', 1)[1].strip()
+                        if sitemap_url:
+                            sitemaps.append(sitemap_url)
+            finally:
+                stream.close()
+
+        if not sitemaps:
+            sitemaps = [base + path for path in FALLBACK_SITEMAP_PATHS]
+
+        return list(dict.fromkeys(sitemaps))
+
+    def _open(self, url: str):
+        """
+        Abre una URL en streaming devolviendo un objeto tipo fichero (descomprimido si es gzip).
+        Tanto los bytes descargados como los descomprimidos se cortan en max_sitemap_bytes.
+        """
+        if not self.fetcher.health.allow_request(url):
+            return None
+
+        start_time = time.time()
+        try:
+            response = self.fetcher.session.get(url, timeout=self.fetcher.health.get_timeout(url), stream=True)
+        except Exception as e:
+            self.fetcher.health.record_failure(url, type(e).__name__)
+            return None
+
+        if response.status_code != 200:
+            if response.status_code in (403, 429) or response.status_code >= 500:
+                self.fetcher.health.record_failure(url, f"HTTP {response.status_code}")
+            else:
+                self.fetcher.health.record_success(url, time.time() - start_time)
+            response.close()
+            return None
+
+        self.fetcher.health.record_success(url, time.time() - start_time)
+
+        response.raw.decode_content = True
+        stream = _PrefixedStream(response)
+        compressed = stream.prefix[:2] == b'\x1f\x8b'
+        stream = _LimitedStream(stream, self.max_sitemap_bytes)
+        if compressed:
+            return _LimitedStream(gzip.GzipFile(fileobj=stream), self.max_sitemap_bytes)
+        return stream
+
+    @staticmethod
+    def _was_truncated(stream) -> bool:
+        """Indica si se cortó la descarga o la descompresión de un flujo devuelto por _open"""
+        while isinstance(stream, _LimitedStream):
+            if stream.truncated:
+                return True
+            stream = getattr(stream.stream, 'fileobj', stream.stream)
+        return False
+
+    def iter_sitemap(self, sitemap_url: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """
+        Procesa un sitemap en streaming.
+
+        Yields:
+            Tuplas (tipo, loc, lastmod) donde tipo es 'url' o 'sitemap'
+        """
+        stream = self._open(sitemap_url)
+        if stream is None:
+            return
+
+        self.stats['sitemaps_read'] += 1
+        loc, lastmod, entries = None, None, 0
+
+        try:
+            for event, element in ET.iterparse(stream, events=('end',)):
+                tag = element.tag.rsplit('}', 1)[-1]
+
+                if tag == 'loc':
+                    loc = (element.text or '').strip()
+                elif tag == 'lastmod':
+                    lastmod = (element.text or '').strip()
+                elif tag in ('url', 'sitemap'):
+                    if loc:
+                        yield tag, loc, lastmod
+                        entries += 1
+                    loc, lastmod = None, None
+                    element.clear()
+
+                    if entries >= self.max_entries_per_sitemap:
+                        break
+        except (ET.ParseError, EOFError, OSError) as e:
+            if self._was_truncated(stream):
+                self.stats['sitemaps_truncated'] += 1
+                print(f"⚠️ Sitemap {sitemap_url} cortado al superar {self.max_sitemap_bytes} bytes")
+            else:
+                print(f"⚠️ Sitemap mal formado {sitemap_url}: {e}")
+        finally:
+            stream.close()
+
+    def discover(self, site_url: str, matcher: Callable[[str], bool], max_urls: int = 50) -> List[str]:
+        """
+        Obtiene URLs relevantes de los sitemaps de un sitio.
+
+        Las URLs ya rastreadas cuyo lastmod no ha cambiado se omiten y el resto
+        se ordena de la más reciente a la más antigua.
+
+        Args:
+            site_url: Cualquier URL del sitio
+            matcher: Función que decide si una URL es relevante para la consulta
+            max_urls: Número máximo de URLs a devolver
+
+        Returns:
+            Lista de URLs para sembrar la frontera
+        """
+        pending_sitemaps = self.find_sitemaps(site_url)
+        seen_sitemaps = set()
+        candidates: List[Tuple[Optional[datetime], str, Optional[str]]] = []
+
+        while pending_sitemaps and len(seen_sitemaps) < self.max_sitemaps_per_host:
+            sitemap_url = pending_sitemaps.pop(0)
+            if sitemap_url in seen_sitemaps:
+                continue
+            seen_sitemaps.add(sitemap_url)
+
+            child_sitemaps = []
+            for entry_type, loc, lastmod in self.iter_sitemap(sitemap_url):
+                if entry_type == 'sitemap':
+                    child_sitemaps.append((matcher(loc), parse_lastmod(lastmod), loc))
+                    continue
+
+                self.stats['entries_seen'] += 1
+                if not matcher(loc):
+                    continue
+                self.stats['entries_matched'] += 1
+
+                previous = self.crawled_lastmod.get(loc)
+                if previous and lastmod:
+                    previous_date, current_date = parse_lastmod(previous), parse_lastmod(lastmod)
+                    if previous_date and current_date and current_date <= previous_date:
+                        self.stats['entries_unchanged'] += 1
+                        continue
+                elif previous and not lastmod:
+                    self.stats['entries_unchanged'] += 1
+                    continue
+
+                candidates.append((parse_lastmod(lastmod), loc, lastmod))
+
+            epoch = datetime.min.replace(tzinfo=timezone.utc)
+            child_sitemaps.sort(key=lambda item: (item[0], item[1] or epoch), reverse=True)
+            pending_sitemaps.extend(loc for _, _, loc in child_sitemaps)
+
+        epoch = datetime.min.replace(tzinfo=timezone.utc)
+        candidates.sort(key=lambda item: item[0] or epoch, reverse=True)
+
+        selected = []
+        with self.lock:
+            for _, loc, lastmod in candidates:
+                if loc in selected:
+                    continue
+                selected.append(loc)
+                self.pending_lastmod[loc] = lastmod or datetime.now(timezone.utc).isoformat()
+                if len(selected) >= max_urls:
+                    break
+
+        return selected
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtiene estadísticas del descubrimiento de sitemaps"""
+        return self.stats.copy()
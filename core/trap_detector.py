@@ -0,0 +1,247 @@
+"""
+Detección de trampas para el crawler
+Agrupa las URLs de cada host en plantillas (calendarios, filtros facetados,
+listados ?page=N...) y mide cuántas páginas de cada plantilla aportan contenido
+nuevo, limitando o bloqueando las plantillas cuyo rendimiento marginal es bajo
+"""
+
+import hashlib
+import re
+import threading
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse, parse_qsl
+
+
+DIGITS_PATTERN = re.compile(r'\d+')
+
+HEX_ID_PATTERN = re.compile(r'^[0-9a-f]{12,}$|^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
+
+def url_template(url: str) -> str:
+    """
+    Obtiene la plantilla de una URL.
+
+    Los números se sustituyen por {n}, los identificadores hexadecimales por {id}
+    y de la query solo se conservan los nombres de los parámetros (ordenados), de
+    modo que /hotel/123?page=4&sort=price y /hotel/987?sort=name&page=5 comparten
+    la plantilla host/hotel/{n}?page&sort.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().split(':')[0]
+    if host.startswith('www.'):
+        host = host[4:]
+
+    segments = []
+    for segment in parsed.path.lower().split('/'):
+        if not segment:
+            continue
+        if HEX_ID_PATTERN.match(segment):
+            segments.append('{id}')
+        else:
+            segments.append(DIGITS_PATTERN.sub('{n}', segment))
+
+    template = host + '/' + '/'.join(segments)
+
+    params = sorted({key.lower() for key, _ in parse_qsl(parsed.query, keep_blank_values=True)})
+    if params:
+        template += '?' + '&'.join(params)
+
+    return template
+
+
+class TemplateStats:
+    """Rendimiento observado de una plantilla de URL"""
+
+    ACTIVE = 'active'
+    THROTTLED = 'throttled'
+    BANNED = 'banned'
+
+    def __init__(self, template: str):
+        self.template = template
+        self.state = self.ACTIVE
+        self.fetched = 0
+        self.new_content = 0
+        self.skipped = 0
+        self.candidates_seen = 0
+        self.reason: Optional[str] = None
+        self.shingles: Set[int] = set()
+
+    @property
+    def marginal_yield(self) -> float:
+        return self.new_content / self.fetched if self.fetched else 1.0
+
+
+class TrapDetector:
+    """Limita las plantillas de URL que consumen presupuesto sin aportar contenido nuevo"""
+
+    def __init__(self,
+                 min_samples: int = 5,
+                 throttle_threshold: float = 0.3,
+                 ban_threshold: float = 0.1,
+                 throttle_every: int = 4,
+                 min_novelty: float = 0.2,
+                 max_repeated_segments: int = 2,
+                 max_shingles_per_template: int = 50000):
+        """
+        Args:
+            min_samples: Páginas descargadas de una plantilla antes de evaluar su rendimiento
+            throttle_threshold: Rendimiento por debajo del cual la plantilla se limita
+            ban_threshold: Rendimiento por debajo del cual la plantilla se bloquea
+            throttle_every: En plantillas limitadas solo se descarga una de cada N URLs
+            min_novelty: Fracción mínima de fragmentos de texto no vistos para considerar una página nueva
+            max_repeated_segments: Veces que puede repetirse un segmento de ruta (bucles /a/b/a/b)
+            max_shingles_per_template: Límite de fragmentos recordados por plantilla
+        """
+        self.min_samples = min_samples
+        self.throttle_threshold = throttle_threshold
+        self.ban_threshold = ban_threshold
+        self.throttle_every = max(1, throttle_every)
+        self.min_novelty = min_novelty
+        self.max_repeated_segments = max_repeated_segments
+        self.max_shingles_per_template = max_shingles_per_template
+
+        self.templates: Dict[str, TemplateStats] = {}
+        self.content_hashes: Set[str] = set()
+        self.lock = threading.Lock()
+        self.loop_urls_skipped = 0
+
+    def _get_stats(self, template: str) -> TemplateStats:
+        if template not in self.templates:
+            self.templates[template] = TemplateStats(template)
+        return self.templates[template]
+
+    def has_path_loop(self, url: str) -> bool:
+        """Detecta rutas con segmentos repetidos, típicas de enlaces relativos mal formados"""
+        segments = [s for s in urlparse(url).path.lower().split('/') if s]
+        counts: Dict[str, int] = {}
+        for segment in segments:
+            counts[segment] = counts.get(segment, 0) + 1
+            if counts[segment] > self.max_repeated_segments:
+                return True
+        return False
+
+    def is_banned(self, url: str) -> bool:
+        """Indica si la URL pertenece a una plantilla bloqueada o contiene un bucle de ruta"""
+        if self.has_path_loop(url):
+            return True
+        with self.lock:
+            stats = self.templates.get(url_template(url))
+            return stats is not None and stats.state == TemplateStats.BANNED
+
+    def should_fetch(self, url: str) -> bool:
+        """
+        Decide si una URL de la frontera debe descargarse.
+
+        Las plantillas bloqueadas se descartan y las limitadas solo dejan pasar
+        una de cada throttle_every URLs candidatas.
+        """
+        if self.has_path_loop(url):
+            with self.lock:
+                self.loop_urls_skipped += 1
+            return False
+
+        with self.lock:
+            stats = self._get_stats(url_template(url))
+            stats.candidates_seen += 1
+
+            if stats.state == TemplateStats.BANNED:
+                stats.skipped += 1
+                return False
+
+            if stats.state == TemplateStats.THROTTLED and stats.candidates_seen % self.throttle_every != 0:
+                stats.skipped += 1
+                return False
+
+            return True
+
+    def _shingles(self, text: str) -> Set[int]:
+        """Fragmentos de tres palabras del texto (sin números) usados para medir novedad"""
+        words = DIGITS_PATTERN.sub('', text.lower()).split()
+        return {hash(' '.join(words[i:i + 3])) for i in range(max(0, len(words) - 2))}
+
+    def record_page(self, url: str, text: Optional[str]) -> bool:
+        """
+        Registra el resultado de descargar una URL y reevalúa su plantilla.
+
+        Args:
+            url: URL descargada
+            text: Contenido extraído (None si la página no tenía contenido suficiente)
+
+        Returns:
+            bool: True si la página aportó contenido nuevo
+        """
+        is_new = False
+
+        with self.lock:
+            stats = self._get_stats(url_template(url))
+            stats.fetched += 1
+
+            if text:
+                normalized = ' '.join(DIGITS_PATTERN.sub('', text.lower()).split())
+                content_hash = hashlib.md5(normalized.encode('utf-8')).hexdigest()
+
+                if content_hash not in self.content_hashes:
+                    self.content_hashes.add(content_hash)
+                    shingles = self._shingles(text)
+                    unseen = shingles - stats.shingles
+                    is_new = not shingles or len(unseen) / len(shingles) >= self.min_novelty
+
+                    if len(stats.shingles) < self.max_shingles_per_template:
+                        stats.shingles.update(unseen)
+
+            if is_new:
+                stats.new_content += 1
+
+            self._evaluate(stats)
+
+        return is_new
+
+    def _evaluate(self, stats: TemplateStats):
+        """Actualiza el estado de una plantilla según su rendimiento marginal"""
+        if stats.fetched < self.min_samples or stats.state == TemplateStats.BANNED:
+            return
+
+        marginal_yield = stats.marginal_yield
+        previous_state = stats.state
+
+        if marginal_yield < self.ban_threshold:
+            stats.state = TemplateStats.BANNED
+        elif marginal_yield < self.throttle_threshold:
+            stats.state = TemplateStats.THROTTLED
+        else:
+            stats.state = TemplateStats.ACTIVE
+
+        if stats.state != previous_state:
+            stats.reason = f"{stats.new_content}/{stats.fetched} páginas con contenido nuevo"
+            if stats.state == TemplateStats.BANNED:
+                print(f"🚫 Plantilla bloqueada por bajo rendimiento: {stats.template} ({stats.reason})")
+            elif stats.state == TemplateStats.THROTTLED:
+                print(f"🐢 Plantilla limitada por bajo rendimiento: {stats.template} ({stats.reason})")
+
+    def get_report(self) -> List[Dict]:
+        """Lista las plantillas limitadas o bloqueadas con su rendimiento"""
+        with self.lock:
+            report = [{
+                'template': stats.template,
+                'state': stats.state,
+                'fetched': stats.fetched,
+                'new_content': stats.new_content,
+                'yield': round(stats.marginal_yield, 3),
+                'skipped': stats.skipped,
+                'reason': stats.reason
+            } for stats in self.templates.values() if stats.state != TemplateStats.ACTIVE]
+
+        report.sort(key=lambda item: item['skipped'], reverse=True)
+        return report
+
+    def get_stats(self) -> Dict[str, int]:
+        """Obtiene estadísticas globales del detector"""
+        with self.lock:
+            states = [stats.state for stats in self.templates.values()]
+            return {
+                'templates': len(states),
+                'throttled_templates': states.count(TemplateStats.THROTTLED),
+                'banned_templates': states.count(TemplateStats.BANNED),
+                'urls_skipped': sum(stats.skipped for stats in self.templates.values()) + self.loop_urls_skipped,
+                'loop_urls_skipped': self.loop_urls_skipped
+            }
@@ -18,6 +18,37 @@ warnings.filterwarnings('ignore', message='flaml.automl is not available')
 
 warnings.filterwarnings('ignore', message='flaml.automl is not available')
 
+
+class TokenPrinter:
+    """Muestra en la consola los tokens de las respuestas a medida que se generan"""
+
+    def __init__(self):
+        self.last_generation = ""
+        self.in_generation = False
+
+    def __call__(self, chunk: str):
+        if not chunk:
+            
+            if self.in_generation:
+                print(flush=True)
+            self.in_generation = False
+            return
+        if not self.in_generation:
+            print("\n🤖 ", end="", flush=True)
+            self.last_generation = ""
+            self.in_generation = True
+        print(chunk, end="", flush=True)
+        self.last_generation += chunk
+
+    def reset(self):
+        self.last_generation = ""
+        self.in_generation = False
+
+    def finish(self, response: str):
+        """Muestra la respuesta final salvo que sea exactamente la última generación ya mostrada"""
+        if (response or "").strip() != self.last_generation.strip() or not self.last_generation:
+            print(f"\n🤖 {response}")
+
 if __name__ == "__main__":
     
     load_dotenv()
@@ -38,7 +69,8 @@ if __name__ == "__main__":
         starting_urls=starting_urls, 
         max_pages=200, 
         max_depth=2,
-        num_threads=10  
+        num_threads=20,
+        min_threads=2
     )
     
     rag_agent = RAGAgent("rag_agent")
@@ -48,10 +80,12 @@ if __name__ == "__main__":
     tourist_guide_agent = TouristGuideAgent("tourist_guide_agent")
     simulation_agent = TouristSimulationAgent("simulation_agent", "average")  
     coordinator = CoordinatorAgent("coordinator", crawler_agent, rag_agent, interface_agent, context_agent, route_agent, tourist_guide_agent, simulation_agent)
+    token_printer = TokenPrinter()
+    coordinator.set_token_callback(token_printer)
 
     
     print("⚡ Iniciando sistema multiagente de turismo con crawler paralelo...")
-    print(f"🔧 Configuración: {crawler_agent.crawler.num_threads} hilos paralelos")
+    print(f"🔧 Configuración: concurrencia adaptativa (AIMD) entre {crawler_agent.crawler.concurrency.min_concurrency} y {crawler_agent.crawler.num_threads} hilos")
     print("🎮 Agente de simulación turística activado con lógica difusa")
     coordinator.start()
 
@@ -106,5 +140,6 @@ if __name__ == "__main__":
         
         
         if user_query.lower() not in ['stats', 'contexto', 'limpiar', 'salir']:
+            token_printer.reset()
             response = coordinator.ask(user_query)
-            print(f"\n🤖 {response}")
+            token_printer.finish(response)
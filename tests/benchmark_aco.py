@@ -0,0 +1,314 @@
+"""
+Benchmark offline de estrategias de crawling sobre webs sintéticas
+Construye grafos en memoria con una región de páginas relevantes cuyas URLs
+no dan pistas de su contenido y los sirve con un fetcher falso, de modo que
+ACO, el crawler BFS y una búsqueda best-first se comparan sin red midiendo
+páginas relevantes encontradas por descarga y tiempo total
+"""
+
+import sys
+import os
+import io
+import heapq
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.crawler import TourismCrawler
+from core.fetcher import PageFetcher, FetchResult
+from core.link_classifier import LinkClassifier
+from utils.ant_colony_crawler import AntColonyOptimizer
+
+
+KEYWORDS = ["hotel", "varadero", "playa"]
+SEEDS = [1, 2, 3, 4, 5]
+TOP_K = 15
+FIND_TARGET = 5
+
+TOPIC_WORDS = ["hotel", "varadero", "playa", "piscina", "restaurante", "habitaciones", "arena",
+               "todo", "incluido", "mar", "excursiones", "familia", "resort", "vistas", "spa"]
+FILLER_WORDS = ["trámites", "noticias", "horarios", "contacto", "empresa", "política", "aviso",
+                "legal", "empleo", "prensa", "oficina", "documentos", "formulario", "servicios",
+                "clientes", "factura", "registro", "soporte", "ayuda", "preguntas", "cuenta",
+                "informe", "boletín", "evento", "reunión", "proyecto", "equipo", "mercado"]
+
+
+class SyntheticWeb:
+    """
+    Web sintética en forma de árbol con enlaces cruzados.
+
+    La raíz enlaza a `branching` secciones; una de ellas (y todo su subárbol)
+    contiene páginas relevantes que hablan de la consulta. El resto son
+    páginas de relleno que solo mencionan "hotel" de pasada. Los textos de
+    los enlaces son ruidosos: algunos enlaces a páginas relevantes no lo
+    indican y algunos enlaces a relleno sí lo parecen.
+    """
+
+    def __init__(self, branching: int = 8, depth: int = 3, cross_links: int = 2,
+                 anchor_noise: float = 0.25, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.base = "https://bench.site/p"
+        self.links = {0: []}
+        self.relevant = set()
+
+        frontier = [0]
+        next_id = 1
+        relevant_section = int(rng.integers(branching)) + 1
+        for level in range(depth):
+            new_frontier = []
+            for parent in frontier:
+                for _ in range(branching):
+                    child = next_id
+                    next_id += 1
+                    self.links[parent].append(child)
+                    self.links[child] = []
+                    if child == relevant_section or parent in self.relevant:
+                        self.relevant.add(child)
+                    new_frontier.append(child)
+            frontier = new_frontier
+
+        self.num_pages = next_id
+        for page_id in range(1, self.num_pages):
+            targets = rng.integers(1, self.num_pages, size=cross_links)
+            self.links[page_id].extend(int(target) for target in targets if target != page_id)
+
+        for page_id in self.links:
+            order = rng.permutation(len(self.links[page_id]))
+            self.links[page_id] = [self.links[page_id][i] for i in order]
+
+        self.anchors = {}
+        self.texts = {}
+        for page_id in range(self.num_pages):
+            looks_relevant = (page_id in self.relevant) != (rng.random() < anchor_noise)
+            self.anchors[page_id] = f"Hotel en Varadero {page_id}" if looks_relevant else f"Hotel {page_id}"
+
+            if page_id in self.relevant:
+                words = rng.choice(TOPIC_WORDS, size=40).tolist() + rng.choice(FILLER_WORDS, size=20).tolist()
+            else:
+                words = ["hotel"] + rng.choice(FILLER_WORDS, size=59).tolist()
+            self.texts[page_id] = ' '.join(rng.permutation(words).tolist())
+
+    def url(self, page_id: int) -> str:
+        return f"{self.base}/{page_id}"
+
+    def page_id(self, url: str) -> int:
+        return int(url.rsplit("/", 1)[-1])
+
+    def is_relevant(self, url: str) -> bool:
+        return self.page_id(url) in self.relevant
+
+    def html(self, page_id: int) -> str:
+        anchors = ''.join(f'<a href="{self.url(link)}">{self.anchors[link]}</a>' for link in self.links[page_id])
+        return (f"<html><head><title>Página {page_id}</title></head>"
+                f"<body><div class='related'>{anchors}</div><article><p>{self.texts[page_id]}</p></article></body></html>")
+
+
+class SyntheticFetcher(PageFetcher):
+    """Fetcher en memoria que sirve la web sintética con una latencia fija por página"""
+
+    def __init__(self, web: SyntheticWeb, latency: float = 0.01):
+        super().__init__()
+        self.web = web
+        self.latency = latency
+        self.fetched = []
+        self.fetched_lock = threading.Lock()
+
+    def fetch(self, url: str, timeout: float = None) -> FetchResult:
+        time.sleep(self.latency)
+        with self.fetched_lock:
+            self.fetched.append(url)
+
+        if not url.startswith(self.web.base):
+            return FetchResult(url=url, status_code=404)
+        text = self.web.html(self.web.page_id(url))
+        with self.stats_lock:
+            self.stats['pages_fetched'] += 1
+            self.stats['bytes_read'] += len(text)
+        return FetchResult(url=url, status_code=200, text=text, content_type='text/html', bytes_read=len(text))
+
+
+class FakeCollection:
+    """Colección en memoria para ejecutar el crawler sin ChromaDB"""
+
+    def __init__(self):
+        self.ids = []
+
+    def add(self, ids, documents, metadatas):
+        self.ids.extend(ids)
+
+
+def fetches_to_find(fetched, web: SyntheticWeb, target: int) -> int:
+    """Descargas necesarias hasta encontrar `target` páginas relevantes (o None si no se alcanzan)"""
+    found = 0
+    for index, url in enumerate(fetched, 1):
+        if web.is_relevant(url):
+            found += 1
+            if found == target:
+                return index
+    return None
+
+
+def measure(web: SyntheticWeb, fetched, seconds: float, ranked=None) -> dict:
+    """Métricas de una ejecución a partir del orden de descarga"""
+    relevant_fetched = sum(web.is_relevant(url) for url in set(fetched))
+    metrics = {
+        'fetches': len(fetched),
+        'relevant_fetched': relevant_fetched,
+        'harvest_rate': relevant_fetched / max(len(fetched), 1),
+        'fetches_to_target': fetches_to_find(fetched, web, FIND_TARGET),
+        'seconds': seconds
+    }
+    if ranked is not None:
+        metrics['precision_at_k'] = sum(web.is_relevant(url) for url in ranked) / max(len(ranked), 1)
+    return metrics
+
+
+def run_aco(web: SyntheticWeb, iterations: int, seed: int, content_scoring: bool = True) -> dict:
+    """ACO síncrono (`run_optimization`) con un número fijo de iteraciones"""
+    fetcher = SyntheticFetcher(web)
+    with redirect_stdout(io.StringIO()):
+        aco = AntColonyOptimizer(num_ants=8, max_iterations=iterations, max_depth=3, seed=seed,
+                                 fetcher=fetcher, content_scoring=content_scoring)
+        start_time = time.time()
+        aco.run_optimization([web.url(0)], KEYWORDS)
+        elapsed = time.time() - start_time
+
+    return measure(web, fetcher.fetched, elapsed, ranked=aco.top_urls(TOP_K))
+
+
+def run_aco_budget(web: SyntheticWeb, budget: int, seed: int) -> dict:
+    """ACO asíncrono (`run_optimization_async`) limitado al mismo número de descargas que el resto"""
+    fetcher = SyntheticFetcher(web)
+    with redirect_stdout(io.StringIO()):
+        aco = AntColonyOptimizer(num_ants=8, max_iterations=1000, max_depth=3, seed=seed, fetcher=fetcher)
+        start_time = time.time()
+        aco.run_optimization_async([web.url(0)], KEYWORDS, fetch_budget=budget, time_budget=60.0)
+        elapsed = time.time() - start_time
+
+    return measure(web, fetcher.fetched, elapsed, ranked=aco.top_urls(TOP_K))
+
+
+def run_bfs(web: SyntheticWeb, budget: int, workdir: str) -> dict:
+    """Crawler paralelo en anchura de TourismCrawler (`run_parallel_crawler`)"""
+    fetcher = SyntheticFetcher(web)
+    with redirect_stdout(io.StringIO()):
+        crawler = TourismCrawler([web.url(0)], max_pages=budget + 1, max_depth=3, num_threads=8,
+                                 enable_mistral_processing=False, use_sitemaps=False,
+                                 collection=FakeCollection())
+        crawler.fetcher = fetcher
+        crawler.link_classifier = LinkClassifier(model_path=os.path.join(workdir, "link_classifier.npz"))
+        crawler.current_query_keywords = KEYWORDS
+        start_time = time.time()
+        crawler.run_parallel_crawler()
+        elapsed = time.time() - start_time
+
+    return measure(web, fetcher.fetched, elapsed)
+
+
+def run_best_first(web: SyntheticWeb, budget: int) -> dict:
+    """
+    Crawler best-first clásico: siempre descarga el enlace de mayor prioridad,
+    combinando el texto del enlace con la relevancia de la página que lo contiene
+    """
+    fetcher = SyntheticFetcher(web)
+    start_time = time.time()
+
+    frontier = [(-1.0, 0, web.url(0))]
+    queued = {web.url(0)}
+    counter = 1
+    while frontier and len(fetcher.fetched) < budget:
+        _, _, url = heapq.heappop(frontier)
+        response = fetcher.fetch(url)
+        if not response.ok:
+            continue
+
+        soup = BeautifulSoup(response.text, 'html.parser')
+        article = soup.find('article')
+        page_relevance = AntColonyOptimizer._lexical_similarity(
+            KEYWORDS, article.get_text(' ', strip=True) if article else '')
+        for a_tag in soup.find_all('a', href=True):
+            link = a_tag['href']
+            if link in queued:
+                continue
+            queued.add(link)
+            anchor_relevance = AntColonyOptimizer._lexical_similarity(KEYWORDS, a_tag.get_text(' ', strip=True))
+            heapq.heappush(frontier, (-(0.5 * anchor_relevance + 0.5 * page_relevance), counter, link))
+            counter += 1
+
+    return measure(web, fetcher.fetched, time.time() - start_time)
+
+
+def summarize(runs) -> dict:
+    reached = [run['fetches_to_target'] for run in runs if run['fetches_to_target'] is not None]
+    summary = {
+        'fetches': np.mean([run['fetches'] for run in runs]),
+        'relevant_fetched': np.mean([run['relevant_fetched'] for run in runs]),
+        'harvest_rate': np.mean([run['harvest_rate'] for run in runs]),
+        'fetches_to_target': np.mean(reached) if reached else float('nan'),
+        'reached_target': len(reached),
+        'seconds': np.mean([run['seconds'] for run in runs])
+    }
+    if 'precision_at_k' in runs[0]:
+        summary['precision_at_k'] = np.mean([run['precision_at_k'] for run in runs])
+    return summary
+
+
+def _print_header(first_column: str):
+    print(f"{first_column:>6} {'estrategia':<12} {'descargas':>9} {'relevantes':>10} {'cosecha':>8} "
+          f"{f'P@{TOP_K}':>6} {f'desc. hasta {FIND_TARGET}':>15} {'seg':>6}")
+
+
+def _print_row(first_value, name: str, summary: dict):
+    precision = f"{summary['precision_at_k']:>6.2f}" if 'precision_at_k' in summary else f"{'-':>6}"
+    print(f"{first_value:>6} {name:<12} {summary['fetches']:>9.1f} {summary['relevant_fetched']:>10.1f} "
+          f"{summary['harvest_rate']:>8.2f} {precision} "
+          f"{summary['fetches_to_target']:>10.1f} ({summary['reached_target']}/{len(SEEDS)}) "
+          f"{summary['seconds']:>6.2f}")
+
+
+def benchmark_content_scoring(iteration_budgets=(5, 10, 20, 40)):
+    """Compara la calidad de camino basada en la URL frente a la basada en el contenido descargado"""
+    print("🧪 BENCHMARK ACO: PUNTUACIÓN POR CONTENIDO")
+    print("=" * 90)
+    _print_header("iter")
+
+    for iterations in iteration_budgets:
+        for content_scoring in (False, True):
+            runs = [run_aco(SyntheticWeb(seed=seed), iterations, seed, content_scoring) for seed in SEEDS]
+            _print_row(iterations, "contenido" if content_scoring else "url", summarize(runs))
+
+
+def benchmark_strategies(fetch_budgets=(50, 100, 200)):
+    """Compara ACO, el crawler BFS y best-first con el mismo presupuesto de descargas"""
+    print("\n🧪 BENCHMARK: ACO vs BFS vs BEST-FIRST")
+    print("=" * 90)
+    _print_header("pres.")
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+
+        os.chdir(workdir)
+        try:
+            for budget in fetch_budgets:
+                strategies = {
+                    'bfs': lambda web, seed: run_bfs(web, budget, workdir),
+                    'best-first': lambda web, seed: run_best_first(web, budget),
+                    'aco': lambda web, seed: run_aco(web, max(1, budget // 8), seed),
+                    'aco-async': lambda web, seed: run_aco_budget(web, budget, seed)
+                }
+                for name, strategy in strategies.items():
+                    runs = [strategy(SyntheticWeb(seed=seed), seed) for seed in SEEDS]
+                    _print_row(budget, name, summarize(runs))
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    benchmark_content_scoring()
+    benchmark_strategies()
@@ -0,0 +1,152 @@
+"""
+Benchmark de la selección de documentos: algoritmo genético frente a MMR voraz
+Compara el valor del objetivo (relevancia 0.7, diversidad 0.2, longitud 0.1),
+la relevancia media y la latencia de ambas selecciones sobre consultas
+contra la colección persistida en ChromaDB o, si no existe, sobre un corpus
+sintético con grupos de documentos casi duplicados
+"""
+
+import sys
+import os
+import io
+import random
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rag import GeneticDocumentOptimizer
+from core.similarity import QuerySimilarities, select_mmr
+
+
+STORED_QUERIES = [
+    "hoteles en Varadero con playa",
+    "restaurantes de comida cubana en La Habana",
+    "museos y sitios históricos en Trinidad",
+    "excursiones de naturaleza en Viñales",
+    "vida nocturna y música en vivo en Santiago de Cuba",
+    "actividades para familias con niños en Cayo Coco",
+    "alojamiento económico en el centro de La Habana",
+    "playas tranquilas cerca de Cienfuegos"
+]
+CANDIDATES = 40
+TARGET_SIZE = 8
+GA_SEEDS = [0, 1, 2]
+
+
+def stored_query_candidates(chroma_path: str = "chroma_db", collection_name: str = "tourism_data"):
+    """
+    Candidatos de cada consulta tomados de la colección persistida, con sus embeddings almacenados.
+
+    Returns:
+        List[Tuple[str, List[str], np.ndarray, np.ndarray]] o lista vacía si no hay colección
+    """
+    if not os.path.isdir(chroma_path):
+        return []
+
+    try:
+        import chromadb
+        from chromadb.utils import embedding_functions
+
+        embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+        collection = chromadb.PersistentClient(path=chroma_path).get_collection(
+            name=collection_name, embedding_function=embedding_function
+        )
+        if collection.count() <= TARGET_SIZE:
+            return []
+
+        cases = []
+        query_embeddings = embedding_function(STORED_QUERIES)
+        for query, query_embedding in zip(STORED_QUERIES, query_embeddings):
+            results = collection.query(query_embeddings=[query_embedding],
+                                       n_results=min(CANDIDATES, collection.count()),
+                                       include=['documents', 'embeddings'])
+            cases.append((query, results['documents'][0], np.asarray(query_embedding),
+                          np.asarray(results['embeddings'][0])))
+        return cases
+    except Exception as e:
+        print(f"⚠️ No se pudo leer la colección {collection_name}: {e}")
+        return []
+
+
+def synthetic_candidates(num_queries: int = 8, dim: int = 384, seed: int = 0):
+    """Consultas sintéticas cuyos candidatos forman grupos de documentos casi duplicados"""
+    rng = np.random.default_rng(seed)
+    cases = []
+    for index in range(num_queries):
+        query_embedding = rng.normal(size=dim)
+        centers = query_embedding * rng.uniform(0.2, 1.0, size=(8, 1)) + rng.normal(size=(8, dim))
+        groups = rng.integers(0, 8, size=CANDIDATES)
+        doc_embeddings = centers[groups] + 0.1 * rng.normal(size=(CANDIDATES, dim))
+        documents = ["texto " * int(n) for n in rng.integers(30, 120, size=CANDIDATES)]
+        cases.append((f"consulta sintética {index + 1}", documents, query_embedding, doc_embeddings))
+    return cases
+
+
+def compare_selection(cases):
+    optimizer = GeneticDocumentOptimizer()
+    rows = []
+
+    for query, documents, query_embedding, doc_embeddings in cases:
+        similarities = QuerySimilarities(query_embedding, doc_embeddings)
+        lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+
+        start_time = time.perf_counter()
+        mmr_indices, mmr_objective = select_mmr(similarities, lengths, TARGET_SIZE)
+        mmr_time = time.perf_counter() - start_time
+
+        ga_objectives, ga_times, ga_relevance = [], [], []
+        for seed in GA_SEEDS:
+            random.seed(seed)
+            with redirect_stdout(io.StringIO()):
+                start_time = time.perf_counter()
+                ga_indices, ga_metrics = optimizer.optimize(documents, query_embedding, doc_embeddings,
+                                                            target_size=TARGET_SIZE, similarities=similarities)
+                ga_times.append(time.perf_counter() - start_time)
+            ga_objectives.append(ga_metrics['best_fitness'])
+            ga_relevance.append(float(np.mean(similarities.relevance(ga_indices))))
+
+        rows.append({
+            'query': query,
+            'mmr_objective': mmr_objective,
+            'mmr_relevance': float(np.mean(similarities.relevance(mmr_indices))),
+            'mmr_ms': mmr_time * 1000,
+            'ga_objective': float(np.mean(ga_objectives)),
+            'ga_objective_spread': float(np.ptp(ga_objectives)),
+            'ga_relevance': float(np.mean(ga_relevance)),
+            'ga_ms': float(np.mean(ga_times)) * 1000
+        })
+    return rows
+
+
+def benchmark_selection():
+    cases = stored_query_candidates()
+    source = "colección ChromaDB"
+    if not cases:
+        cases = synthetic_candidates()
+        source = "corpus sintético"
+
+    print(f"🧪 BENCHMARK DE SELECCIÓN: GENÉTICO vs MMR ({source}, {TARGET_SIZE} de {CANDIDATES} candidatos)")
+    print("=" * 100)
+    print(f"{'consulta':<45} {'obj. GA':>8} {'±GA':>6} {'obj. MMR':>9} {'rel. GA':>8} {'rel. MMR':>9} "
+          f"{'ms GA':>7} {'ms MMR':>7}")
+
+    rows = compare_selection(cases)
+    for row in rows:
+        print(f"{row['query'][:45]:<45} {row['ga_objective']:>8.3f} {row['ga_objective_spread']:>6.3f} "
+              f"{row['mmr_objective']:>9.3f} {row['ga_relevance']:>8.3f} {row['mmr_relevance']:>9.3f} "
+              f"{row['ga_ms']:>7.2f} {row['mmr_ms']:>7.2f}")
+
+    print("-" * 100)
+    print(f"{'media':<45} {np.mean([r['ga_objective'] for r in rows]):>8.3f} "
+          f"{np.mean([r['ga_objective_spread'] for r in rows]):>6.3f} "
+          f"{np.mean([r['mmr_objective'] for r in rows]):>9.3f} "
+          f"{np.mean([r['ga_relevance'] for r in rows]):>8.3f} "
+          f"{np.mean([r['mmr_relevance'] for r in rows]):>9.3f} "
+          f"{np.mean([r['ga_ms'] for r in rows]):>7.2f} {np.mean([r['mmr_ms'] for r in rows]):>7.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_selection()
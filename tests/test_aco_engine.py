@@ -0,0 +1,154 @@
+"""
+Pruebas del motor vectorizado de la colonia de hormigas
+"""
+
+import time
+
+import numpy as np
+
+from utils.ant_colony_crawler import AntColonyOptimizer, CachedPage
+
+
+GRAPH = {
+    "https://site.com/start": ["https://site.com/hotel/1", "https://site.com/hotel/2", "https://site.com/login"],
+    "https://site.com/hotel/1": ["https://site.com/hotel/3", "https://site.com/start"],
+    "https://site.com/hotel/2": ["https://site.com/hotel/3"],
+    "https://site.com/hotel/3": [],
+    "https://site.com/login": [],
+}
+
+
+class GraphACO(AntColonyOptimizer):
+    """ACO sobre un grafo en memoria, sin peticiones HTTP"""
+
+    def extract_links_from_url(self, url, keywords):
+        return GRAPH.get(url, [])
+
+
+def test_urls_are_interned_and_adjacency_is_csr():
+    """Cada URL recibe un identificador único y las aristas se guardan en CSR"""
+    aco = GraphACO(num_ants=4, max_iterations=2, max_depth=3, seed=7)
+    aco.run_optimization(["https://site.com/start"], ["hotel"])
+
+    assert len(set(aco.urls)) == aco.num_nodes == len(aco.url_to_id)
+    assert aco.url_to_id["https://site.com/start"] == 0
+    assert set(aco.get_neighbors("https://site.com/start")) == set(GRAPH["https://site.com/start"])
+    assert aco.csr_indptr[-1] == aco.csr_indices.size
+
+
+def test_paths_never_revisit_nodes():
+    aco = GraphACO(num_ants=10, max_iterations=1, max_depth=5, seed=3)
+    aco.add_node("https://site.com/start", ["hotel"])
+    for ant_id in range(10):
+        path = aco.ant_exploration("https://site.com/start", ["hotel"], ant_id, np.random.default_rng(ant_id))
+        assert len(path) == len(set(path))
+
+
+def test_sampling_follows_pheromone_and_heuristic():
+    """Un candidato con mucho más peso se elige casi siempre"""
+    aco = GraphACO(seed=0)
+    ids = np.array([aco.add_node(url, ["hotel"]) for url in ("https://a.com/x", "https://a.com/y")])
+    aco.pheromone[ids] = [10.0, 0.1]
+    aco.heuristic[ids] = [1.0, 0.1]
+
+    rng = np.random.default_rng(0)
+    picks = [aco.select_next_node(ids, rng) for _ in range(200)]
+    assert picks.count(int(ids[0])) > 190
+
+
+def test_vectorized_pheromone_update():
+    """La evaporación y el depósito coinciden con la regla clásica, incluidos los límites"""
+    aco = GraphACO(rho=0.5, q=10.0, seed=0)
+    urls = ["https://a.com/1", "https://a.com/2", "https://a.com/3"]
+    for url in urls:
+        aco.add_node(url, ["hotel"])
+    aco.pheromone[:3] = [1.0, 0.15, 4.0]
+
+    aco.update_pheromones([[urls[0], urls[2]], [urls[2]]], [0.1, 0.5])
+
+    expected = np.array([0.5 + 1.0, max(0.075, 0.1), min(2.0 + 1.0 + 5.0, 10.0)])
+    assert np.allclose(aco.pheromone[:3], expected)
+
+
+def test_capacity_grows_and_top_urls_are_ranked():
+    aco = GraphACO(initial_capacity=2, seed=0)
+    for index in range(10):
+        node_id = aco.add_node(f"https://a.com/{index}", ["hotel"])
+        aco.pheromone[node_id] = index + 1
+
+    assert aco.pheromone.shape[0] >= 10
+    assert aco.top_urls(3) == ["https://a.com/9", "https://a.com/8", "https://a.com/7"]
+    assert aco.nodes["https://a.com/9"].pheromone == 10.0
+
+
+def test_content_score_is_cached_and_guides_the_heuristic():
+    """La página descargada se puntúa una sola vez y su puntuación eleva la heurística de sus enlaces"""
+    calls = []
+
+    def embedding_function(texts):
+        calls.extend(texts)
+        return [[1.0, 0.0] if "varadero" in text.lower() else [0.0, 1.0] for text in texts]
+
+    aco = GraphACO(seed=0, embedding_function=embedding_function)
+    relevant = CachedPage(url="https://a.com/1", content="Hotel en Varadero", keywords_found=["hotel", "varadero"])
+    other = CachedPage(url="https://a.com/2", content="Aviso legal", keywords_found=[])
+    relevant_id = aco.add_node(relevant.url, ["hotel", "varadero"])
+    other_id = aco.add_node(other.url, ["hotel", "varadero"])
+
+    assert aco.score_content(relevant_id, relevant, ["hotel", "varadero"]) == 1.0
+    assert aco.score_content(relevant_id, relevant, ["hotel", "varadero"]) == 1.0
+    assert aco.score_content(other_id, other, ["hotel", "varadero"]) == 0.0
+    assert len(calls) == 3
+    assert aco.evaluate_path_quality([relevant.url], ["hotel", "varadero"]) > \
+        aco.evaluate_path_quality([other.url], ["hotel", "varadero"])
+
+
+class SlowGraphACO(AntColonyOptimizer):
+    """Grafo sintético amplio en el que una de las páginas responde muy lento"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetched = []
+        self.slow_url = "https://site.com/hotel/2"
+
+    def fetch_page(self, url, keywords):
+        self.fetched.append(url)
+        if url == self.slow_url:
+            time.sleep(3.0)
+        index = int(url.rsplit("/", 1)[-1])
+        links = [f"https://site.com/hotel/{index * 3 + offset}" for offset in range(1, 4)]
+        return CachedPage(url=url, content="hotel " * 30, links=links, keywords_found=["hotel"])
+
+
+def test_async_colony_is_not_blocked_by_slow_ants():
+    """Las hormigas rápidas siguen depositando feromona mientras otra espera una página lenta"""
+    aco = SlowGraphACO(num_ants=4, max_iterations=5, max_depth=3, seed=1)
+    start_time = time.time()
+    results = aco.run_optimization_async(["https://site.com/hotel/0"], ["hotel"],
+                                         time_budget=1.0, grace_period=0.2)
+
+    assert time.time() - start_time < 2.5
+    assert results['ants_completed'] > 4
+    assert results['best_paths']
+    assert aco.pheromone[:aco.num_nodes].max() > 1.0
+
+
+def test_async_colony_respects_fetch_budget():
+    aco = SlowGraphACO(num_ants=4, max_iterations=50, max_depth=4, seed=2)
+    aco.slow_url = None
+    results = aco.run_optimization_async(["https://site.com/hotel/0"], ["hotel"], fetch_budget=10, time_budget=5.0)
+
+    assert results['page_fetches'] <= 10 + aco.num_ants
+    assert len(aco.fetched) == results['page_fetches']
+
+
+if __name__ == "__main__":
+    test_urls_are_interned_and_adjacency_is_csr()
+    test_paths_never_revisit_nodes()
+    test_sampling_follows_pheromone_and_heuristic()
+    test_vectorized_pheromone_update()
+    test_capacity_grows_and_top_urls_are_ranked()
+    test_content_score_is_cached_and_guides_the_heuristic()
+    test_async_colony_is_not_blocked_by_slow_ants()
+    test_async_colony_respects_fetch_budget()
+    print("✅ Todas las pruebas del motor ACO pasaron")
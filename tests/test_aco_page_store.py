@@ -0,0 +1,156 @@
+"""
+Pruebas del almacén de páginas compartido por la exploración ACO y la extracción
+"""
+
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from agents.agent_crawler import CrawlerAgent
+from core.fetcher import FetchResult
+from utils.ant_colony_crawler import PageStore, CachedPage, integrate_aco_with_crawler
+from utils.pheromone_store import PheromoneGraphStore
+
+
+def _html(index: int, links) -> str:
+    anchors = ''.join(f'<a href="/hotel/{link}">Hotel {link}</a>' for link in links)
+    text = f"Hotel número {index} en Varadero con playa, piscina y restaurante para toda la familia. " * 3
+    return f"<html><head><title>Hotel {index}</title></head><body>{anchors}<article>{text}</article></body></html>"
+
+
+class CountingFetcher:
+    """Fetcher en memoria que cuenta las descargas por URL"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def fetch(self, url, timeout=None):
+        with self.lock:
+            self.calls[url] += 1
+        index = int(url.rstrip('/').rsplit('/', 1)[-1])
+        links = [(index * 2 + 1) % 12, (index * 2 + 2) % 12]
+        return FetchResult(url=url, status_code=200, text=_html(index, links), content_type='text/html')
+
+
+class FakeCrawler:
+    def __init__(self):
+        self.fetcher = CountingFetcher()
+        self.pheromone_store = PheromoneGraphStore(base_dir=tempfile.mkdtemp())
+
+    def google_search_links(self, keywords, num_results=10, improved_query=None):
+        return ["https://hotels.com/hotel/0", "https://hotels.com/hotel/1"]
+
+
+def test_concurrent_requests_load_a_page_once():
+    """Las peticiones simultáneas de la misma página comparten una única descarga"""
+    store = PageStore(max_pages=10)
+    loads = Counter()
+
+    def loader(url):
+        loads[url] += 1
+        time.sleep(0.05)
+        return CachedPage(url=url, content="texto")
+
+    threads = [threading.Thread(target=store.get_or_load, args=("https://a.com/1", loader)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads["https://a.com/1"] == 1
+    assert store.get_stats()['fetches'] == 1
+
+
+def test_store_is_bounded_and_remembers_failures():
+    store = PageStore(max_pages=2)
+    failures = Counter()
+
+    def failing_loader(url):
+        failures[url] += 1
+        return None
+
+    store.get_or_load("https://a.com/broken", failing_loader)
+    store.get_or_load("https://a.com/broken", failing_loader)
+    assert failures["https://a.com/broken"] == 1
+
+    for index in range(3):
+        store.get_or_load(f"https://a.com/{index}", lambda url: CachedPage(url=url))
+    assert store.get_stats()['pages_stored'] == 2
+    assert store.get("https://a.com/0") is None
+
+
+def test_aco_run_fetches_each_page_once():
+    """Exploración, evaluación y extracción leen del almacén: ninguna URL se descarga dos veces"""
+    crawler = FakeCrawler()
+    content = integrate_aco_with_crawler(crawler, ["varadero", "hotel"], max_urls=8, max_depth=3)
+
+    assert content
+    assert all(item['content'] and item['extraction_method'] == 'aco' for item in content)
+    assert max(crawler.fetcher.calls.values()) == 1
+
+
+class RecordingGraphStore(PheromoneGraphStore):
+    """Almacén de feromonas que anota cuándo se guarda el grafo (al terminar la colonia)"""
+
+    def __init__(self, events, **kwargs):
+        super().__init__(**kwargs)
+        self.events = events
+
+    def save_host(self, *args, **kwargs):
+        self.events.append('colony_finished')
+        return super().save_host(*args, **kwargs)
+
+
+def test_pages_are_streamed_while_the_colony_explores():
+    """Con on_content cada página se entrega en cuanto se extrae, antes de que acabe la colonia"""
+    events = []
+    crawler = FakeCrawler()
+    crawler.pheromone_store = RecordingGraphStore(events, base_dir=tempfile.mkdtemp())
+
+    content = integrate_aco_with_crawler(crawler, ["varadero", "hotel"], max_urls=8, max_depth=3,
+                                         on_content=lambda item: events.append(item['url']))
+
+    streamed = [event for event in events if event != 'colony_finished']
+    assert content and sorted(streamed) == sorted(item['url'] for item in content)
+    assert len(content) <= 8
+    assert events.index('colony_finished') > 0
+
+
+class StoringCrawler(FakeCrawler):
+    """Crawler falso que registra los documentos guardados en disco y en la colección"""
+
+    def __init__(self):
+        super().__init__()
+        self.files = []
+        self.documents = {}
+
+    def _save_chunk_to_file(self, doc_id, content, metadata, processor):
+        self.files.append((doc_id, processor))
+
+    def _add_to_collection(self, doc_id, document, metadata):
+        self.documents[doc_id] = (document, metadata)
+
+
+def test_aco_search_stores_each_extracted_page():
+    """El agente guarda en la colección cada página que entrega la exploración ACO"""
+    agent = CrawlerAgent.__new__(CrawlerAgent)
+    agent.crawler = StoringCrawler()
+
+    result = agent._run_aco_search(["varadero", "hotel"], max_urls=8, max_depth=3, time_budget=10.0)
+
+    stored_urls = sorted(metadata['url'] for _, metadata in agent.crawler.documents.values())
+    assert result['type'] == 'aco_completed'
+    assert result['content_extracted'] == len(agent.crawler.documents) > 0
+    assert stored_urls == sorted(item['url'] for item in result['extraction_details'])
+    assert all(processor == "ACO" for _, processor in agent.crawler.files)
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_load_a_page_once()
+    test_store_is_bounded_and_remembers_failures()
+    test_aco_run_fetches_each_page_once()
+    test_pages_are_streamed_while_the_colony_explores()
+    test_aco_search_stores_each_extracted_page()
+    print("✅ Todas las pruebas del almacén de páginas ACO pasaron")
@@ -0,0 +1,141 @@
+"""
+Pruebas de la caché semántica de respuestas
+"""
+
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.answer_cache import SemanticAnswerCache, answer_key
+from core.mistral_config import MistralClient, STREAM_INTERRUPTED_NOTICE
+from core.rag import RAGSystem, EnhancedRAGSystem
+
+
+class VocabularyEmbeddingFunction(EmbeddingFunction):
+    VOCABULARY = ["hotel", "playa", "museo", "varadero", "habana", "trinidad"]
+
+    def __call__(self, input):
+        return [np.array([text.lower().count(word) + 0.01 for word in self.VOCABULARY], dtype=np.float32)
+                for text in input]
+
+
+class CountingGenerator:
+    """Sustituye al cliente de Mistral y cuenta las generaciones"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, on_token=None):
+        self.prompts.append(prompt)
+        return f"respuesta {len(self.prompts)}"
+
+
+def test_exact_and_semantic_lookups():
+    cache = SemanticAnswerCache(":memory:", similarity_threshold=0.95)
+    cache.store("tourism", 0, "rag_query", "Hoteles en Varadero", "lista de hoteles", np.array([1.0, 0.0, 0.1]))
+
+    assert answer_key("¿Hoteles en  Varadero?") == "hoteles en varadero"
+    assert cache.lookup("tourism", 0, "rag_query", "¿hoteles en Varadero?") == "lista de hoteles"
+    assert cache.lookup("tourism", 0, "rag_query", "alojamiento varadero", np.array([0.99, 0.0, 0.12])) == \
+        "lista de hoteles"
+    assert cache.lookup("tourism", 0, "rag_query", "museos", np.array([0.0, 1.0, 0.0])) is None
+    assert cache.lookup("tourism", 0, "enhanced:mmr:10", "Hoteles en Varadero") is None
+    assert cache.get_stats()['semantic_hits'] == 1
+
+
+def test_version_bump_invalidates_and_entries_persist():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "answers.sqlite3")
+        cache = SemanticAnswerCache(path)
+        cache.store("tourism", 0, "rag_query", "playas", {'response': "Varadero"})
+        cache.close()
+
+        reopened = SemanticAnswerCache(path)
+        assert reopened.lookup("tourism", reopened.get_version("tourism"), "rag_query", "Playas") == \
+            {'response': "Varadero"}
+        assert reopened.bump_version("tourism") == 1
+        assert reopened.lookup("tourism", reopened.get_version("tourism"), "rag_query", "playas") is None
+        reopened.close()
+
+
+def test_rag_query_reuses_answers_until_ingestion():
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=VocabularyEmbeddingFunction()
+    )
+    collection.add(ids=["a", "b"], documents=["hotel en varadero con playa", "museo en la habana"])
+    cache = SemanticAnswerCache(":memory:")
+
+    rag = RAGSystem(collection, answer_cache=cache)
+    rag.mistral_client = CountingGenerator()
+    first = rag.rag_query("hoteles en Varadero")
+    second = rag.rag_query("¿Hoteles en Varadero?")
+    cache.bump_version(collection.name)
+    third = rag.rag_query("hoteles en varadero")
+
+    assert (first, second, third) == ("respuesta 1", "respuesta 1", "respuesta 2")
+    assert len(rag.mistral_client.prompts) == 2
+
+    enhanced = EnhancedRAGSystem(collection, enable_genetic_optimization=False, answer_cache=cache)
+    enhanced.mistral_client = CountingGenerator()
+    result = enhanced.rag_query_enhanced("museos en La Habana", top_k=1)
+    repeated = enhanced.rag_query_enhanced("Museos en la Habana", top_k=1)
+
+    assert repeated['from_cache'] and repeated['response'] == result['response']
+    assert len(enhanced.mistral_client.prompts) == 1
+
+
+class InterruptedChat:
+    """Endpoint de chat falso cuyo streaming se corta tras el primer fragmento"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def stream(self, **kwargs):
+        self.calls += 1
+        return self._events()
+
+    def _events(self):
+        yield SimpleNamespace(data=SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content="1. Hotel Varadero"))], usage=None
+        ))
+        raise ConnectionError("conexión cortada")
+
+
+def test_interrupted_stream_keeps_partial_answer_out_of_the_cache():
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=VocabularyEmbeddingFunction()
+    )
+    collection.add(ids=["a"], documents=["hotel en varadero con playa"])
+    chat = InterruptedChat()
+    client = MistralClient(model_name="flash")
+    original = client.config.client
+    client.config.client = SimpleNamespace(chat=chat)
+    received = []
+
+    rag = RAGSystem(collection, answer_cache=SemanticAnswerCache(":memory:"))
+    rag.mistral_client = client
+    rag.token_callback = received.append
+    try:
+        first = rag.rag_query("hoteles en Varadero")
+        second = rag.rag_query("hoteles en Varadero")
+    finally:
+        client.config.client = original
+
+    assert first == second == "1. Hotel Varadero" + STREAM_INTERRUPTED_NOTICE
+    assert received == ["1. Hotel Varadero", STREAM_INTERRUPTED_NOTICE, ""] * 2
+    assert chat.calls == 2
+
+
+if __name__ == "__main__":
+    test_exact_and_semantic_lookups()
+    test_version_bump_invalidates_and_entries_persist()
+    test_rag_query_reuses_answers_until_ingestion()
+    test_interrupted_stream_keeps_partial_answer_out_of_the_cache()
+    print("✅ Todas las pruebas de la caché de respuestas pasaron")
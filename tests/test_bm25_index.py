@@ -0,0 +1,123 @@
+"""
+Pruebas del índice BM25 persistente y de la recuperación híbrida
+"""
+
+import math
+import os
+import tempfile
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from core.rag import EnhancedRAGSystem
+
+
+DOCUMENTS = {
+    "d1": "Hoteles con playa en Varadero y piscina",
+    "d2": "El museo de la revolución en La Habana",
+    "d3": "Playa Ancón: la mejor playa cerca de Trinidad",
+    "d4": "Restaurantes de comida criolla en La Habana Vieja"
+}
+
+
+def _bm25(index: BM25Index, query: str, doc_id: str) -> float:
+    """Puntuación BM25 calculada a mano con las mismas fórmulas que el índice"""
+    tokens = {key: tokenize(text) for key, text in DOCUMENTS.items()}
+    average_length = sum(len(t) for t in tokens.values()) / len(tokens)
+    score = 0.0
+    for term in set(tokenize(query)):
+        df = sum(1 for t in tokens.values() if term in t)
+        tf = tokens[doc_id].count(term)
+        if df and tf:
+            idf = math.log(1 + (len(tokens) - df + 0.5) / (df + 0.5))
+            norm = 1 - index.b + index.b * len(tokens[doc_id]) / average_length
+            score += idf * tf * (index.k1 + 1) / (tf + index.k1 * norm)
+    return score
+
+
+def test_tokenize_strips_accents_and_spanish_stop_words():
+    assert tokenize("La mejor Playa de Ancón, en Trinidad") == ["mejor", "playa", "ancon", "trinidad"]
+
+
+def test_search_matches_bm25_formula():
+    index = BM25Index(":memory:")
+    index.add_documents(list(DOCUMENTS), list(DOCUMENTS.values()))
+
+    results = index.search("playa en Trinidad", top_k=10)
+
+    assert [doc_id for doc_id, _ in results] == ["d3", "d1"]
+    for doc_id, score in results:
+        assert abs(score - _bm25(index, "playa en Trinidad", doc_id)) < 1e-9
+    assert index.search("de la", top_k=10) == []
+
+
+def test_index_is_incremental_and_persistent():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bm25", "tourism.sqlite3")
+        index = BM25Index(path)
+        index.add_documents(["d1", "d2"], [DOCUMENTS["d1"], DOCUMENTS["d2"]])
+        index.add_documents(["d1"], ["Casas particulares en Viñales"])
+
+        assert index.search("varadero") == []
+        assert [doc_id for doc_id, _ in index.search("viñales")] == ["d1"]
+        index.close()
+
+        reopened = BM25Index(path)
+        assert len(reopened) == 2
+        assert sorted(doc_id for doc_id, _ in reopened.search("vinales museo")) == ["d1", "d2"]
+        assert reopened.missing_ids(["d1", "d3"]) == ["d3"]
+        reopened.close()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b", "d"]
+    assert abs(fused[0][1] - (1 / 61 + 1 / 62)) < 1e-12
+
+
+class VocabularyEmbeddingFunction(EmbeddingFunction):
+    """Bolsa de palabras sobre un vocabulario fijo: no conoce nombres propios como 'Tropicana'"""
+
+    VOCABULARY = ["hotel", "playa", "museo", "restaurante", "noche", "show"]
+
+    def __call__(self, input):
+        return [np.array([text.lower().count(word) + 0.01 for word in self.VOCABULARY], dtype=np.float32)
+                for text in input]
+
+
+def test_hybrid_retrieval_finds_lexical_only_matches():
+    """Un documento que solo coincide por un nombre propio llega al contexto gracias a BM25"""
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=VocabularyEmbeddingFunction()
+    )
+    documents = [f"shows nocturnos número {i} en hoteles" for i in range(20)] + \
+                ["Cabaret Tropicana: espectáculo al aire libre en Marianao"]
+    ids = [f"doc_{i}" for i in range(len(documents))]
+    collection.add(ids=ids, documents=documents)
+
+    index = BM25Index(":memory:")
+    assert index.sync_with_collection(collection) == len(documents)
+    assert index.sync_with_collection(collection) == 0
+
+    rag = EnhancedRAGSystem(collection, enable_genetic_optimization=False, sparse_index=index)
+    dense_docs, _ = rag.retrieve_enhanced("show en el Tropicana", top_k=3)
+    hybrid_docs, metrics = rag.retrieve_hybrid("show en el Tropicana", top_k=3)
+
+    assert not any("Tropicana" in doc for doc in dense_docs)
+    assert any(doc.startswith("Cabaret Tropicana") for doc in hybrid_docs)
+    assert metrics['hybrid_retrieval_used'] and metrics['sparse_candidates'] == 1
+
+
+if __name__ == "__main__":
+    test_tokenize_strips_accents_and_spanish_stop_words()
+    test_search_matches_bm25_formula()
+    test_index_is_incremental_and_persistent()
+    test_reciprocal_rank_fusion_rewards_agreement()
+    test_hybrid_retrieval_finds_lexical_only_matches()
+    print("✅ Todas las pruebas del índice BM25 pasaron")
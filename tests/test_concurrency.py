@@ -0,0 +1,75 @@
+"""
+Pruebas del controlador AIMD de concurrencia del crawler
+"""
+
+from core.concurrency import AIMDConcurrencyController
+
+
+class FakeClock:
+    """Reloj manual para que el throughput medido sea determinista"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.1
+        return self.now
+
+
+def test_additive_increase_on_healthy_windows():
+    """La concurrencia crece de uno en uno mientras las ventanas son sanas"""
+    controller = AIMDConcurrencyController(min_concurrency=2, max_concurrency=5, window_size=4, clock=FakeClock())
+
+    for _ in range(3 * 4):
+        controller.record(True, 0.5)
+
+    assert controller.current == 5
+    assert controller.get_metrics()['adjustments'] == 3
+
+
+def test_multiplicative_decrease_on_errors():
+    """Una ventana con muchos errores reduce la concurrencia a la mitad"""
+    controller = AIMDConcurrencyController(min_concurrency=1, max_concurrency=20,
+                                           initial_concurrency=16, window_size=4, clock=FakeClock())
+
+    for success in [False, False, True, False]:
+        controller.record(success, 0.5)
+
+    assert controller.current == 8
+    assert controller.history[-1]['action'] == 'decrease'
+
+
+def test_latency_spike_is_treated_as_congestion():
+    """Un aumento fuerte de la latencia se trata como congestión"""
+    controller = AIMDConcurrencyController(min_concurrency=2, max_concurrency=20,
+                                           initial_concurrency=10, window_size=4, clock=FakeClock())
+
+    for _ in range(4):
+        controller.record(True, 0.5)
+    assert controller.current == 11
+
+    for _ in range(4):
+        controller.record(True, 5.0)
+    assert controller.current == 5
+
+
+def test_limits_are_respected():
+    """La concurrencia nunca sale de los límites configurados"""
+    controller = AIMDConcurrencyController(min_concurrency=3, max_concurrency=4, window_size=2, clock=FakeClock())
+
+    for _ in range(10):
+        controller.record(False, 1.0)
+    assert controller.current == 3
+
+    controller = AIMDConcurrencyController(min_concurrency=3, max_concurrency=4, window_size=2, clock=FakeClock())
+    for _ in range(10):
+        controller.record(True, 1.0)
+    assert controller.current == 4
+
+
+if __name__ == "__main__":
+    test_additive_increase_on_healthy_windows()
+    test_multiplicative_decrease_on_errors()
+    test_latency_spike_is_treated_as_congestion()
+    test_limits_are_respected()
+    print("✅ Todas las pruebas de concurrencia adaptativa pasaron")
@@ -0,0 +1,90 @@
+"""
+Pruebas del empaquetado del contexto con presupuesto de tokens
+"""
+
+import os
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.context_packer import ContextPacker, count_tokens, source_label, split_sentences
+from core.rag import RAGSystem
+
+
+class VocabularyEmbeddingFunction(EmbeddingFunction):
+    VOCABULARY = ["hotel", "playa", "museo", "restaurante", "varadero"]
+
+    def __call__(self, input):
+        return [np.array([text.lower().count(word) + 0.01 for word in self.VOCABULARY], dtype=np.float32)
+                for text in input]
+
+
+class PromptRecorder:
+    """Sustituye al cliente de Mistral y guarda los prompts"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, on_token=None):
+        self.prompts.append(prompt)
+        return "respuesta"
+
+
+FILLER = "El clima de la isla es cálido durante casi todo el año y llueve en verano."
+
+
+def test_documents_are_split_into_sentences():
+    assert split_sentences("Hola. El hotel Meliá está en Varadero. ¿Tiene playa? Sí, tiene una playa privada.") == [
+        "Hola. El hotel Meliá está en Varadero.", "¿Tiene playa? Sí, tiene una playa privada."
+    ]
+    assert len(split_sentences(" ".join(["palabra"] * 200), max_words=80)) == 3
+    assert source_label({'title': "Hoteles", 'url': "https://x.com"}, 0) == "Hoteles (https://x.com)"
+    assert source_label({}, 2) == "Documento 3"
+
+
+def test_most_relevant_sentences_fill_the_budget():
+    documents = [
+        " ".join([FILLER] * 5) + " El hotel Meliá tiene acceso directo a la playa de Varadero.",
+        "El museo de Bellas Artes abre los martes. " + " ".join([FILLER] * 5),
+        "El hotel Meliá tiene acceso directo a la playa de Varadero. El restaurante del puerto sirve mariscos."
+    ]
+    packer = ContextPacker(VocabularyEmbeddingFunction(), token_budget=60)
+
+    packed = packer.pack("hotel con playa en Varadero", documents, sources=["Guía A", "Guía B", "Guía C"])
+
+    assert packed.tokens <= 60 < packed.original_tokens
+    assert packed.text.count("El hotel Meliá tiene acceso directo") == 1
+    assert packed.text.startswith("[1] Guía A\n")
+    assert packed.text.count(FILLER) <= 1
+    assert packed.duplicates >= 1
+
+
+def test_generate_sends_a_packed_prompt_with_sources():
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=VocabularyEmbeddingFunction()
+    )
+    documents = [" ".join([FILLER] * 20) + f" El hotel {i} de Varadero está frente a la playa." for i in range(6)]
+    collection.add(ids=[f"doc_{i}" for i in range(6)], documents=documents,
+                   metadatas=[{'title': f"Hotel {i}", 'url': f"https://hoteles.cu/{i}"} for i in range(6)])
+
+    packed_rag = RAGSystem(collection, use_answer_cache=False, context_token_budget=120)
+    packed_rag.mistral_client = PromptRecorder()
+    packed_rag.rag_query("hotel con playa en Varadero")
+    full_rag = RAGSystem(collection, use_answer_cache=False, context_token_budget=None)
+    full_rag.mistral_client = PromptRecorder()
+    full_rag.rag_query("hotel con playa en Varadero")
+
+    packed_prompt, full_prompt = packed_rag.mistral_client.prompts[0], full_rag.mistral_client.prompts[0]
+    assert count_tokens(packed_prompt) < count_tokens(full_prompt) / 3
+    assert "(https://hoteles.cu/" in packed_prompt and "frente a la playa" in packed_prompt
+
+
+if __name__ == "__main__":
+    test_documents_are_split_into_sentences()
+    test_most_relevant_sentences_fill_the_budget()
+    test_generate_sends_a_packed_prompt_with_sources()
+    print("✅ Todas las pruebas del empaquetado de contexto pasaron")
@@ -0,0 +1,138 @@
+"""
+Pruebas del estado compartido y el escritor único del crawl distribuido
+"""
+
+import time
+
+from core.distributed_crawler import CoordinatorState, VectorStoreWriter, host_partition
+
+
+class FakeCollection:
+    def __init__(self):
+        self.batches = []
+
+    def add(self, ids, documents, metadatas):
+        self.batches.append(list(ids))
+
+
+def test_urls_of_a_host_always_go_to_the_same_partition():
+    """Todas las URLs de un host (con o sin www) comparten partición"""
+    partition = host_partition("https://www.cubatravel.com/destinos/varadero", 4)
+    assert host_partition("https://cubatravel.com/hoteles?page=2", 4) == partition
+    assert host_partition("https://CUBATRAVEL.com:443/", 4) == partition
+
+    state = CoordinatorState(num_partitions=4, keywords=["varadero"])
+    state.add_urls([("https://cubatravel.com/a", 0), ("https://cubatravel.com/b", 1)])
+    assert state.get_stats()['pending'][partition] == 2
+
+
+def test_visited_set_is_shared_and_budget_is_global():
+    """Una URL solo se entrega una vez y el presupuesto de páginas es global"""
+    state = CoordinatorState(num_partitions=1, keywords=["hotel"], max_pages=2)
+    assert state.add_urls([("https://a.com/1", 0), ("https://a.com/1", 0), ("https://a.com/2", 0)]) == 2
+    worker = state.register_worker()
+    assert state.acquire_partitions(worker) == [0]
+
+    first = state.next_url(worker)
+    assert first == ("https://a.com/1", 0)
+    state.task_done(worker, "https://a.com/1", [("https://a.com/1", 1), ("https://a.com/3", 1)])
+    assert state.get_stats()['pending'] == [2]
+
+    assert state.next_url(worker) == ("https://a.com/2", 0)
+    assert state.next_url(worker) is None
+    assert state.is_finished()
+
+
+def test_crawl_finishes_when_frontier_and_in_flight_are_empty():
+    """El crawl no termina mientras queden URLs en curso"""
+    state = CoordinatorState(num_partitions=2, keywords=["hotel"])
+    state.add_urls([("https://a.com/1", 0)])
+    worker = state.register_worker()
+    state.acquire_partitions(worker, max_partitions=2)
+
+    assert state.next_url(worker) is not None
+    assert not state.is_finished()
+    state.task_done(worker, "https://a.com/1")
+    assert state.is_finished()
+
+
+def test_partitions_are_leased_to_a_single_worker():
+    """Una partición solo la consume el worker que tiene su lease"""
+    state = CoordinatorState(num_partitions=2, keywords=[])
+    state.add_urls([("https://a.com/1", 0)])
+    partition = host_partition("https://a.com/1", 2)
+    first, second = state.register_worker(), state.register_worker()
+
+    assert state.acquire_partitions(first) == [partition]
+    assert state.acquire_partitions(second) == [1 - partition]
+    assert state.acquire_partitions(second) == []
+    assert state.next_url(second) is None
+    assert state.next_url(first) == ("https://a.com/1", 0)
+
+
+def test_expired_lease_requeues_in_flight_urls_for_idle_workers():
+    """Si un worker deja de latir, otro toma su partición y vuelve a descargar lo que tenía en curso"""
+    state = CoordinatorState(num_partitions=2, keywords=[], lease_timeout=0.2)
+    state.add_urls([("https://a.com/1", 0), ("https://a.com/2", 0)])
+    dead, alive = state.register_worker(), state.register_worker()
+    state.acquire_partitions(dead)
+    state.acquire_partitions(alive)
+    assert state.next_url(dead) == ("https://a.com/1", 0)
+
+    time.sleep(0.3)
+    state.heartbeat(alive)
+    assert not state.is_finished()
+    assert state.get_stats()['urls_requeued'] == 1
+
+    assert state.acquire_partitions(alive, pending_only=True) == [host_partition("https://a.com/1", 2)]
+    assert [state.next_url(alive), state.next_url(alive)] == [("https://a.com/1", 0), ("https://a.com/2", 0)]
+    state.task_done(dead, "https://a.com/1")
+    assert not state.is_finished()
+    state.task_done(alive, "https://a.com/1")
+    state.task_done(alive, "https://a.com/2")
+    assert state.is_finished() and state.get_stats()['pages_reserved'] == 2
+
+
+def test_orphaned_partitions_are_taken_by_idle_workers():
+    """Las particiones reservadas a workers remotos que nunca se conectan no bloquean el crawl"""
+    state = CoordinatorState(num_partitions=3, keywords=[])
+    urls = [f"https://host{index}.com/" for index in range(12)]
+    state.add_urls([(url, 0) for url in urls])
+    worker = state.register_worker()
+
+    crawled = []
+    state.acquire_partitions(worker)
+    while not state.is_finished():
+        url_data = state.next_url(worker)
+        if url_data is None:
+            assert state.acquire_partitions(worker, pending_only=True)
+            continue
+        crawled.append(url_data[0])
+        state.task_done(worker, url_data[0])
+
+    assert sorted(crawled) == sorted(urls)
+
+
+def test_writer_batches_documents_from_all_workers():
+    """El escritor único agrupa en lotes los documentos enviados por los workers"""
+    state = CoordinatorState(num_partitions=2, keywords=[])
+    collection = FakeCollection()
+    writer = VectorStoreWriter(state, collection, batch_size=4)
+
+    for index in range(10):
+        state.submit_document(f"doc_{index}", f"texto {index}", {"url": f"https://a.com/{index}"})
+
+    writer.flush()
+    assert [len(batch) for batch in collection.batches] == [4, 4, 2]
+    assert writer.documents_written == 10
+
+
+if __name__ == "__main__":
+    test_urls_of_a_host_always_go_to_the_same_partition()
+    test_visited_set_is_shared_and_budget_is_global()
+    test_crawl_finishes_when_frontier_and_in_flight_are_empty()
+    test_partitions_are_leased_to_a_single_worker()
+    test_expired_lease_requeues_in_flight_urls_for_idle_workers()
+    test_orphaned_partitions_are_taken_by_idle_workers()
+    test_writer_batches_documents_from_all_workers()
+    print("✅ Todas las pruebas del crawl distribuido pasaron")
@@ -0,0 +1,83 @@
+"""
+Pruebas de la caché LRU de embeddings de consultas
+"""
+
+import os
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.embedding_cache import QueryEmbeddingCache, get_query_embedding_cache, normalize_query
+from core.rag import RAGSystem, EnhancedRAGSystem
+
+
+class CountingEmbeddingFunction(EmbeddingFunction):
+    """Embedding trivial (longitud y vocales) que cuenta los textos codificados"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, input):
+        self.encoded.extend(input)
+        return [np.array([len(text), sum(text.count(v) for v in "aeiou") + 1.0], dtype=np.float32)
+                for text in input]
+
+
+def test_queries_are_normalized_and_encoded_once():
+    embedding_function = CountingEmbeddingFunction()
+    cache = QueryEmbeddingCache(embedding_function)
+
+    first = cache.embed("Hoteles en  Varadero ")
+    second = cache.embed("hoteles en varadero")
+    vectors = cache.embed_many(["museos en Trinidad", "hoteles en varadero", "museos en trinidad"])
+
+    assert normalize_query("  Hoteles\ten  Varadero ") == "hoteles en varadero"
+    assert embedding_function.encoded == ["hoteles en varadero", "museos en trinidad"]
+    assert first is second and vectors[1] is first and vectors[0] is vectors[2]
+    assert cache.get_stats() == {'entries': 2, 'hits': 2, 'misses': 3, 'hit_rate': 0.4}
+
+
+def test_least_recently_used_query_is_evicted():
+    embedding_function = CountingEmbeddingFunction()
+    cache = QueryEmbeddingCache(embedding_function, max_entries=2)
+
+    cache.embed("a")
+    cache.embed("b")
+    cache.embed("a")
+    cache.embed("c")
+    cache.embed("a")
+    cache.embed("b")
+
+    assert embedding_function.encoded == ["a", "b", "c", "b"]
+    assert list(cache.entries) == ["a", "b"]
+
+
+def test_retrieval_paths_share_the_cache():
+    """La recuperación básica y la mejorada (y un RAG recreado tras un crawl) no recodifican la consulta"""
+    embedding_function = CountingEmbeddingFunction()
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=embedding_function
+    )
+    collection.add(ids=[f"doc_{i}" for i in range(10)], documents=[f"documento {i} sobre playas" for i in range(10)])
+    embedding_function.encoded.clear()
+
+    basic = RAGSystem(collection)
+    basic.retrieve("playas de Cuba", top_k=3)
+    enhanced = EnhancedRAGSystem(collection, enable_genetic_optimization=False)
+    enhanced.retrieve_enhanced("Playas de  Cuba", top_k=3)
+    RAGSystem(collection).retrieve("playas de cuba", top_k=3)
+
+    assert embedding_function.encoded == ["playas de cuba"]
+    assert get_query_embedding_cache(embedding_function) is basic.query_cache
+    assert enhanced.get_system_stats()['query_embedding_cache']['hits'] == 2
+
+
+if __name__ == "__main__":
+    test_queries_are_normalized_and_encoded_once()
+    test_least_recently_used_query_is_evicted()
+    test_retrieval_paths_share_the_cache()
+    print("✅ Todas las pruebas de la caché de consultas pasaron")
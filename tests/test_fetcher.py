@@ -0,0 +1,93 @@
+"""
+Pruebas de la descarga en streaming con detección del tipo de contenido
+"""
+
+from core.fetcher import PageFetcher
+
+
+class FakeResponse:
+    """Respuesta en streaming falsa que registra cuántos fragmentos se leyeron"""
+
+    def __init__(self, body: bytes, content_type: str = "text/html", status_code: int = 200,
+                 content_length: bool = True, chunk_size: int = 4):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {'Content-Type': content_type}
+        if content_length:
+            self.headers['Content-Length'] = str(len(body))
+        self.chunk_size = chunk_size
+        self.chunks_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.chunks_read += 1
+            yield self.body[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, timeout=None, stream=False):
+        return self.response
+
+
+def _fetch(response, url="https://hoteles.cu/varadero", **kwargs):
+    fetcher = PageFetcher(**kwargs)
+    fetcher.session = FakeSession(response)
+    return fetcher, fetcher.fetch(url)
+
+
+HTML = b"<!DOCTYPE html><html><head><title>Varadero</title></head><body>" + b"playa " * 200 + b"</body></html>"
+
+
+def test_non_html_content_type_is_skipped_without_reading_the_body():
+    response = FakeResponse(b"%PDF-1.7 " * 1000, content_type="application/pdf")
+    fetcher, result = _fetch(response)
+
+    assert result.skipped_reason == 'non_html' and not result.ok
+    assert response.chunks_read == 0 and response.closed
+    assert fetcher.get_stats()['non_html_skipped'] == 1
+    assert fetcher.get_stats()['bytes_saved'] == len(response.body)
+
+
+def test_ambiguous_content_type_is_sniffed():
+    _, html = _fetch(FakeResponse(HTML, content_type="application/octet-stream", chunk_size=64))
+    binary = FakeResponse(b"\x89PNG\r\n\x1a\n" + b"\x00" * 500, content_type="", chunk_size=64)
+    _, image = _fetch(binary)
+    plain = FakeResponse(b"solo texto sin etiquetas " * 20, content_type="text/plain", chunk_size=64)
+    _, text = _fetch(plain)
+
+    assert html.ok and "Varadero" in html.text
+    assert image.skipped_reason == 'non_html' and binary.chunks_read == 1
+    assert text.skipped_reason == 'non_html'
+
+
+def test_body_is_truncated_at_the_host_byte_limit():
+    response = FakeResponse(HTML, chunk_size=64)
+    fetcher, result = _fetch(response, url="https://www.hoteles.cu/varadero", host_byte_limits={'hoteles.cu': 300})
+
+    assert result.ok and result.truncated
+    assert result.bytes_read == 300 and len(result.text) == 300
+    assert response.chunks_read == 5
+    assert fetcher.get_byte_limit("https://otro.com/") == fetcher.max_bytes
+    assert fetcher.get_stats()['bytes_saved'] == len(HTML) - 300
+
+
+def test_charset_is_taken_from_the_meta_tag():
+    body = '<html><head><meta charset="latin-1"></head><body>Viñales</body></html>'.encode('latin-1')
+    _, result = _fetch(FakeResponse(body, content_type="text/html", chunk_size=1024))
+
+    assert "Viñales" in result.text
+
+
+if __name__ == "__main__":
+    test_non_html_content_type_is_skipped_without_reading_the_body()
+    test_ambiguous_content_type_is_sniffed()
+    test_body_is_truncated_at_the_host_byte_limit()
+    test_charset_is_taken_from_the_meta_tag()
+    print("✅ Todas las pruebas de la descarga en streaming pasaron")
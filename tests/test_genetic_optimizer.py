@@ -0,0 +1,92 @@
+"""
+Pruebas de la evaluación vectorizada del optimizador genético de documentos
+"""
+
+import random
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from core.rag import GeneticDocumentOptimizer
+from core.similarity import QuerySimilarities, select_mmr
+
+
+def _corpus(seed: int = 0, count: int = 30, dim: int = 32):
+    rng = np.random.default_rng(seed)
+    documents = ["texto " * int(n) for n in rng.integers(20, 80, size=count)]
+    return documents, rng.normal(size=dim), rng.normal(size=(count, dim))
+
+
+def _reference_fitness(individual, documents, query_embedding, doc_embeddings):
+    """Fitness calculada par a par, como la implementación original con sklearn"""
+    selected = [doc_embeddings[i] for i in individual]
+    avg_cosine = np.mean([cosine_similarity([query_embedding], [e])[0][0] for e in selected])
+    pairs = [cosine_similarity([selected[i]], [selected[j]])[0][0]
+             for i in range(len(selected)) for j in range(i + 1, len(selected))]
+    diversity = 1.0 - np.mean(pairs) if pairs else 0.0
+    total_length = sum(len(documents[i]) for i in individual)
+    length_score = max(0.0, 1.0 - abs(total_length - 2000) / 2000)
+    return max(0.0, 0.7 * avg_cosine + 0.2 * diversity + 0.1 * length_score)
+
+
+def test_population_fitness_matches_pairwise_loop():
+    documents, query, embeddings = _corpus()
+    optimizer = GeneticDocumentOptimizer()
+    rng = random.Random(0)
+    population = [sorted(rng.sample(range(30), rng.randint(1, 10))) for _ in range(20)]
+
+    lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+    scores = optimizer.population_fitness(population, lengths, QuerySimilarities(query, embeddings))
+
+    for individual, score in zip(population, scores):
+        assert abs(score - _reference_fitness(individual, documents, query, embeddings)) < 1e-5
+    assert abs(optimizer.fitness_function(population[0], documents, query, list(embeddings)) - scores[0]) < 1e-5
+
+
+def test_repeated_individuals_are_scored_once():
+    """Los individuos repetidos (en cualquier orden) reutilizan la fitness memorizada"""
+    documents, query, embeddings = _corpus()
+    optimizer = GeneticDocumentOptimizer()
+    similarities = QuerySimilarities(query, embeddings)
+    lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+    cache = {}
+
+    first = optimizer._score_population([[1, 2, 3], [3, 2, 1], [4, 5]], lengths, similarities, cache)
+    optimizer._score_population([[2, 1, 3], [5, 4]], lengths, similarities, cache)
+
+    assert len(cache) == 2
+    assert first[0] == first[1]
+
+
+def test_evolution_stops_when_fitness_plateaus():
+    documents, query, embeddings = _corpus(seed=1)
+    optimizer = GeneticDocumentOptimizer(population_size=10, generations=200, patience=3)
+
+    random.seed(0)
+    selected, metrics = optimizer.optimize(documents, query, list(embeddings), target_size=5)
+
+    assert metrics['generations_run'] < 200
+    assert metrics['fitness_evaluations'] < 10 * metrics['generations_run']
+    assert metrics['best_fitness'] >= metrics['initial_fitness']
+    assert len(set(selected)) == len(selected)
+
+
+def test_mmr_optimizes_the_same_objective_as_the_ga():
+    """La selección voraz devuelve el valor de la fitness del algoritmo genético para su selección"""
+    documents, query, embeddings = _corpus(seed=2)
+    optimizer = GeneticDocumentOptimizer()
+    similarities = QuerySimilarities(query, embeddings)
+    lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+
+    selected, objective = select_mmr(similarities, lengths, target_size=8)
+
+    assert 1 <= len(selected) <= 8
+    assert abs(objective - optimizer.population_fitness([selected], lengths, similarities)[0]) < 1e-5
+
+
+if __name__ == "__main__":
+    test_population_fitness_matches_pairwise_loop()
+    test_repeated_individuals_are_scored_once()
+    test_evolution_stops_when_fitness_plateaus()
+    test_mmr_optimizes_the_same_objective_as_the_ga()
+    print("✅ Todas las pruebas del optimizador genético pasaron")
@@ -0,0 +1,132 @@
+"""
+Pruebas del circuit breaker por host y de los timeouts adaptativos
+"""
+
+import time
+
+from core.fetcher import PageFetcher
+from core.host_health import HostHealthTracker, HostState
+
+
+def test_circuit_opens_after_consecutive_failures():
+    """El circuito se abre tras alcanzar el umbral de fallos consecutivos"""
+    tracker = HostHealthTracker(failure_threshold=3, base_cooldown=60.0)
+    url = "https://www.blocked-site.com/hotels"
+
+    for _ in range(2):
+        tracker.record_failure(url, "HTTP 403")
+    assert not tracker.is_circuit_open(url)
+
+    tracker.record_failure(url, "HTTP 403")
+    assert tracker.is_circuit_open(url)
+    assert not tracker.allow_request(url)
+    assert "blocked-site.com" in tracker.get_open_circuits()
+
+
+def test_half_open_probe_and_exponential_cooldown():
+    """Tras el enfriamiento se permite una única petición de prueba y el enfriamiento se duplica"""
+    tracker = HostHealthTracker(failure_threshold=1, base_cooldown=0.05, max_cooldown=1.0)
+    url = "https://slow-site.com/"
+
+    tracker.record_failure(url, "ConnectionError")
+    first_open_until = tracker.hosts["slow-site.com"].open_until
+    time.sleep(0.06)
+
+    assert tracker.allow_request(url)
+    assert not tracker.allow_request(url)
+
+    tracker.record_failure(url, "ConnectionError")
+    state = tracker.hosts["slow-site.com"]
+    assert state.times_opened == 2
+    assert state.open_until - time.time() > 0.05
+    assert state.open_until > first_open_until
+
+
+def test_success_closes_circuit():
+    """Una petición de prueba correcta cierra el circuito"""
+    tracker = HostHealthTracker(failure_threshold=1, base_cooldown=0.01)
+    url = "https://recovering-site.com/"
+
+    tracker.record_failure(url, "HTTP 503")
+    time.sleep(0.02)
+    assert tracker.allow_request(url)
+    tracker.record_success(url, 0.2)
+
+    assert not tracker.is_circuit_open(url)
+    assert tracker.allow_request(url)
+
+
+def test_adaptive_timeout_uses_latency_percentile():
+    """El timeout se ajusta al percentil de latencia del host dentro de los límites"""
+    tracker = HostHealthTracker(default_timeout=15.0, min_timeout=3.0, max_timeout=30.0,
+                                timeout_multiplier=2.0, min_latency_samples=5)
+    fast_url = "https://fast-site.com/"
+    slow_url = "https://slow-site.com/"
+
+    assert tracker.get_timeout(fast_url) == 15.0
+
+    for _ in range(10):
+        tracker.record_success(fast_url, 0.5)
+        tracker.record_success(slow_url, 12.0)
+
+    assert tracker.get_timeout(fast_url) == 3.0
+    assert tracker.get_timeout(slow_url) == 24.0
+
+
+def test_timeouts_do_not_raise_the_next_timeout():
+    """Los fallos no entran en la ventana de latencias: los timeouts no se realimentan"""
+    tracker = HostHealthTracker(failure_threshold=100, min_timeout=3.0, max_timeout=30.0, min_latency_samples=5)
+    url = "https://flaky-site.com/"
+
+    for _ in range(5):
+        tracker.record_success(url, 2.0)
+    for _ in range(20):
+        tracker.record_failure(url, "ReadTimeout")
+
+    assert tracker.get_timeout(url) == 4.0
+
+
+class ExplodingSession:
+    """Sesión HTTP que falla con una excepción ajena a requests"""
+
+    def get(self, url, timeout=None, stream=False):
+        raise ValueError("URL mal formada")
+
+
+def test_unexpected_fetch_error_releases_half_open_probe():
+    """Cualquier excepción de la petición de prueba la libera y vuelve a abrir el circuito"""
+    tracker = HostHealthTracker(failure_threshold=1, base_cooldown=0.01)
+    fetcher = PageFetcher(health=tracker)
+    fetcher.session = ExplodingSession()
+    url = "https://probe-site.com/"
+
+    tracker.record_failure(url, "HTTP 503")
+    time.sleep(0.02)
+    try:
+        fetcher.fetch(url)
+        assert False, "la excepción debe propagarse"
+    except ValueError:
+        pass
+
+    state = tracker.hosts["probe-site.com"]
+    assert not state.probe_in_flight
+    assert state.state == HostState.OPEN
+
+
+def test_captcha_detection():
+    """Las páginas de CAPTCHA se detectan por el título o en páginas cortas"""
+    assert HostHealthTracker.looks_blocked("<html><title>Attention Required! | CAPTCHA</title></html>")
+    assert HostHealthTracker.looks_blocked("<html><body>Are you a robot?</body></html>")
+    long_page = "<html><title>Hoteles en Varadero</title>" + "texto " * 5000 + "recaptcha</html>"
+    assert not HostHealthTracker.looks_blocked(long_page)
+
+
+if __name__ == "__main__":
+    test_circuit_opens_after_consecutive_failures()
+    test_half_open_probe_and_exponential_cooldown()
+    test_success_closes_circuit()
+    test_adaptive_timeout_uses_latency_percentile()
+    test_timeouts_do_not_raise_the_next_timeout()
+    test_unexpected_fetch_error_releases_half_open_probe()
+    test_captcha_detection()
+    print("✅ Todas las pruebas de salud de hosts pasaron")
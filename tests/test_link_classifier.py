@@ -0,0 +1,101 @@
+"""
+Pruebas del clasificador de enlaces con aprendizaje en línea
+"""
+
+import os
+import tempfile
+
+from core.link_classifier import LinkClassifier
+
+
+GOOD_LINKS = [
+    ("https://www.cubatravel.com/destinos/varadero", "Guía de Varadero"),
+    ("https://www.cubatravel.com/destinos/trinidad", "Qué ver en Trinidad"),
+    ("https://www.cubatravel.com/destinos/vinales", "Valle de Viñales"),
+    ("https://www.cubatravel.com/hoteles/melia-varadero", "Hotel Meliá Varadero"),
+]
+
+BAD_LINKS = [
+    ("https://www.cubatravel.com/calendario?fecha=2024-05-01", "Ver disponibilidad"),
+    ("https://www.cubatravel.com/calendario?fecha=2024-05-02", "Siguiente día"),
+    ("https://www.cubatravel.com/usuario/preferencias", "Preferencias"),
+    ("https://www.cubatravel.com/calendario?fecha=2024-06-11", "Mes siguiente"),
+]
+
+
+def _train(classifier: LinkClassifier, epochs: int = 10):
+    for _ in range(epochs):
+        for url, text in GOOD_LINKS:
+            classifier.update(url, text, True)
+        for url, text in BAD_LINKS:
+            classifier.update(url, text, False)
+
+
+def test_untrained_classifier_keeps_original_order():
+    """Sin ejemplos suficientes el orden de los enlaces no se altera"""
+    classifier = LinkClassifier(model_path=os.path.join(tempfile.mkdtemp(), "model.npz"))
+    links = [(url, text) for url, text in BAD_LINKS + GOOD_LINKS]
+    assert classifier.score(GOOD_LINKS[0][0]) == 0.5
+    assert classifier.rank(links) == [url for url, _ in links]
+
+
+def test_classifier_learns_to_prioritize_productive_links():
+    """Tras entrenar, los enlaces similares a páginas guardadas se puntúan por encima"""
+    classifier = LinkClassifier(min_updates=10, model_path=os.path.join(tempfile.mkdtemp(), "model.npz"))
+    _train(classifier)
+
+    good_score = classifier.score("https://www.cubatravel.com/destinos/cienfuegos", "Guía de Cienfuegos")
+    bad_score = classifier.score("https://www.cubatravel.com/calendario?fecha=2024-07-20", "Siguiente mes")
+    assert good_score > 0.5 > bad_score
+
+    ranked = classifier.rank([
+        ("https://www.cubatravel.com/calendario?fecha=2024-07-20", "Siguiente mes"),
+        ("https://www.cubatravel.com/destinos/cienfuegos", "Guía de Cienfuegos"),
+    ])
+    assert ranked[0].endswith("/destinos/cienfuegos")
+
+
+def test_model_is_persisted_across_sessions():
+    """El modelo guardado se recupera en una nueva instancia"""
+    model_path = os.path.join(tempfile.mkdtemp(), "state", "model.npz")
+    classifier = LinkClassifier(min_updates=10, model_path=model_path)
+    _train(classifier, epochs=3)
+    classifier.save()
+
+    restored = LinkClassifier(min_updates=10, model_path=model_path)
+    url, text = GOOD_LINKS[0]
+    assert restored.updates == classifier.updates
+    assert restored.is_trained
+    assert abs(restored.score(url, text) - classifier.score(url, text)) < 1e-6
+
+
+def test_worker_updates_are_merged_without_losing_training():
+    """Las actualizaciones de varios workers se fusionan: ninguna sobrescribe a las demás"""
+    directory = tempfile.mkdtemp()
+    coordinator = LinkClassifier(min_updates=10, model_path=os.path.join(directory, "model.npz"))
+    good_worker = LinkClassifier(min_updates=10, model_path=os.path.join(directory, "model.npz"))
+    bad_worker = LinkClassifier(min_updates=10, model_path=os.path.join(directory, "model.npz"))
+    good_base, bad_base = good_worker.get_state(), bad_worker.get_state()
+
+    for _ in range(10):
+        for url, text in GOOD_LINKS:
+            good_worker.update(url, text, True)
+        for url, text in BAD_LINKS:
+            bad_worker.update(url, text, False)
+
+    update = good_worker.delta_since(good_base)
+    assert 0 < update['indices'].size < coordinator.n_features
+    assert coordinator.merge_updates([update, bad_worker.delta_since(bad_base)]) == 80
+    assert coordinator.updates == 80 and coordinator.positives == 40
+
+    good_url, good_text = GOOD_LINKS[0]
+    bad_url, bad_text = BAD_LINKS[0]
+    assert coordinator.score(good_url, good_text) > 0.5 > coordinator.score(bad_url, bad_text)
+
+
+if __name__ == "__main__":
+    test_untrained_classifier_keeps_original_order()
+    test_classifier_learns_to_prioritize_productive_links()
+    test_model_is_persisted_across_sessions()
+    test_worker_updates_are_merged_without_losing_training()
+    print("✅ Todas las pruebas del clasificador de enlaces pasaron")
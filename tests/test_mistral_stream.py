@@ -0,0 +1,107 @@
+"""
+Pruebas de la generación en streaming de MistralClient
+"""
+
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.mistral_config import MistralClient, STREAM_INTERRUPTED_NOTICE
+
+
+def _event(content, total_tokens=None):
+    usage = SimpleNamespace(total_tokens=total_tokens) if total_tokens else None
+    return SimpleNamespace(data=SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=usage
+    ))
+
+
+class FakeChat:
+    """Endpoint de chat falso: falla las primeras llamadas y luego devuelve los fragmentos"""
+
+    def __init__(self, chunks, failures=0, fail_after=None):
+        self.chunks = chunks
+        self.failures = failures
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def stream(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("sin conexión")
+        return self._events()
+
+    def _events(self):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise ConnectionError("conexión cortada")
+            yield _event(chunk, total_tokens=12 if index == len(self.chunks) - 1 else None)
+
+
+def _client(chat):
+    client = MistralClient(model_name="flash")
+    original = client.config.client
+    client.config.client = SimpleNamespace(chat=chat)
+    return client, original
+
+
+def test_stream_yields_chunks_and_retries_before_first_token():
+    chat = FakeChat(["Hola", None, ", Varadero"], failures=1)
+    client, original = _client(chat)
+    try:
+        tokens_before = client.config.stats['total_tokens']
+        chunks = list(client.generate_stream("Hola"))
+    finally:
+        client.config.client = original
+
+    assert chunks == ["Hola", ", Varadero"]
+    assert chat.calls == 2
+    assert client.config.stats['total_tokens'] - tokens_before == 12
+
+
+def test_generate_forwards_tokens_to_callback():
+    received = []
+    client, original = _client(FakeChat([" Playa", " Ancón "]))
+    try:
+        answer = client.generate("Playas", on_token=received.append)
+    finally:
+        client.config.client = original
+
+    assert answer == "Playa Ancón"
+    assert received == [" Playa", " Ancón ", ""]
+
+
+def test_failure_after_first_token_is_not_retried():
+    received = []
+    chat = FakeChat(["Uno", "Dos"], fail_after=1)
+    client, original = _client(chat)
+    try:
+        answer = client.generate("Contar", max_retries=3, on_token=received.append)
+    finally:
+        client.config.client = original
+
+    assert answer == "Uno" + STREAM_INTERRUPTED_NOTICE
+    assert chat.calls == 1
+    assert received == ["Uno", STREAM_INTERRUPTED_NOTICE, ""]
+
+
+def test_failure_before_first_token_returns_none():
+    received = []
+    chat = FakeChat(["Uno"], failures=3)
+    client, original = _client(chat)
+    try:
+        answer = client.generate("Contar", max_retries=3, on_token=received.append)
+    finally:
+        client.config.client = original
+
+    assert answer is None
+    assert received == [""]
+
+
+if __name__ == "__main__":
+    test_stream_yields_chunks_and_retries_before_first_token()
+    test_generate_forwards_tokens_to_callback()
+    test_failure_after_first_token_is_not_retried()
+    test_failure_before_first_token_returns_none()
+    print("✅ Todas las pruebas de streaming pasaron")
@@ -0,0 +1,60 @@
+"""
+Pruebas de la persistencia del grafo de feromonas entre sesiones
+"""
+
+import tempfile
+import time
+
+import numpy as np
+
+from tests.test_aco_page_store import FakeCrawler
+from utils.ant_colony_crawler import integrate_aco_with_crawler
+from utils.pheromone_store import PheromoneGraphStore, topic_key
+
+
+def test_topic_key_ignores_order_case_and_accents():
+    assert topic_key(["Habana", "Hoteles"]) == topic_key(["hoteles", "habana"]) == "habana-hoteles"
+    assert topic_key(["Viñales", "Pinar del Río"]) == "del-pinar-rio-vinales"
+    assert len(topic_key(["palabra%d" % i for i in range(30)])) <= 60
+
+
+def test_pheromone_decays_towards_neutral_value():
+    """Tras una vida media, el exceso de feromona sobre el valor neutro se reduce a la mitad"""
+    store = PheromoneGraphStore(base_dir=tempfile.mkdtemp(), half_life_days=10.0, max_age_days=30.0)
+    urls = ["https://hotels.com/a", "https://hotels.com/b"]
+    saved_at = time.time()
+    store.save_host("hotels.com", "hotel", urls, np.array([5.0, 0.2]), np.array([0.9, 0.4]),
+                    np.array([0, 1]), {0: np.array([1])}, now=saved_at)
+
+    graph = store.load("hotels.com", "hotel", now=saved_at + 10 * 86400)
+    assert np.allclose(graph.pheromone, [3.0, 0.6])
+    assert graph.urls == urls
+    assert graph.neighbors(0).tolist() == [1]
+
+    assert store.load("hotels.com", "hotel", now=saved_at + 31 * 86400) is None
+    assert store.load("hotels.com", "otro-tema") is None
+
+
+def test_warm_start_reuses_graph_and_saves_fetches():
+    """Una segunda búsqueda del mismo tema parte del grafo guardado y descarga menos páginas"""
+    base_dir = tempfile.mkdtemp()
+
+    first = FakeCrawler()
+    first.pheromone_store = PheromoneGraphStore(base_dir=base_dir)
+    integrate_aco_with_crawler(first, ["varadero", "hotel"], max_urls=8, max_depth=3)
+    first_fetches = sum(first.fetcher.calls.values())
+
+    second = FakeCrawler()
+    second.pheromone_store = PheromoneGraphStore(base_dir=base_dir)
+    content = integrate_aco_with_crawler(second, ["Hotel", "Varadero"], max_urls=8, max_depth=3)
+    second_fetches = sum(second.fetcher.calls.values())
+
+    assert content
+    assert second_fetches < first_fetches
+
+
+if __name__ == "__main__":
+    test_topic_key_ignores_order_case_and_accents()
+    test_pheromone_decays_towards_neutral_value()
+    test_warm_start_reuses_graph_and_saves_fetches()
+    print("✅ Todas las pruebas del grafo de feromonas persistente pasaron")
@@ -0,0 +1,84 @@
+"""
+Pruebas de la recuperación filtrada por destino
+"""
+
+import os
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.places import destination_filter, normalize_place, place_metadata, split_places
+from core.rag import RAGSystem, EnhancedRAGSystem
+
+
+class VocabularyEmbeddingFunction(EmbeddingFunction):
+    VOCABULARY = ["hotel", "playa", "museo", "restaurante"]
+
+    def __call__(self, input):
+        return [np.array([text.lower().count(word) + 0.01 for word in self.VOCABULARY], dtype=np.float32)
+                for text in input]
+
+
+def test_place_names_are_normalized():
+    assert normalize_place("La Habana") == "habana"
+    assert normalize_place("Havana") == "habana"
+    assert normalize_place("  Viñales ") == "vinales"
+    assert normalize_place("Ciudad de México") == "ciudad_de_mexico"
+    assert split_places("Varadero, Cuba") == ["Varadero", "Cuba"]
+    assert split_places("Roma y Florencia") == ["Roma", "Florencia"]
+
+
+def test_metadata_and_filters_share_place_keys():
+    metadata = {'pais': 'Cuba', 'ciudad': 'La Habana', 'cities': 'Havana, Trinidad', 'title': 'x'}
+
+    assert place_metadata(metadata) == {'place_cuba': True, 'place_habana': True, 'place_trinidad': True}
+    assert destination_filter(["Habana"]) == {'place_habana': True}
+    assert destination_filter(["Varadero", "Cuba"]) == {'$or': [{'place_varadero': True}, {'place_cuba': True}]}
+    assert destination_filter([]) is None
+
+
+def _collection():
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=VocabularyEmbeddingFunction()
+    )
+    documents, metadatas = [], []
+    for i in range(12):
+        city = ["Varadero", "Trinidad", "Roma"][i % 3]
+        documents.append(f"hotel {i} con playa en {city}")
+        metadata = {'ciudad': city, 'pais': 'Italia' if city == "Roma" else 'Cuba'}
+        metadatas.append({**metadata, **place_metadata(metadata)})
+    collection.add(ids=[f"doc_{i}" for i in range(12)], documents=documents, metadatas=metadatas)
+    return collection
+
+
+def test_retrieval_is_scoped_to_the_destination():
+    rag = RAGSystem(_collection(), use_answer_cache=False)
+
+    scoped = rag.retrieve("hotel con playa", top_k=10, destinations=["Trinidad"])
+    country = rag.retrieve("hotel con playa", top_k=10, destinations=["Cuba"])
+
+    assert len(scoped) == 4 and all("Trinidad" in doc for doc in scoped)
+    assert len(country) == 8 and not any("Roma" in doc for doc in country)
+
+
+def test_too_few_filtered_results_fall_back_to_the_whole_collection():
+    rag = EnhancedRAGSystem(_collection(), enable_genetic_optimization=False, use_answer_cache=False)
+
+    documents, _ = rag.retrieve_enhanced("hotel con playa", top_k=5, destinations=["Cienfuegos"])
+    results = rag.query_collection("hotel con playa", 10, destinations=["Trinidad"], min_results=5)
+
+    assert len(documents) == 5
+    assert results['destination_filter'] is None and len(results['ids'][0]) == 10
+    assert rag.answer_mode('rag_query', ["La Habana"]) == 'rag_query|place_habana'
+
+
+if __name__ == "__main__":
+    test_place_names_are_normalized()
+    test_metadata_and_filters_share_place_keys()
+    test_retrieval_is_scoped_to_the_destination()
+    test_too_few_filtered_results_fall_back_to_the_whole_collection()
+    print("✅ Todas las pruebas de filtrado por destino pasaron")
@@ -0,0 +1,82 @@
+"""
+Pruebas de la recuperación mejorada sobre los embeddings almacenados en Chroma
+"""
+
+import os
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.rag import EnhancedRAGSystem
+
+
+VOCABULARY = ["hotel", "playa", "museo", "restaurante", "varadero", "habana", "cultura", "comida"]
+
+
+class CountingEmbeddingFunction(EmbeddingFunction):
+    """Bolsa de palabras sobre un vocabulario fijo que cuenta los textos codificados"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, input):
+        self.encoded.extend(input)
+        return [np.array([text.lower().count(word) + 0.01 for word in VOCABULARY], dtype=np.float32)
+                for text in input]
+
+
+def _rag(embedding_cache_size=5000):
+    embedding_function = CountingEmbeddingFunction()
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=embedding_function
+    )
+    documents = [f"hotel {i} en varadero con playa" if i % 2 else f"museo {i} de cultura en la habana"
+                 for i in range(30)]
+    collection.add(ids=[f"doc_{i}" for i in range(30)], documents=documents)
+    embedding_function.encoded.clear()
+
+    rag = EnhancedRAGSystem(collection, enable_genetic_optimization=True,
+                            embedding_cache_size=embedding_cache_size)
+    return rag, embedding_function
+
+
+def test_enhanced_retrieval_only_encodes_the_query():
+    """Los documentos recuperados se puntúan con sus vectores almacenados, sin volver a codificarlos"""
+    rag, embedding_function = _rag()
+
+    documents, metrics = rag.retrieve_enhanced("hotel en varadero con playa", top_k=5)
+
+    assert embedding_function.encoded == ["hotel en varadero con playa"]
+    assert all("varadero" in doc for doc in documents)
+    assert metrics['max_relevance'] > 0.9
+
+
+def test_document_embeddings_are_cached_by_id():
+    rag, embedding_function = _rag()
+
+    rag.retrieve_with_genetic_optimization("museo de cultura en la habana", top_k=4)
+    misses = rag.embedding_cache_misses
+    rag.retrieve_with_mmr("museo de cultura en la habana", top_k=4)
+
+    assert rag.embedding_cache_hits >= misses > 0
+    assert rag.get_system_stats()['using_stored_embeddings']
+
+
+def test_without_cache_embeddings_come_with_the_query():
+    rag, _ = _rag(embedding_cache_size=0)
+
+    documents, _ = rag.retrieve_enhanced("museo de cultura", top_k=3)
+
+    assert len(documents) == 3
+    assert not rag.doc_embedding_cache
+
+
+if __name__ == "__main__":
+    test_enhanced_retrieval_only_encodes_the_query()
+    test_document_embeddings_are_cached_by_id()
+    test_without_cache_embeddings_come_with_the_query()
+    print("✅ Todas las pruebas de embeddings almacenados pasaron")
@@ -0,0 +1,123 @@
+"""
+Pruebas de la recuperación por lotes de varias consultas
+"""
+
+import os
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+
+from core.answer_cache import SemanticAnswerCache
+from core.places import place_metadata
+from core.rag import RAGSystem
+
+
+class BatchCountingEmbeddingFunction(EmbeddingFunction):
+    VOCABULARY = ["hotel", "playa", "museo", "restaurante", "noche"]
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, input):
+        self.batches.append(list(input))
+        return [np.array([text.lower().count(word) + 0.01 for word in self.VOCABULARY], dtype=np.float32)
+                for text in input]
+
+
+class CountingCollection:
+    """Envoltorio de una colección de Chroma que cuenta las llamadas a query"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.queries = 0
+
+    def query(self, **kwargs):
+        self.queries += 1
+        return self.collection.query(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class CountingGenerator:
+    """Sustituye al cliente de Mistral y cuenta las generaciones"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, on_token=None):
+        self.prompts.append(prompt)
+        return f"respuesta {len(self.prompts)}"
+
+
+def _rag(answer_cache=None):
+    embedding_function = BatchCountingEmbeddingFunction()
+    collection = chromadb.EphemeralClient().create_collection(
+        name=f"test_{uuid.uuid4().hex[:8]}", embedding_function=embedding_function
+    )
+    documents = ([f"hotel {i} en Varadero" for i in range(5)] + [f"playa {i} en Varadero" for i in range(5)] +
+                 [f"museo {i} en Trinidad" for i in range(5)] + ["hotel con playa en Varadero"])
+    metadatas = [place_metadata({'ciudad': doc.split(" en ")[-1]}) for doc in documents]
+    collection.add(ids=[f"doc_{i}" for i in range(len(documents))], documents=documents, metadatas=metadatas)
+    embedding_function.batches.clear()
+
+    counting = CountingCollection(collection)
+    rag = RAGSystem(counting, use_answer_cache=answer_cache is not None, answer_cache=answer_cache)
+    return rag, counting, embedding_function
+
+
+def test_queries_are_embedded_and_searched_in_one_call():
+    rag, collection, embedding_function = _rag()
+
+    documents = rag.retrieve_many(["mejores hoteles", "mejores playas", "museos", "mejores hoteles"], top_k=4)
+
+    assert collection.queries == 1
+    assert embedding_function.batches == [["mejores hoteles", "mejores playas", "museos"]]
+    assert len(documents) == len(set(documents))
+    assert all(any(word in doc for doc in documents) for word in ("hotel", "playa", "museo"))
+
+
+def test_documents_found_by_several_queries_come_first():
+    rag, _, _ = _rag()
+
+    documents = rag.retrieve_many(["hotel", "playa"], top_k=6, max_documents=5)
+
+    assert documents[0] == "hotel con playa en Varadero"
+    assert len(documents) == 5
+
+
+def test_destination_filter_applies_to_the_whole_batch():
+    rag, collection, _ = _rag()
+
+    scoped = rag.retrieve_many(["hotel", "museo"], top_k=3, destinations=["Trinidad"])
+    fallback = rag.retrieve_many(["hotel", "museo"], top_k=3, destinations=["Cienfuegos"])
+
+    assert scoped and all("Trinidad" in doc for doc in scoped)
+    assert any("Varadero" in doc for doc in fallback)
+    assert collection.queries == 3
+
+
+def test_cached_answers_depend_on_the_retrieval_queries():
+    """La misma pregunta con otras consultas de recuperación no reutiliza la respuesta"""
+    rag, _, _ = _rag(answer_cache=SemanticAnswerCache(":memory:"))
+    generator = rag.mistral_client = CountingGenerator()
+
+    hotels = rag.rag_query_many("¿Qué hacer en Varadero?", ["hotel", "playa"])
+    museums = rag.rag_query_many("¿Qué hacer en Varadero?", ["museo"])
+    reordered = rag.rag_query_many("¿Qué hacer en Varadero?", ["Playa", "hotel", "playa"])
+
+    assert len(generator.prompts) == 2
+    assert hotels != museums and reordered == hotels
+    assert RAGSystem.queries_digest(["hotel", "playa"]) == RAGSystem.queries_digest(["playa ", "HOTEL"])
+
+
+if __name__ == "__main__":
+    test_queries_are_embedded_and_searched_in_one_call()
+    test_documents_found_by_several_queries_come_first()
+    test_destination_filter_applies_to_the_whole_batch()
+    test_cached_answers_depend_on_the_retrieval_queries()
+    print("✅ Todas las pruebas de recuperación por lotes pasaron")
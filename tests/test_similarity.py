@@ -0,0 +1,65 @@
+"""
+Pruebas de los núcleos de similitud coseno por lotes
+"""
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from core.similarity import QuerySimilarities, normalize_rows, mean_pairwise_score, pairwise_scores, select_mmr
+
+
+def _embeddings(seed: int = 0, count: int = 20, dim: int = 16):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=dim), rng.normal(size=(count, dim))
+
+
+def test_query_scores_match_sklearn():
+    """Un único producto matriz-vector da las mismas similitudes que sklearn documento a documento"""
+    query, documents = _embeddings()
+    similarities = QuerySimilarities(query, list(documents))
+
+    expected = [cosine_similarity([query], [doc])[0][0] for doc in documents]
+    assert similarities.documents.dtype == np.float32
+    assert np.allclose(similarities.scores, expected, atol=1e-5)
+    assert np.allclose(pairwise_scores(similarities.documents), cosine_similarity(documents), atol=1e-5)
+
+
+def test_zero_vectors_have_zero_similarity():
+    """Las filas nulas (textos sin términos en TF-IDF) no producen NaN"""
+    documents = np.array([[1.0, 0.0], [0.0, 0.0], [0.0, 2.0]])
+    similarities = QuerySimilarities([1.0, 1.0], documents)
+
+    assert np.allclose(normalize_rows(documents)[1], 0.0)
+    assert np.allclose(similarities.scores, [np.sqrt(0.5), 0.0, np.sqrt(0.5)], atol=1e-6)
+    assert list(similarities.ranking(2)) == [0, 2]
+
+
+def test_mean_pairwise_score_matches_pair_loop():
+    _, documents = _embeddings(seed=1, count=8)
+    unit = normalize_rows(documents)
+
+    pairs = [cosine_similarity([documents[i]], [documents[j]])[0][0]
+             for i in range(8) for j in range(i + 1, 8)]
+    assert abs(mean_pairwise_score(unit) - np.mean(pairs)) < 1e-5
+    assert mean_pairwise_score(unit[:1]) == 0.0
+
+
+def test_mmr_prefers_diverse_documents():
+    """Entre dos copias de un documento relevante, MMR prefiere otro igual de relevante pero distinto"""
+    query = np.array([1.0, 1.0, 0.0])
+    documents = np.array([[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    similarities = QuerySimilarities(query, documents)
+
+    selected, objective = select_mmr(similarities, [1000, 1000, 1000, 1000], target_size=2)
+
+    assert selected == [0, 2]
+    assert objective > 0.0
+    assert select_mmr(similarities, [1000] * 4, target_size=0) == ([], 0.0)
+
+
+if __name__ == "__main__":
+    test_query_scores_match_sklearn()
+    test_zero_vectors_have_zero_similarity()
+    test_mean_pairwise_score_matches_pair_loop()
+    test_mmr_prefers_diverse_documents()
+    print("✅ Todas las pruebas de similitud pasaron")
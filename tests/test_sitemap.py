@@ -0,0 +1,134 @@
+"""
+Pruebas del descubrimiento de sitemaps
+"""
+
+import gzip
+import io
+import os
+import tempfile
+
+from core.fetcher import PageFetcher
+from core.sitemap import SitemapDiscovery
+
+
+class FakeRaw(io.BytesIO):
+    decode_content = False
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.raw = FakeRaw(body)
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Sesión HTTP que sirve un sitio en memoria y registra las URLs pedidas"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def get(self, url, timeout=None, stream=False):
+        self.requested.append(url)
+        if url not in self.pages:
+            return FakeResponse(b"", status_code=404)
+        return FakeResponse(self.pages[url])
+
+
+def _urlset(entries) -> bytes:
+    urls = ''.join(f"<url><loc>{loc}</loc>{f'<lastmod>{lastmod}</lastmod>' if lastmod else ''}</url>"
+                   for loc, lastmod in entries)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode()
+
+
+def _index(locs) -> bytes:
+    sitemaps = ''.join(f"<sitemap><loc>{loc}</loc></sitemap>" for loc in locs)
+    return f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{sitemaps}</sitemapindex>'.encode()
+
+
+def _discovery(pages, **kwargs):
+    fetcher = PageFetcher()
+    fetcher.session = FakeSession(pages)
+    state_path = os.path.join(tempfile.mkdtemp(), "sitemap_lastmod.json")
+    return SitemapDiscovery(fetcher, state_path=state_path, **kwargs)
+
+
+def _matches_hotels(url: str) -> bool:
+    return "hotel" in url
+
+
+def test_gzip_is_detected_by_its_magic_bytes():
+    """Un sitemap comprimido se descomprime aunque su URL no termine en .gz"""
+    body = gzip.compress(_urlset([("https://site.cu/hotel/1", None), ("https://site.cu/hotel/2", None)]))
+    discovery = _discovery({"https://site.cu/robots.txt": b"Sitemap: https://site.cu/sitemap.xml\n",
+                            "https://site.cu/sitemap.xml": body})
+
+    assert sorted(discovery.discover("https://site.cu/", _matches_hotels)) == \
+        ["https://site.cu/hotel/1", "https://site.cu/hotel/2"]
+
+
+def test_nested_indexes_are_traversed():
+    """Los índices anidados se recorren y los sitemaps hijos relevantes van primero"""
+    pages = {
+        "https://site.cu/sitemap.xml": _index(["https://site.cu/blog-index.xml", "https://site.cu/hotel-index.xml"]),
+        "https://site.cu/hotel-index.xml": _index(["https://site.cu/hotel-sitemap.xml"]),
+        "https://site.cu/hotel-sitemap.xml": _urlset([("https://site.cu/hotel/varadero", "2024-05-01")]),
+        "https://site.cu/blog-index.xml": _index([]),
+    }
+    discovery = _discovery(pages)
+
+    assert discovery.discover("https://site.cu/", _matches_hotels) == ["https://site.cu/hotel/varadero"]
+    requested = discovery.fetcher.session.requested
+    assert requested.index("https://site.cu/hotel-index.xml") < requested.index("https://site.cu/blog-index.xml")
+    assert discovery.get_stats()['sitemaps_read'] == 4
+
+
+def test_unchanged_lastmod_is_skipped_on_the_next_session():
+    """Las URLs rastreadas cuyo lastmod no cambió no se vuelven a sembrar"""
+    entries = [("https://site.cu/hotel/1", "2024-05-01"), ("https://site.cu/hotel/2", "2024-06-01")]
+    pages = {"https://site.cu/sitemap.xml": _urlset(entries)}
+    discovery = _discovery(pages)
+
+    assert discovery.discover("https://site.cu/", _matches_hotels) == \
+        ["https://site.cu/hotel/2", "https://site.cu/hotel/1"]
+    for url, _ in entries:
+        discovery.mark_crawled(url)
+    discovery.save_state()
+
+    pages["https://site.cu/sitemap.xml"] = _urlset([entries[0], ("https://site.cu/hotel/2", "2024-07-15")])
+    next_session = SitemapDiscovery(discovery.fetcher, state_path=discovery.state_path)
+    assert next_session.discover("https://site.cu/", _matches_hotels) == ["https://site.cu/hotel/2"]
+    assert next_session.get_stats()['entries_unchanged'] == 1
+
+
+def test_entries_per_sitemap_are_capped():
+    entries = [(f"https://site.cu/hotel/{index}", None) for index in range(50)]
+    discovery = _discovery({"https://site.cu/sitemap.xml": _urlset(entries)}, max_entries_per_sitemap=5)
+
+    assert len(discovery.discover("https://site.cu/", _matches_hotels)) == 5
+    assert discovery.get_stats()['entries_seen'] == 5
+
+
+def test_decompressed_size_is_capped():
+    """Una bomba gzip se corta en max_sitemap_bytes; las entradas anteriores se conservan"""
+    entries = [(f"https://site.cu/hotel/{index}", None) for index in range(3)]
+    body = _urlset(entries).replace(b"</urlset>", b"<!--" + b"0" * 5_000_000 + b"-->" + b"</urlset>")
+    compressed = gzip.compress(body)
+    discovery = _discovery({"https://site.cu/sitemap.xml": compressed}, max_sitemap_bytes=100_000)
+
+    assert len(compressed) < 100_000
+    assert len(discovery.discover("https://site.cu/", _matches_hotels)) == 3
+    assert discovery.get_stats()['sitemaps_truncated'] == 1
+
+
+if __name__ == "__main__":
+    test_gzip_is_detected_by_its_magic_bytes()
+    test_nested_indexes_are_traversed()
+    test_unchanged_lastmod_is_skipped_on_the_next_session()
+    test_entries_per_sitemap_are_capped()
+    test_decompressed_size_is_capped()
+    print("✅ Todas las pruebas de descubrimiento de sitemaps pasaron")
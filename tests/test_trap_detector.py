@@ -0,0 +1,81 @@
+"""
+Pruebas de la detección de trampas y bucles de paginación del crawler
+"""
+
+from core.trap_detector import TrapDetector, url_template
+
+
+def _listing_text(page: int) -> str:
+    return ("Hoteles en Varadero con piscina y vista al mar. Reserve su habitación hoy. "
+            f"Mostrando resultados de la página {page} ordenados por precio. ") * 5
+
+
+def test_url_template_groups_pagination_and_ids():
+    """Las URLs que solo difieren en números o valores de la query comparten plantilla"""
+    assert url_template("https://www.booking.com/hotel/123?page=4&sort=price") == \
+        url_template("https://booking.com/hotel/987?sort=name&page=5")
+    assert url_template("https://site.com/calendar/2024-05-01") == "site.com/calendar/{n}-{n}-{n}"
+    assert url_template("https://site.com/hoteles/varadero") != url_template("https://site.com/hoteles/trinidad")
+
+
+def test_low_yield_pagination_is_banned():
+    """Un listado paginado que repite contenido se bloquea tras las muestras mínimas"""
+    detector = TrapDetector(min_samples=5, throttle_threshold=0.5, ban_threshold=0.3)
+
+    for page in range(1, 6):
+        url = f"https://tripsite.com/hotels?page={page}"
+        assert detector.should_fetch(url)
+        detector.record_page(url, _listing_text(page))
+
+    assert detector.is_banned("https://tripsite.com/hotels?page=99")
+    assert not detector.should_fetch("https://tripsite.com/hotels?page=100")
+
+    report = detector.get_report()
+    assert report[0]['template'] == "tripsite.com/hotels?page"
+    assert report[0]['state'] == 'banned'
+    assert report[0]['skipped'] == 1
+
+
+def test_productive_template_stays_active():
+    """Las plantillas que siguen aportando contenido nuevo no se limitan"""
+    detector = TrapDetector(min_samples=3)
+    places = ["varadero playa arena blanca", "trinidad ciudad colonial museos",
+              "viñales valle mogotes tabaco", "cienfuegos bahía teatro tomás terry"]
+
+    for index, place in enumerate(places):
+        url = f"https://guide.com/destino/{index}"
+        detector.record_page(url, f"Guía de {place}. " * 10 + f"Consejos para visitar {place} en familia.")
+
+    assert detector.should_fetch("https://guide.com/destino/10")
+    assert detector.get_report() == []
+
+
+def test_throttled_template_lets_some_urls_through():
+    """Las plantillas con rendimiento intermedio solo dejan pasar una de cada N URLs"""
+    detector = TrapDetector(min_samples=4, throttle_threshold=0.6, ban_threshold=0.1, throttle_every=3)
+
+    detector.record_page("https://site.com/list/1", "Playas de Cuba con arena blanca y aguas cristalinas " * 3)
+    detector.record_page("https://site.com/list/2", "Museos de La Habana y su arquitectura colonial " * 3)
+    for page in range(3, 5):
+        detector.record_page(f"https://site.com/list/{page}", None)
+
+    decisions = [detector.should_fetch(f"https://site.com/list/{page}") for page in range(5, 11)]
+    assert decisions.count(True) == 2
+    assert detector.get_report()[0]['state'] == 'throttled'
+
+
+def test_repeated_path_segments_are_rejected():
+    """Las rutas con segmentos repetidos (bucles de enlaces relativos) se descartan"""
+    detector = TrapDetector(max_repeated_segments=2)
+    assert not detector.should_fetch("https://site.com/es/hoteles/es/hoteles/es/hoteles/")
+    assert detector.should_fetch("https://site.com/es/hoteles/varadero")
+    assert detector.get_stats()['loop_urls_skipped'] == 1
+
+
+if __name__ == "__main__":
+    test_url_template_groups_pagination_and_ids()
+    test_low_yield_pagination_is_banned()
+    test_productive_template_stays_active()
+    test_throttled_template_lets_some_urls_through()
+    test_repeated_path_segments_are_rejected()
+    print("✅ Todas las pruebas de detección de trampas pasaron")
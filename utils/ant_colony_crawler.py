@@ -3,16 +3,22 @@ Implementación del Algoritmo de Colonia de Hormigas (ACO) para Web Crawling
 Optimiza la exploración de URLs basándose en feromonas y heurísticas
 """
 
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import numpy as np
 import random
 import time
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Callable
 from dataclasses import dataclass
+from collections import OrderedDict, Counter
+import re
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from core.embedding_cache import get_query_embedding_cache
+from core.fetcher import PageFetcher
+from core.link_classifier import LinkClassifier
+from utils.pheromone_store import PheromoneGraphStore, normalize_host, topic_key
 
 
 @dataclass
@@ -32,6 +38,92 @@ class URLNode:
             self.keywords_found = []
 
 
+@dataclass
+class CachedPage:
+    """Página descargada y procesada una sola vez durante una ejecución ACO"""
+    url: str
+    title: str = ""
+    content: str = ""
+    links: List[str] = None
+    keywords_found: List[str] = None
+    
+    def __post_init__(self):
+        if self.links is None:
+            self.links = []
+        if self.keywords_found is None:
+            self.keywords_found = []
+
+
+class PageStore:
+    """
+    Almacén acotado (LRU) de páginas procesadas, compartido por la exploración
+    de las hormigas, la evaluación de caminos y la extracción de contenido.
+    
+    Si varias hormigas piden a la vez una página que no está en el almacén,
+    solo una la descarga y el resto espera su resultado.
+    """
+    
+    def __init__(self, max_pages: int = 1000):
+        self.max_pages = max_pages
+        self.pages: "OrderedDict[str, Optional[CachedPage]]" = OrderedDict()
+        self.loading: Dict[str, threading.Event] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+    
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Devuelve la página si ya está en el almacén (sin descargarla)"""
+        with self.lock:
+            page = self.pages.get(url)
+            if page is not None:
+                self.pages.move_to_end(url)
+            return page
+    
+    def get_or_load(self, url: str, loader: Callable[[str], Optional[CachedPage]]) -> Optional[CachedPage]:
+        """
+        Obtiene una página del almacén o la carga con loader.
+        
+        Las descargas fallidas también se recuerdan (como None) para no repetirlas.
+        """
+        while True:
+            with self.lock:
+                if url in self.pages:
+                    self.hits += 1
+                    self.pages.move_to_end(url)
+                    return self.pages[url]
+                
+                event = self.loading.get(url)
+                if event is None:
+                    event = threading.Event()
+                    self.loading[url] = event
+                    self.fetches += 1
+                    break
+            
+            event.wait()
+        
+        page = None
+        try:
+            page = loader(url)
+        finally:
+            with self.lock:
+                self.pages[url] = page
+                self.pages.move_to_end(url)
+                while len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+                self.loading.pop(url, None)
+            event.set()
+        
+        return page
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                'pages_stored': len(self.pages),
+                'fetches': self.fetches,
+                'hits': self.hits
+            }
+
+
 class AntColonyOptimizer:
     """Implementación del algoritmo de colonia de hormigas para web crawling"""
     
@@ -40,9 +132,16 @@ class AntColonyOptimizer:
                  alpha: float = 1.0,      
                  beta: float = 2.0,       
                  rho: float = 0.1,        
-                 q: float = 100.0,        
+                 q: float = 1.0,          
                  max_iterations: int = 5,
-                 max_depth: int = 3):
+                 max_depth: int = 3,
+                 fetcher: PageFetcher = None,
+                 link_classifier: LinkClassifier = None,
+                 initial_capacity: int = 1024,
+                 seed: Optional[int] = None,
+                 max_cached_pages: int = 1000,
+                 embedding_function: Optional[Callable[[List[str]], List]] = None,
+                 content_scoring: bool = True):
         
         self.num_ants = num_ants
         self.alpha = alpha
@@ -51,12 +150,39 @@ class AntColonyOptimizer:
         self.q = q
         self.max_iterations = max_iterations
         self.max_depth = max_depth
+        self.fetcher = fetcher or PageFetcher()
+        self.link_classifier = link_classifier
+        self.rng = np.random.default_rng(seed)
+        self.page_store = PageStore(max_pages=max_cached_pages)
+        self.fetch_budget: Optional[int] = None
+        self.stop_ants = threading.Event()
+        
+        
+        self.url_to_id: Dict[str, int] = {}
+        self.urls: List[str] = []
+        self.pheromone = np.ones(initial_capacity, dtype=np.float64)
+        self.heuristic = np.zeros(initial_capacity, dtype=np.float64)
+        self.visit_counts = np.zeros(initial_capacity, dtype=np.int64)
+        self.depths = np.zeros(initial_capacity, dtype=np.int32)
+        self.parents = np.full(initial_capacity, -1, dtype=np.int64)
+        self.keyword_hits = np.zeros(initial_capacity, dtype=np.float64)
+        self.content_scores = np.full(initial_capacity, np.nan, dtype=np.float64)
+        
+        
+        self.embedding_function = embedding_function
+        self.content_scoring = content_scoring
+        self.query_embeddings: Dict[Tuple[str, ...], np.ndarray] = {}
+        
         
+        self.csr_indptr = np.zeros(1, dtype=np.int64)
+        self.csr_indices = np.zeros(0, dtype=np.int64)
+        self.csr_row_of: Dict[int, int] = {}
+        self.pending_edges: Dict[int, np.ndarray] = {}
         
-        self.nodes: Dict[str, URLNode] = {}
-        self.adjacency_list: Dict[str, List[str]] = {}
         self.best_paths: List[List[str]] = []
         self.iteration_stats: List[Dict] = []
+        self.warm_started_nodes = 0
+        self.warm_started_edges = 0
         
         
         self.lock = threading.Lock()
@@ -129,19 +255,21 @@ class AntColonyOptimizer:
                     (1.0 - depth_penalty) * 0.2 - 
                     penalty)
         
+        
+        if self.link_classifier is not None and self.link_classifier.is_trained:
+            heuristic = heuristic * 0.6 + self.link_classifier.score(url) * 0.4
+        
         return max(0.1, min(1.0, heuristic))  
     
-    def extract_links_from_url(self, url: str, keywords: List[str]) -> List[str]:
+    def fetch_page(self, url: str, keywords: List[str]) -> Optional[CachedPage]:
         """
-        Extrae enlaces de una URL con filtrado inteligente
+        Descarga y procesa una página una sola vez: enlaces filtrados y contenido
         """
         try:
-            response = requests.get(url, timeout=10, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
+            response = self.fetcher.fetch(url)
             
-            if response.status_code != 200:
-                return []
+            if not response.ok:
+                return None
             
             soup = BeautifulSoup(response.text, 'html.parser')
             links = []
@@ -168,11 +296,37 @@ class AntColonyOptimizer:
                 if has_keywords or self._has_tourism_patterns(absolute_url):
                     links.append(absolute_url)
             
-            return list(set(links))[:20]  
+            
+            title, content_text = _extract_page_text(soup)
+            content_lower = content_text.lower()
+            
+            return CachedPage(
+                url=url,
+                title=title,
+                content=content_text,
+                links=list(dict.fromkeys(links))[:20],
+                keywords_found=[keyword for keyword in keywords if keyword.lower() in content_lower]
+            )
             
         except Exception as e:
-            print(f"Error extrayendo enlaces de {url}: {e}")
-            return []
+            print(f"Error procesando {url}: {e}")
+            return None
+    
+    def get_page(self, url: str, keywords: List[str]) -> Optional[CachedPage]:
+        """Obtiene una página del almacén de la ejecución, descargándola solo si no está"""
+        return self.page_store.get_or_load(url, lambda page_url: self.fetch_page(page_url, keywords))
+    
+    def extract_links_from_url(self, url: str, keywords: List[str]) -> List[str]:
+        """
+        Extrae enlaces de una URL con filtrado inteligente
+        """
+        page = self.get_page(url, keywords)
+        return list(page.links) if page else []
+    
+    def extract_content(self, url: str, keywords: List[str]) -> Optional[Dict]:
+        """Extrae el contenido de una URL leyendo del almacén de páginas de la ejecución"""
+        page = self.get_page(url, keywords)
+        return _page_to_content(page)
     
     def _is_valid_url(self, url: str) -> bool:
         """Verifica si una URL es válida para crawling"""
@@ -201,175 +355,563 @@ class AntColonyOptimizer:
         url_lower = url.lower()
         return any(pattern in url_lower for pattern in tourism_patterns)
     
-    def calculate_transition_probability(self, current_url: str, next_url: str) -> float:
-        """
-        Calcula la probabilidad de transición de una URL a otra
-        """
-        current_node = self.nodes.get(current_url)
-        next_node = self.nodes.get(next_url)
-        
-        if not current_node or not next_node:
-            return 0.0
+    @property
+    def num_nodes(self) -> int:
+        return len(self.urls)
+    
+    def _ensure_capacity(self, size: int):
+        """Amplía los vectores de nodos (duplicando su tamaño) cuando se llenan"""
+        capacity = self.pheromone.shape[0]
+        if size <= capacity:
+            return
+        
+        new_capacity = max(size, capacity * 2)
+        
+        def grow(array: np.ndarray, fill) -> np.ndarray:
+            grown = np.full(new_capacity, fill, dtype=array.dtype)
+            grown[:capacity] = array
+            return grown
+        
+        self.pheromone = grow(self.pheromone, 1.0)
+        self.heuristic = grow(self.heuristic, 0.0)
+        self.visit_counts = grow(self.visit_counts, 0)
+        self.depths = grow(self.depths, 0)
+        self.parents = grow(self.parents, -1)
+        self.keyword_hits = grow(self.keyword_hits, 0.0)
+        self.content_scores = grow(self.content_scores, np.nan)
+    
+    def _intern(self, url: str, heuristic: float, depth: int = 0, parent_id: int = -1) -> int:
+        """Asigna un identificador entero a una URL (debe llamarse con self.lock adquirido)"""
+        node_id = self.url_to_id.get(url)
+        if node_id is not None:
+            return node_id
+        
+        node_id = len(self.urls)
+        self._ensure_capacity(node_id + 1)
+        self.url_to_id[url] = node_id
+        self.urls.append(url)
+        self.heuristic[node_id] = heuristic
+        self.depths[node_id] = depth
+        self.parents[node_id] = parent_id
+        return node_id
+    
+    def add_node(self, url: str, keywords: List[str], depth: int = 0, parent_url: Optional[str] = None) -> int:
+        """Registra una URL en el grafo calculando su heurística"""
+        heuristic = self.calculate_url_heuristic(url, keywords)
+        with self.lock:
+            parent_id = self.url_to_id.get(parent_url, -1) if parent_url else -1
+            return self._intern(url, heuristic, depth, parent_id)
+    
+    def _rebuild_csr(self):
+        """Incorpora las aristas descubiertas a la matriz de adyacencia CSR"""
+        with self.lock:
+            if not self.pending_edges:
+                return
+            pending, self.pending_edges = self.pending_edges, {}
+        
+        rows = [self.csr_indices[self.csr_indptr[row]:self.csr_indptr[row + 1]]
+                for row in range(len(self.csr_row_of))]
+        for node_id, neighbors in pending.items():
+            self.csr_row_of[node_id] = len(rows)
+            rows.append(neighbors)
+        
+        lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+        self.csr_indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.csr_indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    
+    def _neighbors(self, node_id: int) -> Optional[np.ndarray]:
+        """Vecinos de un nodo (None si la página aún no se ha expandido)"""
+        row = self.csr_row_of.get(node_id)
+        if row is not None:
+            return self.csr_indices[self.csr_indptr[row]:self.csr_indptr[row + 1]]
+        with self.lock:
+            return self.pending_edges.get(node_id)
+    
+    def get_neighbors(self, url: str) -> List[str]:
+        """URLs enlazadas desde una URL ya expandida"""
+        node_id = self.url_to_id.get(url)
+        neighbors = self._neighbors(node_id) if node_id is not None else None
+        return [] if neighbors is None else [self.urls[i] for i in neighbors]
+    
+    def _expand(self, node_id: int, keywords: List[str]) -> np.ndarray:
+        """Descarga una página y registra sus enlaces como aristas del grafo"""
+        url = self.urls[node_id]
+        links = self.extract_links_from_url(url, keywords)
         
         
-        pheromone_component = next_node.pheromone ** self.alpha
+        heuristics = [self.calculate_url_heuristic(link, keywords) for link in links]
         
         
-        heuristic_component = next_node.heuristic_value ** self.beta
+        if self.content_scoring:
+            page = self.page_store.get(url)
+            if page is not None:
+                content_score = self.score_content(node_id, page, keywords)
+                heuristics = [0.5 * heuristic + 0.5 * content_score for heuristic in heuristics]
         
+        with self.lock:
+            existing = self.pending_edges.get(node_id)
+            if existing is not None:
+                return existing
+            depth = int(self.depths[node_id]) + 1
+            neighbors = np.array(
+                [self._intern(link, heuristic, depth, node_id) for link, heuristic in zip(links, heuristics)],
+                dtype=np.int64
+            )
+            self.pending_edges[node_id] = neighbors
+            return neighbors
+    
+    def _transition_weights(self, candidates: np.ndarray) -> np.ndarray:
+        """Peso ACO (feromona^alpha * heurística^beta) de un conjunto de nodos"""
+        return self.pheromone[candidates] ** self.alpha * self.heuristic[candidates] ** self.beta
+    
+    def calculate_transition_probability(self, current_url: str, next_url: str) -> float:
+        """
+        Calcula el peso (no normalizado) de la transición de una URL a otra
+        """
+        if current_url not in self.url_to_id or next_url not in self.url_to_id:
+            return 0.0
+        return float(self._transition_weights(np.array([self.url_to_id[next_url]]))[0])
+    
+    def select_next_node(self, candidates: np.ndarray, rng: np.random.Generator) -> Optional[int]:
+        """
+        Selecciona el siguiente nodo muestreando los candidatos según sus pesos ACO
+        """
+        if candidates.size == 0:
+            return None
         
-        probability = pheromone_component * heuristic_component
+        weights = self._transition_weights(candidates)
+        total = weights.sum()
+        if not np.isfinite(total) or total <= 0:
+            return int(rng.choice(candidates))
         
-        return probability
+        return int(rng.choice(candidates, p=weights / total))
     
     def select_next_url(self, current_url: str, available_urls: List[str]) -> Optional[str]:
         """
         Selecciona la siguiente URL usando probabilidades ACO
         """
-        if not available_urls:
-            return None
-        
-        
-        probabilities = []
-        for url in available_urls:
-            prob = self.calculate_transition_probability(current_url, url)
-            probabilities.append(prob)
-        
-        
-        total_prob = sum(probabilities)
-        if total_prob == 0:
-            
-            return random.choice(available_urls)
+        candidates = np.array([self.url_to_id[url] for url in available_urls if url in self.url_to_id],
+                              dtype=np.int64)
+        if candidates.size == 0:
+            return random.choice(available_urls) if available_urls else None
         
-        normalized_probs = [p / total_prob for p in probabilities]
-        
-        
-        r = random.random()
-        cumulative_prob = 0.0
-        
-        for i, prob in enumerate(normalized_probs):
-            cumulative_prob += prob
-            if r <= cumulative_prob:
-                return available_urls[i]
-        
-        
-        return available_urls[-1]
+        next_id = self.select_next_node(candidates, self.rng)
+        return self.urls[next_id]
     
-    def ant_exploration(self, start_url: str, keywords: List[str], ant_id: int) -> List[str]:
+    def ant_exploration(self, start_url: str, keywords: List[str], ant_id: int,
+                        rng: np.random.Generator = None) -> List[str]:
         """
         Simula el recorrido de una hormiga
         """
-        path = [start_url]
-        current_url = start_url
-        visited_in_path = {start_url}
+        rng = rng or np.random.default_rng()
+        current_id = self.url_to_id.get(start_url)
+        if current_id is None:
+            current_id = self.add_node(start_url, keywords)
+        
+        path_ids = [current_id]
         
         for step in range(self.max_depth):
+            if self.stop_ants.is_set():
+                break
             
-            if current_url not in self.adjacency_list:
-                links = self.extract_links_from_url(current_url, keywords)
-                with self.lock:
-                    self.adjacency_list[current_url] = links
-                    
-                    
-                    for link in links:
-                        if link not in self.nodes:
-                            heuristic = self.calculate_url_heuristic(link, keywords)
-                            self.nodes[link] = URLNode(
-                                url=link,
-                                heuristic_value=heuristic,
-                                depth=step + 1,
-                                parent_url=current_url
-                            )
+            neighbors = self._neighbors(current_id)
+            if neighbors is None:
+                if self._fetch_budget_exhausted() and self.page_store.get(self.urls[current_id]) is None:
+                    break
+                neighbors = self._expand(current_id, keywords)
             
             
-            available_urls = [
-                url for url in self.adjacency_list.get(current_url, [])
-                if url not in visited_in_path
-            ]
+            candidates = neighbors[~np.isin(neighbors, path_ids)]
             
-            if not available_urls:
+            next_id = self.select_next_node(candidates, rng)
+            if next_id is None:
                 break
             
+            path_ids.append(next_id)
+            current_id = next_id
             
-            next_url = self.select_next_url(current_url, available_urls)
-            
-            if next_url:
-                path.append(next_url)
-                visited_in_path.add(next_url)
-                current_url = next_url
-                
-                
-                with self.lock:
-                    if next_url in self.nodes:
-                        self.nodes[next_url].visited_count += 1
-            else:
-                break
+            with self.lock:
+                self.visit_counts[next_id] += 1
+        
+        return [self.urls[node_id] for node_id in path_ids]
+    
+    def _query_embedding(self, keywords: List[str]) -> Optional[np.ndarray]:
+        """Embedding normalizado de la consulta (compartido con la caché de consultas del RAG)"""
+        key = tuple(keywords)
+        if key not in self.query_embeddings:
+            query_cache = get_query_embedding_cache(self.embedding_function)
+            embedding = np.asarray(query_cache.embed(' '.join(keywords)), dtype=np.float64)
+            self.query_embeddings[key] = embedding / (np.linalg.norm(embedding) or 1.0)
+        return self.query_embeddings[key]
+    
+    @staticmethod
+    def _lexical_similarity(keywords: List[str], text: str) -> float:
+        """Similitud coseno entre los términos de la consulta y las frecuencias de términos del texto"""
+        query_terms = Counter(re.findall(r'\w+', ' '.join(keywords).lower()))
+        text_terms = Counter(re.findall(r'\w+', text.lower()))
+        if not query_terms or not text_terms:
+            return 0.0
         
-        return path
+        dot = sum(count * text_terms.get(term, 0) for term, count in query_terms.items())
+        norm = np.sqrt(sum(c * c for c in query_terms.values())) * np.sqrt(sum(c * c for c in text_terms.values()))
+        return float(dot / norm) if norm else 0.0
+    
+    def score_content(self, node_id: int, page: CachedPage, keywords: List[str]) -> float:
+        """
+        Puntúa el contenido descargado de un nodo (se calcula una vez por URL).
+        
+        Combina la cobertura de palabras clave con la similitud entre el texto
+        y la consulta: coseno de embeddings si hay función de embeddings o, si
+        no, similitud léxica de frecuencias de términos.
+        """
+        cached = self.content_scores[node_id]
+        if not np.isnan(cached):
+            return float(cached)
+        
+        coverage = len(page.keywords_found) / max(len(keywords), 1)
+        text = f"{page.title} {page.content[:2000]}"
+        
+        similarity = 0.0
+        if self.embedding_function is not None:
+            try:
+                embedding = np.asarray(self.embedding_function([text])[0], dtype=np.float64)
+                similarity = float(embedding @ self._query_embedding(keywords) / (np.linalg.norm(embedding) or 1.0))
+            except Exception as e:
+                print(f"⚠️ Error calculando embedding de {page.url}: {e}")
+                similarity = self._lexical_similarity(keywords, text)
+        else:
+            similarity = self._lexical_similarity(keywords, text)
+        
+        score = 0.5 * coverage + 0.5 * max(similarity, 0.0)
+        with self.lock:
+            self.keyword_hits[node_id] = len(page.keywords_found)
+            self.content_scores[node_id] = score
+            self.heuristic[node_id] = 0.5 * self.heuristic[node_id] + 0.5 * score
+        return score
     
     def evaluate_path_quality(self, path: List[str], keywords: List[str]) -> float:
         """
         Evalúa la calidad de un camino basado en contenido extraído
+        
+        Los nodos cuya página ya se descargó se puntúan por su contenido; para
+        el resto se usa la heurística de la URL como estimación.
         """
-        total_quality = 0.0
-        content_extracted = 0
+        if not path:
+            return 0.0
         
-        for url in path:
-            node = self.nodes.get(url)
-            if node:
-                
-                heuristic_score = node.heuristic_value
-                keyword_score = len(node.keywords_found) / max(len(keywords), 1)
-                depth_penalty = 1.0 - (node.depth * 0.1)
-                
-                url_quality = (heuristic_score * 0.5 + 
-                              keyword_score * 0.3 + 
-                              depth_penalty * 0.2)
-                
-                total_quality += url_quality
-                content_extracted += 1
+        ids = np.array([self.url_to_id[url] for url in path if url in self.url_to_id], dtype=np.int64)
+        if ids.size == 0:
+            return 0.0
         
         
-        if len(path) > 0:
-            return total_quality / len(path)
+        for node_id in ids:
+            page = self.page_store.get(self.urls[node_id])
+            if page is not None:
+                if self.content_scoring:
+                    self.score_content(int(node_id), page, keywords)
+                else:
+                    self.keyword_hits[node_id] = len(page.keywords_found)
         
-        return 0.0
+        heuristic_score = self.heuristic[ids]
+        depth_penalty = 1.0 - self.depths[ids] * 0.1
+        
+        if self.content_scoring:
+            content_score = self.content_scores[ids]
+            content_score = np.where(np.isnan(content_score), heuristic_score * 0.5, content_score)
+            url_quality = heuristic_score * 0.3 + content_score * 0.5 + depth_penalty * 0.2
+        else:
+            keyword_score = self.keyword_hits[ids] / max(len(keywords), 1)
+            url_quality = heuristic_score * 0.5 + keyword_score * 0.3 + depth_penalty * 0.2
+        
+        return float(url_quality.sum() / len(path))
     
     def update_pheromones(self, paths: List[List[str]], qualities: List[float]):
         """
         Actualiza las feromonas basándose en la calidad de los caminos
         """
-        
+        self.evaporate(1.0 - self.rho)
+        self.deposit(paths, qualities)
+    
+    def evaporate(self, factor: float):
+        """Evapora las feromonas de todos los nodos multiplicándolas por factor"""
         with self.lock:
-            for node in self.nodes.values():
-                node.pheromone *= (1.0 - self.rho)
-                node.pheromone = max(0.1, node.pheromone)  
+            pheromone = self.pheromone[:self.num_nodes]
+            pheromone *= factor
+            np.maximum(pheromone, 0.1, out=pheromone)
+    
+    def deposit(self, paths: List[List[str]], qualities: List[float]):
+        """Deposita feromona en los nodos de los caminos según su calidad"""
+        with self.lock:
+            pheromone = self.pheromone[:self.num_nodes]
+            path_ids = [np.array([self.url_to_id[url] for url in path if url in self.url_to_id], dtype=np.int64)
+                        for path in paths]
+            if path_ids:
+                ids = np.concatenate(path_ids)
+                deposits = np.repeat(self.q * np.asarray(qualities, dtype=np.float64),
+                                     [len(p) for p in path_ids])
+                np.add.at(pheromone, ids, deposits)
+                np.minimum(pheromone, 10.0, out=pheromone)
+    
+    def adjacency(self) -> Dict[int, np.ndarray]:
+        """Vecinos de todos los nodos expandidos (CSR y aristas pendientes)"""
+        adjacency = {node_id: self.csr_indices[self.csr_indptr[row]:self.csr_indptr[row + 1]]
+                     for node_id, row in self.csr_row_of.items()}
+        with self.lock:
+            adjacency.update(self.pending_edges)
+        return adjacency
+    
+    def warm_start(self, graph_store: PheromoneGraphStore, start_urls: List[str], keywords: List[str]) -> int:
+        """
+        Carga los grafos guardados de los hosts iniciales para el tema de la búsqueda.
+        
+        Las feromonas (con decaimiento temporal) y las listas de adyacencia
+        conocidas permiten seguir los buenos caminos desde la primera iteración
+        sin volver a descargar las páginas de navegación.
         
+        Returns:
+            int: Número de nodos cargados
+        """
+        topic = topic_key(keywords)
+        loaded_nodes = 0
         
-        for path, quality in zip(paths, qualities):
-            pheromone_deposit = self.q * quality
+        for host in dict.fromkeys(normalize_host(url) for url in start_urls):
+            graph = graph_store.load(host, topic)
+            if graph is None:
+                continue
+            
+            with self.lock:
+                ids = np.array([self._intern(url, float(h), int(d))
+                                for url, h, d in zip(graph.urls, graph.heuristic, graph.depths)], dtype=np.int64)
+                self.pheromone[ids] = np.maximum(self.pheromone[ids], graph.pheromone)
+                
+                for row_index, row in enumerate(graph.rows.tolist()):
+                    node_id = int(ids[row])
+                    if node_id not in self.csr_row_of and node_id not in self.pending_edges:
+                        self.pending_edges[node_id] = ids[graph.neighbors(row_index)]
+                        self.warm_started_edges += len(self.pending_edges[node_id])
             
-            for url in path:
-                with self.lock:
-                    if url in self.nodes:
-                        self.nodes[url].pheromone += pheromone_deposit
-                        
-                        self.nodes[url].pheromone = min(10.0, self.nodes[url].pheromone)
+            loaded_nodes += len(graph.urls)
+        
+        self.warm_started_nodes += loaded_nodes
+        if loaded_nodes:
+            print(f"🔥 Arranque en caliente: {loaded_nodes} nodos y {self.warm_started_edges} aristas "
+                  f"de sesiones anteriores (tema '{topic}')")
+        return loaded_nodes
+    
+    def save_graph(self, graph_store: PheromoneGraphStore, keywords: List[str]):
+        """Guarda el grafo de la ejecución por host para el tema de la búsqueda"""
+        topic = topic_key(keywords)
+        adjacency = self.adjacency()
+        n = self.num_nodes
+        urls = list(self.urls)
+        
+        for host in dict.fromkeys(normalize_host(urls[node_id]) for node_id in adjacency):
+            graph_store.save_host(host, topic, urls, self.pheromone[:n], self.heuristic[:n],
+                                  self.depths[:n], adjacency)
+    
+    def top_urls(self, k: int) -> List[str]:
+        """URLs con mayor feromona * heurística"""
+        n = self.num_nodes
+        if n == 0:
+            return []
+        scores = self.pheromone[:n] * self.heuristic[:n]
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [self.urls[i] for i in top[np.argsort(-scores[top])]]
+    
+    @property
+    def nodes(self) -> Dict[str, URLNode]:
+        """Vista de compatibilidad de los nodos como URLNode (se materializa bajo demanda)"""
+        return {
+            url: URLNode(
+                url=url,
+                pheromone=float(self.pheromone[i]),
+                heuristic_value=float(self.heuristic[i]),
+                visited_count=int(self.visit_counts[i]),
+                depth=int(self.depths[i]),
+                parent_url=self.urls[self.parents[i]] if self.parents[i] >= 0 else None
+            )
+            for i, url in enumerate(self.urls)
+        }
+    
+    def _summarize(self, best_overall_quality: float, best_overall_paths: List[List[str]]) -> Dict:
+        """Construye el diccionario de resultados de una optimización"""
+        self._rebuild_csr()
+        total_nodes = self.num_nodes
+        total_edges = int(self.csr_indices.size)
+        avg_pheromone = float(self.pheromone[:total_nodes].mean()) if total_nodes else 0
+        
+        results = {
+            'best_paths': best_overall_paths,
+            'best_quality': best_overall_quality,
+            'total_nodes_discovered': total_nodes,
+            'total_edges_discovered': total_edges,
+            'average_pheromone_level': avg_pheromone,
+            'iteration_stats': self.iteration_stats,
+            'pheromone_trails_count': total_edges,
+            'success_rate': best_overall_quality,
+            'nodes_discovered': total_nodes,
+            'average_path_length': np.mean([len(path) for path in best_overall_paths]) if best_overall_paths else 0,
+            'warm_started_nodes': self.warm_started_nodes,
+            'page_fetches': self.page_store.get_stats()['fetches']
+        }
+        
+        print(f"🎯 Optimización ACO completada:")
+        print(f"   • Mejor calidad: {best_overall_quality:.3f}")
+        print(f"   • Nodos descubiertos: {total_nodes}")
+        print(f"   • Aristas descubiertas: {total_edges}")
+        print(f"   • Nivel promedio de feromonas: {avg_pheromone:.3f}")
+        
+        return results
+    
+    def _fetch_budget_exhausted(self) -> bool:
+        return self.fetch_budget is not None and self.page_store.get_stats()['fetches'] >= self.fetch_budget
+    
+    def run_optimization_async(self,
+                               start_urls: List[str],
+                               keywords: List[str],
+                               fetch_budget: Optional[int] = None,
+                               time_budget: float = 60.0,
+                               max_ants: Optional[int] = None,
+                               grace_period: float = 5.0,
+                               on_path: Optional[Callable[[List[str], float], None]] = None) -> Dict:
+        """
+        Ejecuta la colonia de forma asíncrona, sin barreras entre iteraciones.
+        
+        num_ants hormigas recorren el grafo continuamente en un pool compartido.
+        Cada hormiga deposita su feromona en cuanto termina su camino y se lanza
+        otra en su lugar, de modo que una descarga lenta no frena al resto. La
+        evaporación se reparte entre las hormigas: tras num_ants caminos equivale
+        a la de una iteración síncrona.
+        
+        Args:
+            start_urls: URLs iniciales
+            keywords: Palabras clave de la búsqueda
+            fetch_budget: Número máximo de páginas a descargar (None = sin límite)
+            time_budget: Tiempo máximo en segundos
+            max_ants: Número máximo de caminos (por defecto num_ants * max_iterations)
+            grace_period: Segundos de espera para las hormigas en curso al agotar el presupuesto
+            on_path: Se llama con cada camino completado y su calidad, en cuanto se deposita su feromona
+        """
+        max_ants = max_ants or self.num_ants * self.max_iterations
+        self.fetch_budget = fetch_budget
+        self.stop_ants.clear()
+        evaporation = (1.0 - self.rho) ** (1.0 / max(self.num_ants, 1))
+        
+        print(f"🐜 Iniciando optimización ACO asíncrona con {len(start_urls)} URLs iniciales "
+              f"(presupuesto: {fetch_budget if fetch_budget is not None else '∞'} descargas, {time_budget:.0f}s)")
+        
+        for url in start_urls:
+            self.add_node(url, keywords, depth=0)
+        self._rebuild_csr()
+        
+        best_overall_quality = 0.0
+        best_overall_paths = []
+        window_qualities = []
+        ants_launched = 0
+        ants_completed = 0
+        start_time = time.time()
+        
+        executor = ThreadPoolExecutor(max_workers=self.num_ants)
+        in_flight = set()
+        budget_exhausted_at = None
+        
+        try:
+            while True:
+                now = time.time()
+                budget_left = (now - start_time < time_budget and
+                               not self._fetch_budget_exhausted() and
+                               ants_launched < max_ants)
+                if not budget_left and budget_exhausted_at is None:
+                    budget_exhausted_at = now
+                
+                while budget_left and len(in_flight) < self.num_ants:
+                    start_url = start_urls[self.rng.integers(len(start_urls))]
+                    ant_rng = np.random.default_rng(self.rng.integers(2 ** 63))
+                    in_flight.add(executor.submit(self.ant_exploration, start_url, keywords, ants_launched, ant_rng))
+                    ants_launched += 1
+                    budget_left = ants_launched < max_ants
+                
+                if not in_flight:
+                    break
+                
+                
+                deadline = start_time + time_budget if budget_exhausted_at is None else budget_exhausted_at + grace_period
+                done, in_flight = wait(in_flight, timeout=max(deadline - now, 0.05), return_when=FIRST_COMPLETED)
+                
+                if not done and budget_exhausted_at is not None and time.time() >= deadline:
+                    print(f"⏰ Presupuesto agotado con {len(in_flight)} hormigas en curso, se descartan")
+                    break
+                
+                for future in done:
+                    ants_completed += 1
+                    try:
+                        path = future.result()
+                    except Exception as e:
+                        print(f"Error en exploración de hormiga: {e}")
+                        continue
+                    
+                    if len(path) <= 1:
+                        continue
+                    
+                    quality = self.evaluate_path_quality(path, keywords)
+                    self.evaporate(evaporation)
+                    self.deposit([path], [quality])
+                    window_qualities.append(quality)
+                    
+                    if quality > best_overall_quality:
+                        best_overall_quality = quality
+                        best_overall_paths = [path]
+                    
+                    if on_path is not None:
+                        try:
+                            on_path(path, quality)
+                        except Exception as e:
+                            print(f"Error procesando camino de hormiga: {e}")
+                
+                if len(window_qualities) >= self.num_ants:
+                    self.iteration_stats.append({
+                        'iteration': len(self.iteration_stats) + 1,
+                        'paths_found': len(window_qualities),
+                        'avg_quality': float(np.mean(window_qualities)),
+                        'best_quality': float(max(window_qualities)),
+                        'nodes_discovered': self.num_nodes,
+                        'elapsed': time.time() - start_time,
+                        'page_fetches': self.page_store.get_stats()['fetches']
+                    })
+                    window_qualities = []
+        finally:
+            self.stop_ants.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if window_qualities:
+            self.iteration_stats.append({
+                'iteration': len(self.iteration_stats) + 1,
+                'paths_found': len(window_qualities),
+                'avg_quality': float(np.mean(window_qualities)),
+                'best_quality': float(max(window_qualities)),
+                'nodes_discovered': self.num_nodes,
+                'elapsed': time.time() - start_time,
+                'page_fetches': self.page_store.get_stats()['fetches']
+            })
+        
+        print(f"   • Hormigas completadas: {ants_completed}/{ants_launched} en {time.time() - start_time:.1f}s")
+        
+        results = self._summarize(best_overall_quality, best_overall_paths)
+        results['ants_completed'] = ants_completed
+        return results
     
     def run_optimization(self, start_urls: List[str], keywords: List[str]) -> Dict:
         """
         Ejecuta el algoritmo de optimización de colonia de hormigas
         """
         print(f"🐜 Iniciando optimización ACO con {len(start_urls)} URLs iniciales")
+        self.fetch_budget = None
+        self.stop_ants.clear()
         
         
         for url in start_urls:
-            heuristic = self.calculate_url_heuristic(url, keywords)
-            self.nodes[url] = URLNode(
-                url=url,
-                heuristic_value=heuristic,
-                depth=0
-            )
+            self.add_node(url, keywords, depth=0)
         
         best_overall_quality = 0.0
         best_overall_paths = []
@@ -377,6 +919,8 @@ class AntColonyOptimizer:
         for iteration in range(self.max_iterations):
             print(f"🔄 Iteración ACO {iteration + 1}/{self.max_iterations}")
             
+            self._rebuild_csr()
+            
             iteration_paths = []
             iteration_qualities = []
             
@@ -385,8 +929,9 @@ class AntColonyOptimizer:
                 futures = []
                 
                 for ant_id in range(self.num_ants):
-                    start_url = random.choice(start_urls)
-                    future = executor.submit(self.ant_exploration, start_url, keywords, ant_id)
+                    start_url = start_urls[self.rng.integers(len(start_urls))]
+                    ant_rng = np.random.default_rng(self.rng.integers(2 ** 63))
+                    future = executor.submit(self.ant_exploration, start_url, keywords, ant_id, ant_rng)
                     futures.append(future)
                 
                 
@@ -405,8 +950,8 @@ class AntColonyOptimizer:
                 self.update_pheromones(iteration_paths, iteration_qualities)
                 
                 
-                best_iteration_quality = max(iteration_qualities)
-                best_iteration_idx = iteration_qualities.index(best_iteration_quality)
+                best_iteration_idx = int(np.argmax(iteration_qualities))
+                best_iteration_quality = iteration_qualities[best_iteration_idx]
                 best_iteration_path = iteration_paths[best_iteration_idx]
                 
                 if best_iteration_quality > best_overall_quality:
@@ -420,112 +965,98 @@ class AntColonyOptimizer:
                     'paths_found': len(iteration_paths),
                     'avg_quality': avg_quality,
                     'best_quality': best_iteration_quality,
-                    'nodes_discovered': len(self.nodes)
+                    'nodes_discovered': self.num_nodes
                 })
                 
                 print(f"   • Caminos encontrados: {len(iteration_paths)}")
                 print(f"   • Calidad promedio: {avg_quality:.3f}")
                 print(f"   • Mejor calidad: {best_iteration_quality:.3f}")
-                print(f"   • Nodos descubiertos: {len(self.nodes)}")
+                print(f"   • Nodos descubiertos: {self.num_nodes}")
             
             else:
                 print(f"   • No se encontraron caminos válidos")
         
         
-        total_nodes = len(self.nodes)
-        total_edges = sum(len(edges) for edges in self.adjacency_list.values())
-        avg_pheromone = np.mean([node.pheromone for node in self.nodes.values()]) if self.nodes else 0
-        
-        results = {
-            'best_paths': best_overall_paths,
-            'best_quality': best_overall_quality,
-            'total_nodes_discovered': total_nodes,
-            'total_edges_discovered': total_edges,
-            'average_pheromone_level': avg_pheromone,
-            'iteration_stats': self.iteration_stats,
-            'pheromone_trails_count': total_edges,
-            'success_rate': best_overall_quality,
-            'nodes_discovered': total_nodes,
-            'average_path_length': np.mean([len(path) for path in best_overall_paths]) if best_overall_paths else 0
-        }
-        
-        print(f"🎯 Optimización ACO completada:")
-        print(f"   • Mejor calidad: {best_overall_quality:.3f}")
-        print(f"   • Nodos descubiertos: {total_nodes}")
-        print(f"   • Aristas descubiertas: {total_edges}")
-        print(f"   • Nivel promedio de feromonas: {avg_pheromone:.3f}")
-        
-        return results
+        return self._summarize(best_overall_quality, best_overall_paths)
+
+
+def _extract_page_text(soup: BeautifulSoup) -> Tuple[str, str]:
+    """Obtiene el título y el texto principal de una página (modifica el soup)"""
+    title = soup.title.string if soup.title and soup.title.string else ""
+    title = title.strip()
+    
+    
+    for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer']):
+        element.decompose()
+    
+    
+    content_candidates = []
+    
+    
+    for tag in ['article', 'main', 'section']:
+        elements = soup.find_all(tag)
+        content_candidates.extend(elements)
+    
+    
+    if not content_candidates:
+        content_candidates = soup.find_all('p')
+    
+    
+    content_text = ""
+    for candidate in content_candidates:
+        text = candidate.get_text(separator=' ', strip=True)
+        if text and len(text) > 50:
+            content_text += text + " "
+    
+    
+    return title, ' '.join(content_text.split())
+
+
+def _page_to_content(page: Optional[CachedPage]) -> Optional[Dict]:
+    """Convierte una página procesada en el diccionario de contenido extraído por ACO"""
+    if page is None or len(page.content) < 100:
+        return None
+    
+    return {
+        'url': page.url,
+        'title': page.title,
+        'content': page.content[:2000],  
+        'keywords_found': list(page.keywords_found),
+        'extraction_method': 'aco'
+    }
 
 
-def extract_content_from_url(url: str, keywords: List[str]) -> Optional[Dict]:
+def extract_content_from_url(url: str, keywords: List[str], fetcher: PageFetcher = None) -> Optional[Dict]:
     """
     Extrae contenido de una URL específica
     """
     try:
-        response = requests.get(url, timeout=15, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        fetcher = fetcher or PageFetcher()
+        response = fetcher.fetch(url)
         
-        if response.status_code != 200:
+        if not response.ok:
             return None
         
         soup = BeautifulSoup(response.text, 'html.parser')
-        
-        
-        title = soup.title.string if soup.title else ""
-        title = title.strip()
-        
-        
-        for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer']):
-            element.decompose()
-        
-        
-        content_candidates = []
-        
-        
-        for tag in ['article', 'main', 'section']:
-            elements = soup.find_all(tag)
-            content_candidates.extend(elements)
-        
-        
-        if not content_candidates:
-            content_candidates = soup.find_all('p')
-        
-        
-        content_text = ""
-        for candidate in content_candidates:
-            text = candidate.get_text(separator=' ', strip=True)
-            if text and len(text) > 50:
-                content_text += text + " "
-        
-        
-        content_text = ' '.join(content_text.split())
-        
-        if len(content_text) < 100:
-            return None
-        
-        
-        keywords_found = []
+        title, content_text = _extract_page_text(soup)
         content_lower = content_text.lower()
-        for keyword in keywords:
-            if keyword.lower() in content_lower:
-                keywords_found.append(keyword)
         
-        return {
-            'url': url,
-            'title': title,
-            'content': content_text[:2000],  
-            'keywords_found': keywords_found,
-            'extraction_method': 'aco'
-        }
+        return _page_to_content(CachedPage(
+            url=url,
+            title=title,
+            content=content_text,
+            keywords_found=[keyword for keyword in keywords if keyword.lower() in content_lower]
+        ))
         
     except Exception as e:
         print(f"Error extrayendo contenido de {url}: {e}")
         return None
 
 
-def integrate_aco_with_crawler(crawler, keywords: List[str], max_urls: int = 15, improved_query: str = None, max_depth: int = 2) -> List[Dict]:
+def integrate_aco_with_crawler(crawler, keywords: List[str], max_urls: int = 15, improved_query: str = None, max_depth: int = 2,
+                               pheromone_store: PheromoneGraphStore = None, async_mode: bool = True,
+                               fetch_budget: int = None, time_budget: float = 60.0,
+                               on_content: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
     """
     Integra ACO con el crawler existente para búsqueda optimizada
     
@@ -535,6 +1066,13 @@ def integrate_aco_with_crawler(crawler, keywords: List[str], max_urls: int = 15,
         max_urls: Número máximo de URLs a procesar
         improved_query: Consulta mejorada por el agente de contexto (opcional)
         max_depth: Profundidad máxima de exploración (se incrementa en cada iteración)
+        pheromone_store: Almacén del grafo de feromonas entre sesiones (por defecto el del crawler o uno nuevo)
+        async_mode: Ejecutar la colonia sin barreras entre iteraciones (run_optimization_async)
+        fetch_budget: Descargas máximas durante la exploración en modo asíncrono
+        time_budget: Tiempo máximo de exploración en segundos en modo asíncrono
+        on_content: Se llama con cada página en cuanto se extrae. En modo asíncrono las
+            páginas de los caminos con calidad positiva se extraen mientras la colonia
+            sigue explorando, en lugar de esperar al final de la optimización
     """
     print(f"🐜 Integrando ACO con crawler para palabras clave: {keywords}")
     if improved_query:
@@ -548,7 +1086,10 @@ def integrate_aco_with_crawler(crawler, keywords: List[str], max_urls: int = 15,
         beta=2.0,
         rho=0.1,
         max_iterations=3,
-        max_depth=max_depth  
+        max_depth=max_depth,
+        fetcher=getattr(crawler, 'fetcher', None),
+        link_classifier=getattr(crawler, 'link_classifier', None),
+        embedding_function=getattr(crawler, 'sentence_transformer_ef', None)
     )
     
     
@@ -561,46 +1102,82 @@ def integrate_aco_with_crawler(crawler, keywords: List[str], max_urls: int = 15,
     print(f"🔍 URLs iniciales para ACO: {len(initial_urls)}")
     
     
-    aco_results = aco.run_optimization(initial_urls, keywords)
+    pheromone_store = pheromone_store or getattr(crawler, 'pheromone_store', None) or PheromoneGraphStore()
+    aco.warm_start(pheromone_store, initial_urls, keywords)
     
     
     extracted_content = []
-    urls_to_extract = set()
-    
-    
-    for path in aco_results['best_paths']:
-        urls_to_extract.update(path)
-    
+    requested_urls = set()
+    extraction_lock = threading.Lock()
+    extraction_executor = ThreadPoolExecutor(max_workers=5)
+    extraction_futures = []
     
-    if not urls_to_extract:
-        sorted_nodes = sorted(
-            aco.nodes.items(),
-            key=lambda x: x[1].pheromone * x[1].heuristic_value,
-            reverse=True
-        )
-        urls_to_extract = {url for url, _ in sorted_nodes[:max_urls]}
+    def extract(url):
+        content = aco.extract_content(url, keywords)
+        if not content:
+            return
+        with extraction_lock:
+            if len(extracted_content) >= max_urls:
+                return
+            extracted_content.append(content)
+        if on_content is not None:
+            try:
+                on_content(content)
+            except Exception as e:
+                print(f"Error procesando contenido extraído de {url}: {e}")
     
+    def request_extraction(urls):
+        with extraction_lock:
+            urls = [url for url in urls if url not in requested_urls]
+            requested_urls.update(urls)
+        for url in urls:
+            extraction_futures.append(extraction_executor.submit(extract, url))
     
-    urls_to_extract = list(urls_to_extract)[:max_urls]
+    def on_path(path, quality):
+        if quality > 0 and len(extracted_content) < max_urls:
+            request_extraction(path)
     
-    print(f"📄 Extrayendo contenido de {len(urls_to_extract)} URLs optimizadas por ACO")
+    try:
+        if async_mode:
+            aco_results = aco.run_optimization_async(
+                initial_urls,
+                keywords,
+                fetch_budget=fetch_budget or aco.num_ants * aco.max_iterations * max_depth,
+                time_budget=time_budget,
+                on_path=on_path if on_content is not None else None
+            )
+        else:
+            aco_results = aco.run_optimization(initial_urls, keywords)
+        aco.save_graph(pheromone_store, keywords)
+        
+        
+        urls_to_extract = set()
     
     
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {
-            executor.submit(extract_content_from_url, url, keywords): url 
-            for url in urls_to_extract
-        }
+        for path in aco_results['best_paths']:
+            urls_to_extract.update(path)
+        
+        
+        if not urls_to_extract:
+            urls_to_extract = set(aco.top_urls(max_urls))
+        
+        
+        urls_to_extract = list(urls_to_extract)[:max_urls]
+        
+        print(f"📄 Extrayendo contenido de {len(urls_to_extract)} URLs optimizadas por ACO")
+        request_extraction(urls_to_extract)
         
-        for future in as_completed(futures):
+        for future in as_completed(list(extraction_futures)):
             try:
-                content = future.result()
-                if content:
-                    extracted_content.append(content)
+                future.result()
             except Exception as e:
                 print(f"Error extrayendo contenido: {e}")
+    finally:
+        extraction_executor.shutdown(wait=True)
     
-    print(f"✅ ACO extrajo contenido de {len(extracted_content)} páginas")
+    store_stats = aco.page_store.get_stats()
+    print(f"✅ ACO extrajo contenido de {len(extracted_content)} páginas "
+          f"({store_stats['fetches']} descargas, {store_stats['hits']} lecturas del almacén de páginas)")
     
     return extracted_content
 
@@ -0,0 +1,159 @@
+"""
+Persistencia del grafo de feromonas de ACO entre sesiones
+Guarda por host y tema de búsqueda las feromonas, heurísticas y listas de
+adyacencia descubiertas, aplicando un decaimiento temporal al cargarlas para
+que las nuevas ejecuciones arranquen desde los mejores caminos conocidos
+"""
+
+import os
+import re
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+@dataclass
+class SavedHostGraph:
+    """Subgrafo guardado de un host para un tema"""
+    host: str
+    urls: List[str]
+    pheromone: np.ndarray
+    heuristic: np.ndarray
+    depths: np.ndarray
+    rows: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    saved_at: float
+
+    def neighbors(self, row: int) -> np.ndarray:
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+
+def normalize_host(url: str) -> str:
+    host = urlparse(url).netloc.lower().split(':')[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+def topic_key(keywords: List[str]) -> str:
+    """Clave estable del tema de búsqueda (independiente del orden, mayúsculas y acentos)"""
+    words = set()
+    for keyword in keywords:
+        normalized = unicodedata.normalize('NFKD', keyword.lower()).encode('ascii', 'ignore').decode('ascii')
+        words.update(re.findall(r'[a-z0-9]+', normalized))
+
+    slug = '-'.join(sorted(words)) or 'general'
+    if len(slug) > 60:
+        slug = f"{slug[:50]}-{zlib.crc32(slug.encode('utf-8')):08x}"
+    return slug
+
+
+class PheromoneGraphStore:
+    """Almacén en disco de grafos de feromonas por host y tema"""
+
+    def __init__(self,
+                 base_dir: str = os.path.join("crawler_state", "pheromones"),
+                 half_life_days: float = 14.0,
+                 max_age_days: float = 90.0,
+                 max_nodes_per_host: int = 5000):
+        """
+        Args:
+            base_dir: Directorio donde se guardan los grafos
+            half_life_days: Días en los que la feromona acumulada pierde la mitad de su exceso sobre el valor neutro
+            max_age_days: Antigüedad a partir de la cual un grafo guardado se ignora
+            max_nodes_per_host: Nodos máximos guardados por host (se conservan los de mayor feromona * heurística)
+        """
+        self.base_dir = base_dir
+        self.half_life_days = half_life_days
+        self.max_age_days = max_age_days
+        self.max_nodes_per_host = max_nodes_per_host
+
+    def _path(self, host: str, topic: str) -> str:
+        safe_host = re.sub(r'[^a-z0-9.-]', '_', host)
+        return os.path.join(self.base_dir, safe_host, f"{topic}.npz")
+
+    def decay_factor(self, saved_at: float, now: float = None) -> float:
+        age_days = max(0.0, ((now or time.time()) - saved_at) / 86400.0)
+        return 0.5 ** (age_days / self.half_life_days)
+
+    def load(self, host: str, topic: str, now: float = None) -> Optional[SavedHostGraph]:
+        """Carga el grafo de un host aplicando el decaimiento temporal a las feromonas"""
+        path = self._path(host, topic)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as data:
+                saved_at = float(data['saved_at'])
+                if (now or time.time()) - saved_at > self.max_age_days * 86400.0:
+                    return None
+
+
+                factor = self.decay_factor(saved_at, now)
+                pheromone = 1.0 + (data['pheromone'] - 1.0) * factor
+
+                return SavedHostGraph(
+                    host=host,
+                    urls=data['urls'].tolist(),
+                    pheromone=pheromone,
+                    heuristic=data['heuristic'],
+                    depths=data['depths'],
+                    rows=data['rows'],
+                    indptr=data['indptr'],
+                    indices=data['indices'],
+                    saved_at=saved_at
+                )
+        except Exception as e:
+            print(f"⚠️ No se pudo cargar el grafo de feromonas de {host}: {e}")
+            return None
+
+    def save_host(self, host: str, topic: str, urls: List[str], pheromone: np.ndarray, heuristic: np.ndarray,
+                  depths: np.ndarray, adjacency: Dict[int, np.ndarray], now: float = None):
+        """
+        Guarda el subgrafo de un host.
+
+        Args:
+            urls, pheromone, heuristic, depths: Nodos del grafo completo de la ejecución
+            adjacency: Vecinos (índices en urls) de los nodos expandidos
+        """
+        local_ids = np.array([i for i, url in enumerate(urls) if normalize_host(url) == host], dtype=np.int64)
+        if local_ids.size == 0:
+            return
+
+        if local_ids.size > self.max_nodes_per_host:
+            scores = pheromone[local_ids] * heuristic[local_ids]
+            local_ids = local_ids[np.argsort(-scores)[:self.max_nodes_per_host]]
+
+        expanded = [node_id for node_id in local_ids.tolist() if node_id in adjacency]
+        neighbor_ids = [adjacency[node_id] for node_id in expanded]
+
+
+        kept_ids = np.unique(np.concatenate([local_ids] + neighbor_ids)) if neighbor_ids else np.unique(local_ids)
+        position = {int(node_id): index for index, node_id in enumerate(kept_ids.tolist())}
+
+        lengths = [len(neighbors) for neighbors in neighbor_ids]
+        indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        indices = (np.array([position[int(n)] for neighbors in neighbor_ids for n in neighbors], dtype=np.int64)
+                   if lengths and sum(lengths) else np.zeros(0, dtype=np.int64))
+
+        path = self._path(host, topic)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    urls=np.array([urls[i] for i in kept_ids.tolist()], dtype=str),
+                    pheromone=pheromone[kept_ids],
+                    heuristic=heuristic[kept_ids],
+                    depths=depths[kept_ids],
+                    rows=np.array([position[node_id] for node_id in expanded], dtype=np.int64),
+                    indptr=indptr,
+                    indices=indices,
+                    saved_at=np.float64(now or time.time())
+                )
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el grafo de feromonas de {host}: {e}")